@@ -1,14 +1,252 @@
-from flask import Flask, render_template, request, redirect, url_for, flash
+from flask import (Flask, render_template, request, redirect, url_for, flash, abort, jsonify,
+                   Response, stream_with_context, current_app, make_response, g,
+                   has_request_context, before_render_template, template_rendered,
+                   send_from_directory)
+from flask.cli import with_appcontext
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from sqlalchemy import (delete, event, func, insert, inspect, literal, or_, select, text,
+                        tuple_, union_all, update)
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.pool import QueuePool
+from datetime import datetime, timedelta, timezone
+from collections import Counter
+from itertools import chain, islice
+from jinja2 import FileSystemBytecodeCache
+from werkzeug.middleware.proxy_fix import ProxyFix
+from markupsafe import Markup
+import atexit
+import base64
+import binascii
+import click
+import csv
+import hashlib
+import io
+import json
+import math
+import mimetypes
 import os
+import re
+import sqlite3
+import threading
+import uuid
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'student-registration-secret-key-2024'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///students.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+from assets import build_assets, critical_css, fetch_fonts, load_manifest
+from cache import NullCache, make_cache
+from compress import CompressionMiddleware
+from email_index import EmailIndex, normalize_email
+from instrumentation import Instrumentation, RequestTimer, server_timing
+from metrics import FileCollector, MetricsRegistry, render as render_metrics
+from query_log import RepeatedQueryDetector, SlowQueryLog
+from rate_limit import ConcurrencyLimit, make_store, parse_limit
+from registration_queue import DONE, FAILED, GroupCommitWriter, make_spool
+
+
+def env_flag(name, default):
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes', 'on')
+
+
+def engine_options(uri):
+    """Pool settings for the configured database, tunable from the environment.
+
+    In-memory SQLite uses a single static connection, so pool sizing does
+    not apply there.
+    """
+    url = make_url(uri)
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        return {}
+    return {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': env_flag('DB_POOL_PRE_PING', True),
+    }
+
+
+def sqlite_pragmas(config):
+    """The pragmas applied to every new SQLite connection, from the app config."""
+    return {
+        'journal_mode': config['SQLITE_JOURNAL_MODE'],
+        'synchronous': config['SQLITE_SYNCHRONOUS'],
+        'busy_timeout': config['SQLITE_BUSY_TIMEOUT_MS'],
+        'mmap_size': config['SQLITE_MMAP_SIZE'],
+    }
+
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
+
+
+def default_config():
+    """Configuration defaults, read from the environment when the app is created."""
+    return {
+        'SECRET_KEY': 'student-registration-secret-key-2024',
+        'SQLALCHEMY_DATABASE_URI': os.environ.get('DATABASE_URL', 'sqlite:///students.db'),
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        # Applied to every new SQLite connection. WAL lets readers run alongside
+        # the single writer, and busy_timeout makes writers wait instead of
+        # failing with "database is locked" while another worker commits.
+        'SQLITE_JOURNAL_MODE': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'SQLITE_SYNCHRONOUS': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'SQLITE_BUSY_TIMEOUT_MS': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+        'SQLITE_MMAP_SIZE': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        'STUDENTS_PER_PAGE': int(os.environ.get('STUDENTS_PER_PAGE', 50)),
+        'STUDENTS_MAX_PER_PAGE': int(os.environ.get('STUDENTS_MAX_PER_PAGE', 200)),
+        # Stream /students while rows are read, STUDENTS_STREAM_CHUNK rows
+        # per fetch and STREAM_BUFFER_EVENTS template events per chunk sent.
+        'STUDENTS_STREAM': env_flag('STUDENTS_STREAM', True),
+        'STUDENTS_STREAM_CHUNK': int(os.environ.get('STUDENTS_STREAM_CHUNK', 50)),
+        'STREAM_BUFFER_EVENTS': int(os.environ.get('STREAM_BUFFER_EVENTS', 100)),
+        # Rows per transaction and per duplicate-check IN query; stays below
+        # SQLite's default 999 bound-parameter limit.
+        'IMPORT_BATCH_SIZE': int(os.environ.get('IMPORT_BATCH_SIZE', 500)),
+        'IMPORT_MAX_ERRORS': int(os.environ.get('IMPORT_MAX_ERRORS', 1000)),
+        'EXPORT_CHUNK_SIZE': int(os.environ.get('EXPORT_CHUNK_SIZE', 1000)),
+        # 'memory' caches per process; use 'file' to share one cache, and its
+        # invalidations, between several workers on a host. 'none' disables it.
+        'PAGE_CACHE_BACKEND': os.environ.get('PAGE_CACHE_BACKEND', 'memory'),
+        'PAGE_CACHE_DIR': os.environ.get('PAGE_CACHE_DIR'),
+        'PAGE_CACHE_TTL': int(os.environ.get('PAGE_CACHE_TTL', 60)),
+        'PAGE_CACHE_MAX_ENTRIES': int(os.environ.get('PAGE_CACHE_MAX_ENTRIES', 1024)),
+        # 'queue' acknowledges registrations before they are written and has a
+        # background writer commit them in groups; see registration_queue.py
+        # for what each spool guarantees.
+        'REGISTRATION_MODE': os.environ.get('REGISTRATION_MODE', 'sync'),
+        'REGISTRATION_SPOOL': os.environ.get('REGISTRATION_SPOOL', 'memory'),
+        'REGISTRATION_SPOOL_PATH': os.environ.get('REGISTRATION_SPOOL_PATH'),
+        'REGISTRATION_BATCH_SIZE': int(os.environ.get('REGISTRATION_BATCH_SIZE', 200)),
+        'REGISTRATION_FLUSH_MS': int(os.environ.get('REGISTRATION_FLUSH_MS', 50)),
+        # Rows per transaction for bulk deletes and purges.
+        'DELETE_BATCH_SIZE': int(os.environ.get('DELETE_BATCH_SIZE', 500)),
+        # Mark deleted students instead of deleting them and purge them in
+        # the background every PURGE_INTERVAL seconds.
+        'SOFT_DELETE': env_flag('SOFT_DELETE', False),
+        'PURGE_INTERVAL': float(os.environ.get('PURGE_INTERVAL', 60)),
+        # Compiled templates are cached on disk so workers skip parsing them;
+        # `flask compile-templates` fills the cache at deploy time, and
+        # JINJA_PRECOMPILE loads every template when the app is created.
+        'JINJA_BYTECODE_CACHE': env_flag('JINJA_BYTECODE_CACHE', True),
+        'JINJA_CACHE_DIR': os.environ.get('JINJA_CACHE_DIR'),
+        'JINJA_PRECOMPILE': env_flag('JINJA_PRECOMPILE', False),
+        # Time every request's SQL statements and template rendering and show
+        # them at /timings next to the latencies /metrics records; METRICS
+        # may be off. SERVER_TIMING also reports each request's numbers to
+        # the client in a Server-Timing header. Streamed pages are recorded
+        # once their body has been sent, but their header only covers the
+        # work done before it.
+        'INSTRUMENTATION': env_flag('INSTRUMENTATION', False),
+        'SERVER_TIMING': env_flag('SERVER_TIMING', True),
+        # Request counts and latency histograms at /metrics. Set METRICS_DIR
+        # when several worker processes serve the app so each scrape
+        # reports all of them; workers write their totals there every
+        # METRICS_FLUSH_INTERVAL seconds.
+        'METRICS': env_flag('METRICS', True),
+        'METRICS_DIR': os.environ.get('METRICS_DIR'),
+        'METRICS_FLUSH_INTERVAL': float(os.environ.get('METRICS_FLUSH_INTERVAL', 5)),
+        # Statements slower than SLOW_QUERY_MS are logged with their
+        # parameters, endpoint and EXPLAIN output; 0 turns the log off.
+        'SLOW_QUERY_MS': float(os.environ.get('SLOW_QUERY_MS', 250)),
+        'SLOW_QUERY_EXPLAIN': env_flag('SLOW_QUERY_EXPLAIN', True),
+        # Warn about requests that run one statement shape at least
+        # REPEATED_QUERY_THRESHOLD times (N+1 queries). Always on in debug mode.
+        'DETECT_REPEATED_QUERIES': env_flag('DETECT_REPEATED_QUERIES', False),
+        'REPEATED_QUERY_THRESHOLD': int(os.environ.get('REPEATED_QUERY_THRESHOLD', 5)),
+        # `flask build-assets` writes hashed, minified and precompressed
+        # copies of the static files to static/<ASSETS_DIR>; once built,
+        # url_for('static', ...) links to them and they are cached for
+        # ASSETS_MAX_AGE seconds.
+        'ASSETS_DIR': os.environ.get('ASSETS_DIR', 'dist'),
+        'ASSETS_MAX_AGE': int(os.environ.get('ASSETS_MAX_AGE', 365 * 24 * 3600)),
+        # Serve the web fonts from static/ (run `flask fetch-fonts` first)
+        # instead of loading them from Google Fonts on every first visit.
+        'SELF_HOSTED_FONTS': env_flag('SELF_HOSTED_FONTS', False),
+        # Inline the rules that paint the top of each page in its <head> and
+        # load the full stylesheet without blocking the first paint.
+        'CRITICAL_CSS': env_flag('CRITICAL_CSS', False),
+        'FONTS_STYLESHEET_URL': os.environ.get(
+            'FONTS_STYLESHEET_URL',
+            'https://fonts.googleapis.com/css2?family=Playfair+Display:wght@400;600;700'
+            '&family=Source+Sans+Pro:wght@300;400;600&display=swap',
+        ),
+        # Compress responses the client accepts zstd, brotli or gzip for,
+        # when they are at least COMPRESSION_MIN_SIZE bytes. Compressed
+        # bodies of responses with an ETag are kept, up to
+        # COMPRESSION_CACHE_ENTRIES of them, so identical output is only
+        # compressed once.
+        'COMPRESSION': env_flag('COMPRESSION', True),
+        'COMPRESSION_MIN_SIZE': int(os.environ.get('COMPRESSION_MIN_SIZE', 500)),
+        'COMPRESSION_GZIP_LEVEL': int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6)),
+        'COMPRESSION_BROTLI_LEVEL': int(os.environ.get('COMPRESSION_BROTLI_LEVEL', 4)),
+        'COMPRESSION_ZSTD_LEVEL': int(os.environ.get('COMPRESSION_ZSTD_LEVEL', 3)),
+        'COMPRESSION_CACHE_ENTRIES': int(os.environ.get('COMPRESSION_CACHE_ENTRIES', 256)),
+        'COMPRESSION_CACHE_TTL': int(os.environ.get('COMPRESSION_CACHE_TTL', 3600)),
+        # Proxies in front of the app that append to X-Forwarded-For and
+        # X-Forwarded-Proto; the client address is read that many hops back.
+        # 0 trusts no headers and uses the connection's address.
+        'TRUSTED_PROXY_HOPS': int(os.environ.get('TRUSTED_PROXY_HOPS', 0)),
+        # Registrations, by form or POST /api/students, are limited per
+        # client address and per email with token buckets: 'N/period', the
+        # period one of second, minute, hour or day; empty lifts a limit.
+        # Behind a proxy every client shares its address, so only set
+        # REGISTER_RATE_LIMIT_IP (e.g. '30/minute') along with
+        # TRUSTED_PROXY_HOPS. The 'sqlite' store shares buckets between
+        # worker processes through RATE_LIMIT_PATH. Beyond
+        # REGISTER_MAX_CONCURRENT registrations in progress per process (0
+        # for no cap), the rest get 429 at once.
+        'REGISTER_RATE_LIMIT_IP': os.environ.get('REGISTER_RATE_LIMIT_IP', ''),
+        'REGISTER_RATE_LIMIT_EMAIL': os.environ.get('REGISTER_RATE_LIMIT_EMAIL', '5/minute'),
+        'RATE_LIMIT_STORE': os.environ.get('RATE_LIMIT_STORE', 'memory'),
+        'RATE_LIMIT_PATH': os.environ.get('RATE_LIMIT_PATH'),
+        'REGISTER_MAX_CONCURRENT': int(os.environ.get('REGISTER_MAX_CONCURRENT', 8)),
+        # The registration form carries an idempotency key (or the client
+        # sends an Idempotency-Key header); a resubmission with a key that
+        # already registered its email is redirected where the first one
+        # was, without touching the database. Keys are remembered for
+        # IDEMPOTENCY_TTL seconds, up to IDEMPOTENCY_MAX_ENTRIES of them;
+        # the 'file' backend shares them between workers on a host.
+        'IDEMPOTENCY_CACHE_BACKEND': os.environ.get('IDEMPOTENCY_CACHE_BACKEND', 'memory'),
+        'IDEMPOTENCY_CACHE_DIR': os.environ.get('IDEMPOTENCY_CACHE_DIR'),
+        'IDEMPOTENCY_TTL': int(os.environ.get('IDEMPOTENCY_TTL', 3600)),
+        'IDEMPOTENCY_MAX_ENTRIES': int(os.environ.get('IDEMPOTENCY_MAX_ENTRIES', 10000)),
+        # Registration days shown on /stats; 0 shows every day.
+        'STATS_DAYS': int(os.environ.get('STATS_DAYS', 30)),
+        # Bloom filter of registered emails; at the default error rate it
+        # costs about 1.2 bytes per address.
+        'EMAIL_INDEX_CAPACITY': int(os.environ.get('EMAIL_INDEX_CAPACITY', 100000)),
+        'EMAIL_INDEX_ERROR_RATE': float(os.environ.get('EMAIL_INDEX_ERROR_RATE', 0.01)),
+    }
+
+
+db = SQLAlchemy()
+
+# Views and CLI commands are declared at import time and attached to every
+# application built by create_app().
+VIEWS = []
+COMMANDS = []
+
+
+def route(rule, **options):
+    """Declare a view; the endpoint name is the function name, as with app.route."""
+    def decorator(func):
+        VIEWS.append((rule, func, options))
+        return func
+    return decorator
+
+
+def cli_command(name):
+    """Declare a CLI command that runs inside an application context."""
+    def decorator(func):
+        command = click.command(name)(with_appcontext(func))
+        COMMANDS.append(command)
+        return command
+    return decorator
 
-db = SQLAlchemy(app)
 
 class Student(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -22,23 +260,768 @@ class Student(db.Model):
     city = db.Column(db.String(50), nullable=False)
     course = db.Column(db.String(100), nullable=False)
     registration_date = db.Column(db.DateTime, default=datetime.utcnow)
+    # Set instead of deleting the row when SOFT_DELETE is on; such rows are
+    # hidden everywhere and removed later by purge_deleted_students().
+    deleted_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        # /students lists newest first and pages on (registration_date, id).
+        db.Index('ix_student_registration', 'registration_date', 'id'),
+        # Filters by course or city are always shown newest first.
+        db.Index('ix_student_course_registration', 'course', 'registration_date'),
+        db.Index('ix_student_city_registration', 'city', 'registration_date'),
+        db.Index('ix_student_name', 'last_name', 'first_name'),
+        db.Index('ix_student_deleted', 'deleted_at'),
+    )
 
     def __repr__(self):
         return f'<Student {self.first_name} {self.last_name}>'
 
-with app.app_context():
+
+# Students that have not been soft-deleted.
+LIVE_STUDENT = Student.deleted_at.is_(None)
+
+
+class SchemaVersion(db.Model):
+    """Single-row table recording the last applied migration."""
+    __tablename__ = 'schema_version'
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class StudentChanges(db.Model):
+    """Single-row change counter, bumped in the same transaction as every Student write.
+
+    It is the cheap validator behind ETag/Last-Modified and listing cache
+    keys: one primary-key read tells whether anything changed.
+    """
+    __tablename__ = 'student_changes'
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+@event.listens_for(StudentChanges.__table__, 'after_create')
+def seed_student_changes(target, connection, **kw):
+    """Create the counter row with its table, so writes only ever UPDATE it."""
+    connection.execute(target.insert().values(id=1, version=0, changed_at=datetime.utcnow()))
+
+
+def record_student_change():
+    """Bump the change counter; call before committing a Student write."""
+    db.session.execute(
+        update(StudentChanges).where(StudentChanges.id == 1)
+        .values(version=StudentChanges.version + 1, changed_at=datetime.utcnow())
+    )
+
+
+def student_changes():
+    """Return (version, changed_at) for the students table."""
+    row = db.session.execute(
+        select(StudentChanges.version, StudentChanges.changed_at).where(StudentChanges.id == 1)
+    ).first()
+    return tuple(row) if row else (0, datetime(1970, 1, 1))
+
+
+# Full-text index over the searchable Student columns. It is an external
+# content FTS5 table, so it stores only the inverted index and reads column
+# values back from `student`; the triggers keep it in step with every insert,
+# update and delete, including bulk and raw SQL writes.
+SEARCH_COLUMNS = ('first_name', 'last_name', 'email', 'city', 'course')
+
+SEARCH_INDEX_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS student_fts USING fts5("
+    f"{', '.join(SEARCH_COLUMNS)}, content='student', content_rowid='id', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS student_fts_insert AFTER INSERT ON student BEGIN "
+    f"INSERT INTO student_fts(rowid, {', '.join(SEARCH_COLUMNS)}) "
+    f"VALUES (new.id, {', '.join('new.' + c for c in SEARCH_COLUMNS)}); END",
+    "CREATE TRIGGER IF NOT EXISTS student_fts_delete AFTER DELETE ON student BEGIN "
+    f"INSERT INTO student_fts(student_fts, rowid, {', '.join(SEARCH_COLUMNS)}) "
+    f"VALUES ('delete', old.id, {', '.join('old.' + c for c in SEARCH_COLUMNS)}); END",
+    "CREATE TRIGGER IF NOT EXISTS student_fts_update AFTER UPDATE ON student BEGIN "
+    f"INSERT INTO student_fts(student_fts, rowid, {', '.join(SEARCH_COLUMNS)}) "
+    f"VALUES ('delete', old.id, {', '.join('old.' + c for c in SEARCH_COLUMNS)}); "
+    f"INSERT INTO student_fts(rowid, {', '.join(SEARCH_COLUMNS)}) "
+    f"VALUES (new.id, {', '.join('new.' + c for c in SEARCH_COLUMNS)}); END",
+)
+
+
+@event.listens_for(Student.__table__, 'after_create')
+def create_search_index(target, connection, **kw):
+    if connection.dialect.name != 'sqlite':
+        return
+    for statement in SEARCH_INDEX_DDL:
+        connection.exec_driver_sql(statement)
+
+
+@event.listens_for(Student.__table__, 'before_drop')
+def drop_search_index(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        connection.exec_driver_sql('DROP TABLE IF EXISTS student_fts')
+
+
+class StudentStat(db.Model):
+    """Number of students per course, city, gender and registration day.
+
+    Kept current by triggers on the student table, so every write path,
+    including bulk inserts and deletes, updates the counts in its own
+    transaction. Groups whose count reaches zero are removed.
+    """
+    dimension = db.Column(db.String(10), primary_key=True)
+    value = db.Column(db.String(100), primary_key=True)
+    count = db.Column(db.Integer, nullable=False)
+
+
+# SQL expression grouping a student row into each dimension; `{row}` is new
+# or old inside the triggers.
+STAT_DIMENSIONS = {
+    'course': '{row}.course',
+    'city': '{row}.city',
+    'gender': '{row}.gender',
+    'day': 'date({row}.registration_date)',
+}
+
+
+def _stat_groups(row):
+    return ' OR '.join(f"(dimension = '{dimension}' AND value = {expr.format(row=row)})"
+                       for dimension, expr in STAT_DIMENSIONS.items())
+
+
+# Rows inserted without a registration date are left out of the day counts.
+_STAT_INCREMENT = (
+    'INSERT INTO student_stat (dimension, value, count) '
+    'SELECT dimension, value, 1 FROM ('
+    + ' UNION ALL '.join(f"SELECT '{dimension}' AS dimension, {expr.format(row='new')} AS value"
+                         for dimension, expr in STAT_DIMENSIONS.items())
+    + ') WHERE value IS NOT NULL '
+    'ON CONFLICT (dimension, value) DO UPDATE SET count = count + 1; '
+)
+_STAT_DECREMENT = (
+    f"UPDATE student_stat SET count = count - 1 WHERE {_stat_groups('old')}; "
+    f"DELETE FROM student_stat WHERE count <= 0 AND ({_stat_groups('old')}); "
+)
+
+# Soft-deleted students leave the counts when they are marked, not when
+# they are purged.
+STAT_TRIGGERS = ('insert', 'delete', 'update', 'soft_delete')
+STAT_TRIGGER_DDL = (
+    f'CREATE TRIGGER IF NOT EXISTS student_stat_insert AFTER INSERT ON student BEGIN '
+    f'{_STAT_INCREMENT}END',
+    f'CREATE TRIGGER IF NOT EXISTS student_stat_delete AFTER DELETE ON student '
+    f'WHEN old.deleted_at IS NULL BEGIN {_STAT_DECREMENT}END',
+    f'CREATE TRIGGER IF NOT EXISTS student_stat_update '
+    f'AFTER UPDATE OF course, city, gender, registration_date ON student '
+    f'WHEN old.deleted_at IS NULL BEGIN {_STAT_DECREMENT}{_STAT_INCREMENT}END',
+    f'CREATE TRIGGER IF NOT EXISTS student_stat_soft_delete AFTER UPDATE OF deleted_at ON student '
+    f'WHEN old.deleted_at IS NULL AND new.deleted_at IS NOT NULL BEGIN {_STAT_DECREMENT}END',
+)
+
+
+@event.listens_for(Student.__table__, 'after_create')
+def create_stat_triggers(target, connection, **kw):
+    if connection.dialect.name != 'sqlite':
+        return
+    for statement in STAT_TRIGGER_DDL:
+        connection.exec_driver_sql(statement)
+
+
+def stat_counts_query():
+    """GROUP BY every dimension over the student table."""
+    columns = {
+        'course': Student.course,
+        'city': Student.city,
+        'gender': Student.gender,
+        'day': func.date(Student.registration_date),
+    }
+    return union_all(*(
+        select(literal(dimension), column, func.count())
+        .where(column.is_not(None), LIVE_STUDENT).group_by(column)
+        for dimension, column in columns.items()
+    ))
+
+
+def rebuild_student_stats(connection):
+    """Recompute every count from the student table."""
+    connection.execute(delete(StudentStat))
+    connection.execute(insert(StudentStat).from_select(
+        ['dimension', 'value', 'count'], stat_counts_query()
+    ))
+
+
+# Ordered list of (version, function) pairs. db.create_all() only creates
+# missing tables, so anything that changes an existing table goes here.
+MIGRATIONS = []
+
+
+def migration(version):
+    """Register a schema migration that upgrades the database to `version`."""
+    def decorator(func):
+        MIGRATIONS.append((version, func))
+        MIGRATIONS.sort(key=lambda item: item[0])
+        return func
+    return decorator
+
+
+def _student_columns(connection):
+    return {column['name'] for column in inspect(connection).get_columns('student')}
+
+
+def _create_student_indexes(connection):
+    """Create the model's indexes whose columns the table already has."""
+    columns = _student_columns(connection)
+    for index in Student.__table__.indexes:
+        if {column.name for column in index.columns} <= columns:
+            index.create(connection, checkfirst=True)
+
+
+@migration(1)
+def add_student_indexes(connection):
+    """Create the Student access-pattern indexes on databases that predate them."""
+    _create_student_indexes(connection)
+
+
+@migration(2)
+def add_search_index(connection):
+    """Create the full-text index and fill it from the existing rows."""
+    create_search_index(Student.__table__, connection)
+    if connection.dialect.name == 'sqlite':
+        connection.exec_driver_sql("INSERT INTO student_fts(student_fts) VALUES ('rebuild')")
+
+
+@migration(3)
+def normalize_student_emails(connection):
+    """Store emails trimmed and lower-cased so case variants count as duplicates.
+
+    Rows whose normalized email is already taken are left as they are.
+    """
+    rows = connection.execute(select(Student.id, Student.email)).all()
+    taken = {email for _, email in rows}
+    for student_id, email in rows:
+        normalized = normalize_email(email)
+        if normalized != email and normalized not in taken:
+            connection.execute(
+                update(Student).where(Student.id == student_id).values(email=normalized)
+            )
+            taken.add(normalized)
+
+
+@migration(4)
+def add_student_stats(connection):
+    """Install the counter triggers; migration 5 fills the counts."""
+    create_stat_triggers(Student.__table__, connection)
+
+
+@migration(5)
+def add_soft_delete(connection):
+    """Add Student.deleted_at and make the counters ignore soft-deleted rows.
+
+    The counts are rebuilt here rather than in migration 4 because counting
+    only live rows needs the new column.
+    """
+    if 'deleted_at' not in _student_columns(connection):
+        connection.exec_driver_sql('ALTER TABLE student ADD COLUMN deleted_at DATETIME')
+    _create_student_indexes(connection)
+    if connection.dialect.name == 'sqlite':
+        for name in STAT_TRIGGERS:
+            connection.exec_driver_sql(f'DROP TRIGGER IF EXISTS student_stat_{name}')
+        create_stat_triggers(Student.__table__, connection)
+    rebuild_student_stats(connection)
+
+
+@migration(6)
+def seed_change_counter(connection):
+    """Add the counter row to databases whose table predates seeding it."""
+    if connection.execute(select(StudentChanges.id).where(StudentChanges.id == 1)).first() is None:
+        seed_student_changes(StudentChanges.__table__, connection)
+
+
+def get_schema_version():
+    with db.engine.connect() as connection:
+        version = connection.scalar(select(SchemaVersion.version).where(SchemaVersion.id == 1))
+    return version or 0
+
+
+def upgrade_database():
+    """Create missing tables and apply pending migrations, one transaction each.
+
+    Returns the list of versions that were applied.
+    """
     db.create_all()
+    applied = []
+    current = get_schema_version()
+    for version, func in MIGRATIONS:
+        if version <= current:
+            continue
+        with db.engine.begin() as connection:
+            func(connection)
+            updated = connection.execute(
+                SchemaVersion.__table__.update().values(version=version)
+            ).rowcount
+            if not updated:
+                connection.execute(
+                    SchemaVersion.__table__.insert().values(id=1, version=version)
+                )
+        applied.append(version)
+    return applied
+
+
+@cli_command('db-upgrade')
+def db_upgrade_command():
+    """Apply pending schema migrations to the configured database."""
+    applied = upgrade_database()
+    if applied:
+        print(f'Applied migrations: {", ".join(map(str, applied))}')
+    else:
+        print(f'Database is up to date (version {get_schema_version()}).')
+
+
+@cli_command('rebuild-stats')
+def rebuild_stats_command():
+    """Recompute the registration counts shown on /stats."""
+    with db.engine.begin() as connection:
+        rebuild_student_stats(connection)
+    print(f"Rebuilt statistics for {student_count()} students.")
+
+
+def _use_stat_triggers():
+    return db.session.get_bind().dialect.name == 'sqlite'
+
+
+def student_stats(days=None):
+    """Return {dimension: {value: count}} with groups ordered largest first.
+
+    On SQLite this reads the trigger-maintained counters, so the cost
+    depends on the number of groups rather than students; other databases
+    run the GROUP BY queries. Only the last `days` registration days are
+    included when it is given.
+    """
+    cutoff = days and (datetime.utcnow().date() - timedelta(days=days - 1)).isoformat()
+    if _use_stat_triggers():
+        query = select(StudentStat.dimension, StudentStat.value, StudentStat.count)
+        if cutoff:
+            query = query.where(or_(StudentStat.dimension != 'day', StudentStat.value >= cutoff))
+        rows = db.session.execute(query).all()
+    else:
+        rows = db.session.execute(stat_counts_query()).all()
+
+    stats = {dimension: [] for dimension in STAT_DIMENSIONS}
+    for dimension, value, count in rows:
+        value = str(value)
+        if dimension == 'day' and cutoff and value < cutoff:
+            continue
+        stats[dimension].append((value, count))
+    for dimension, groups in stats.items():
+        if dimension == 'day':
+            groups.sort()
+        else:
+            groups.sort(key=lambda group: (-group[1], group[0]))
+        stats[dimension] = dict(groups)
+    return stats
+
+
+def student_count():
+    if _use_stat_triggers():
+        return db.session.scalar(
+            select(func.coalesce(func.sum(StudentStat.count), 0))
+            .where(StudentStat.dimension == 'gender')
+        )
+    return Student.query.filter(LIVE_STUDENT).count()
+
 
-@app.route('/')
+def encode_cursor(student):
+    """Encode a student's (registration_date, id) sort key as an opaque cursor."""
+    raw = f'{student.registration_date.isoformat()}|{student.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor, aborting with 400 if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        stamp, student_id = raw.split('|')
+        return datetime.fromisoformat(stamp), int(student_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        abort(400)
+
+
+def paginate_students(after=None, before=None, per_page=None, columns=None):
+    """Return one keyset page of students, newest first.
+
+    Pages are addressed by the (registration_date, id) key of a neighbouring
+    row instead of an OFFSET, so every page costs a single index range scan
+    no matter how deep into the listing it is.
+
+    With `columns`, only those columns (plus the sort key) are selected and
+    plain rows are returned instead of Student instances.
+    """
+    per_page = per_page or current_app.config['STUDENTS_PER_PAGE']
+    sort_key = tuple_(Student.registration_date, Student.id)
+    if columns is None:
+        query = select(Student)
+    else:
+        selected = {column.key for column in columns}
+        sort_columns = (Student.registration_date, Student.id)
+        query = select(*columns, *(c for c in sort_columns if c.key not in selected))
+    query = query.where(LIVE_STUDENT)
+
+    if before:
+        query = query.where(sort_key > tuple_(*decode_cursor(before)))
+        query = query.order_by(Student.registration_date.asc(), Student.id.asc())
+    else:
+        if after:
+            query = query.where(sort_key < tuple_(*decode_cursor(after)))
+        query = query.order_by(Student.registration_date.desc(), Student.id.desc())
+
+    query = query.limit(per_page + 1)
+    if columns is None:
+        rows = db.session.scalars(query).all()
+    else:
+        rows = db.session.execute(query).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if before:
+        rows.reverse()
+        has_newer, has_older = has_more, True
+    else:
+        has_newer, has_older = bool(after), has_more
+
+    return {
+        'students': rows,
+        'next_cursor': encode_cursor(rows[-1]) if rows and has_older else None,
+        'prev_cursor': encode_cursor(rows[0]) if rows and has_newer else None,
+    }
+
+class StreamedPage:
+    """One newer-to-older keyset page of students, read while it is rendered.
+
+    Rows come from a yield_per query, so only one chunk of them is held at
+    a time. The first row is fetched up front so the template can tell an
+    empty page from a full one. Whether older students follow is only
+    known once iteration has finished, which is where students.html reads
+    `next_url`.
+    """
+
+    def __init__(self, after, per_page):
+        query = (select(Student).where(LIVE_STUDENT)
+                 .order_by(Student.registration_date.desc(), Student.id.desc()))
+        if after:
+            sort_key = tuple_(Student.registration_date, Student.id)
+            query = query.where(sort_key < tuple_(*decode_cursor(after)))
+        chunk = current_app.config['STUDENTS_STREAM_CHUNK']
+        self._rows = iter(db.session.scalars(
+            query.limit(per_page + 1).execution_options(yield_per=chunk)
+        ))
+        self._first = next(self._rows, None)
+        self._last = None
+        self._has_more = False
+        self.per_page = per_page
+        self.prev_url = self._first is not None and after and url_for(
+            'students', before=encode_cursor(self._first), per_page=per_page
+        )
+
+    def __bool__(self):
+        return self._first is not None
+
+    def __iter__(self):
+        rows = chain([self._first], self._rows) if self else ()
+        for count, student in enumerate(rows, start=1):
+            if count > self.per_page:
+                self._has_more = True
+                break
+            self._last = student
+            yield student
+
+    @property
+    def next_url(self):
+        return self._has_more and url_for(
+            'students', after=encode_cursor(self._last), per_page=self.per_page
+        )
+
+
+def stream_page(template_name, cache_key=None, **context):
+    """Render a template in buffered chunks as they are produced.
+
+    before_render_template and template_rendered are sent around the
+    iteration, as render_template sends them around rendering. With
+    `cache_key`, the chunks are also joined into the page cache once the
+    whole page has been sent; a disabled cache keeps memory bounded by the
+    chunk size.
+    """
+    app = current_app._get_current_object()
+    app.update_template_context(context)
+    template = app.jinja_env.get_template(template_name)
+    stream = template.stream(context)
+    stream.enable_buffering(app.config['STREAM_BUFFER_EVENTS'])
+    cache = page_cache()
+    keep = cache_key is not None and not isinstance(cache, NullCache)
+
+    def generate():
+        before_render_template.send(app, template=template, context=context)
+        chunks = []
+        for chunk in stream:
+            if keep:
+                chunks.append(chunk)
+            yield chunk
+        template_rendered.send(app, template=template, context=context)
+        if keep:
+            cache.set(cache_key, ''.join(chunks))
+    return generate()
+
+
+def page_cache():
+    return current_app.extensions['page_cache']
+
+
+def listing_cache_key(version):
+    # Every listing page shows the total, so any write invalidates all of
+    # them. Keying on the change counter does that without tracking each
+    # cached URL; superseded pages simply age out of the LRU.
+    return f'students:{version}:{request.full_path}'
+
+
+def success_cache_key(student_id, registered):
+    # Keyed by the row's validator too: SQLite reuses the id of a deleted
+    # last row, and other workers' caches never hear of the delete.
+    return f'success:{student_id}:{registered.timestamp():.6f}'
+
+
+def email_index():
+    return current_app.extensions['email_index']
+
+
+def registered_emails():
+    return db.session.scalars(select(Student.email).execution_options(yield_per=5000))
+
+
+def refresh_email_index():
+    """Load the filter on a worker's first request, and reload it once
+    deletions or growth have degraded it.
+
+    Only one thread scans the table; concurrent requests go on with the
+    filter as it is, or check the database directly until it is loaded.
+    """
+    email_index().refresh(registered_emails)
+
+
+def warm_email_index_on_request():
+    try:
+        refresh_email_index()
+    except OperationalError:
+        # No schema yet; duplicate checks fall back to the database.
+        db.session.rollback()
+
+
+def existing_emails(emails):
+    """Return which of the normalized `emails` are already registered.
+
+    Only emails the filter might contain are looked up, so a batch of new
+    addresses needs no query at all.
+    """
+    index = email_index()
+    refresh_email_index()
+    candidates = [email for email in emails if index.might_contain(email)]
+    if not candidates:
+        return set()
+    return set(db.session.scalars(
+        select(Student.email).where(Student.email.in_(candidates), LIVE_STUDENT)
+    ))
+
+
+def release_deleted_emails(emails):
+    """Purge soft-deleted students still holding any of `emails` under the
+    unique constraint.
+
+    Call it in the transaction that inserts the new rows, so a rollback
+    undoes both and a retry releases them again. While SOFT_DELETE is on
+    every email is released: the filter is per worker and may not have
+    seen a student another worker registered and deleted. Otherwise only
+    emails the filter might contain are, so new addresses cost no statement.
+    """
+    if current_app.config['SOFT_DELETE']:
+        candidates = list(emails)
+    else:
+        index = email_index()
+        candidates = [email for email in emails if index.might_contain(email)]
+    if candidates:
+        db.session.execute(
+            delete(Student).where(Student.email.in_(candidates), Student.deleted_at.is_not(None))
+        )
+
+
+def _http_datetime(value):
+    return value.replace(microsecond=0, tzinfo=timezone.utc)
+
+
+def not_modified(etag, last_modified):
+    """Return a 304 response if the request's validators still match, else None.
+
+    If-None-Match takes precedence over If-Modified-Since, as RFC 9110 requires.
+    """
+    if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(etag)
+    elif request.if_modified_since:
+        fresh = _http_datetime(last_modified) <= request.if_modified_since
+    else:
+        fresh = False
+    if not fresh:
+        return None
+    return with_validators(Response(status=304), etag, last_modified)
+
+
+def with_validators(response, etag, last_modified):
+    response.set_etag(etag, weak=True)
+    response.last_modified = _http_datetime(last_modified)
+    # Let browsers and proxies keep the page but revalidate on every use.
+    response.cache_control.no_cache = True
+    return response
+
+
+@route('/')
 def index():
-    return render_template('index.html')
+    return render_template('index.html', idempotency_key=uuid.uuid4().hex)
+
+# Endpoints that register students, and so are admission controlled.
+RATE_LIMITED_ENDPOINTS = {'register', 'api_create_student'}
+
+
+def submitted_email():
+    if request.endpoint == 'api_create_student':
+        payload = request.get_json(silent=True)
+        email = payload.get('email') if isinstance(payload, dict) else None
+    else:
+        email = request.form.get('email')
+    return normalize_email(email) if isinstance(email, str) else None
+
+
+def too_many_requests(message, retry_after):
+    retry_after = max(1, math.ceil(retry_after))
+    if request.endpoint == 'api_create_student':
+        response = api_error(message, 429)
+        response.headers['Retry-After'] = str(retry_after)
+        return response
+    abort(429, description=message, retry_after=retry_after)
+
+
+def admit_registration():
+    """Turn registrations away before they reach the database when over a limit."""
+    if request.endpoint not in RATE_LIMITED_ENDPOINTS:
+        return None
+    concurrency = current_app.extensions['register_concurrency']
+    if concurrency is not None:
+        if not concurrency.acquire():
+            return too_many_requests('Too many registrations in progress; try again shortly.', 1)
+        g.register_slot = concurrency
+    store = current_app.extensions['rate_limit_store']
+    for limit, key in current_app.extensions['register_rate_limits']:
+        value = key()
+        if value is None:
+            continue
+        retry_after = store.take(f'{limit.name}:{value}', limit)
+        if retry_after is not None:
+            return too_many_requests('Too many registration attempts; try again later.',
+                                     retry_after)
+    return None
+
+
+def release_registration_slot(exc):
+    slot = g.pop('register_slot', None)
+    if slot is not None:
+        slot.release()
+
+
+def install_admission_control(app):
+    """Rate limit and cap concurrent registrations."""
+    config = app.config
+    limits = [
+        (parse_limit('ip', config['REGISTER_RATE_LIMIT_IP']), lambda: request.remote_addr),
+        (parse_limit('email', config['REGISTER_RATE_LIMIT_EMAIL']), submitted_email),
+    ]
+    app.extensions['register_rate_limits'] = [(limit, key) for limit, key in limits if limit]
+    app.extensions['rate_limit_store'] = make_store(
+        config['RATE_LIMIT_STORE'],
+        config['RATE_LIMIT_PATH'] or os.path.join(app.instance_path, 'rate_limit.db'),
+    )
+    maximum = config['REGISTER_MAX_CONCURRENT']
+    app.extensions['register_concurrency'] = ConcurrencyLimit(maximum) if maximum else None
+    app.before_request(admit_registration)
+    app.teardown_request(release_registration_slot)
+
+
+_IDEMPOTENCY_KEY = re.compile(r'[A-Za-z0-9_-]{1,128}')
+
+
+def idempotency_key():
+    """The client's key for this submission, if it sent a usable one."""
+    key = request.headers.get('Idempotency-Key') or request.form.get('idempotency_key')
+    if key and _IDEMPOTENCY_KEY.fullmatch(key):
+        return f'register:{key}'
+    return None
+
+
+def remember_registration(key, email, location, message=None):
+    if key is not None:
+        current_app.extensions['idempotency_cache'].set(
+            key, {'email': email, 'location': location, 'message': message})
+
+
+def replayed_registration(key):
+    """The original response to a resubmitted registration, or None.
+
+    A key only replays the registration it was first used for, so a
+    reused key with another email is registered as usual.
+    """
+    if key is None:
+        return None
+    entry = current_app.extensions['idempotency_cache'].get(key)
+    if entry is None or entry['email'] != submitted_email():
+        return None
+    if entry['message']:
+        flash(entry['message'], 'success')
+    return redirect(entry['location'])
 
-@app.route('/register', methods=['POST'])
+
+def duplicate_registration(key):
+    # A retry that raced the original sees its email as taken; once the
+    # original has finished, answer as it did.
+    replayed = replayed_registration(key)
+    if replayed is not None:
+        return replayed
+    flash('A student with this email already exists!', 'error')
+    return redirect(url_for('index'))
+
+
+def replay_registration():
+    """Answer a resubmitted registration before it is rate limited or run."""
+    if request.endpoint != 'register':
+        return None
+    return replayed_registration(idempotency_key())
+
+
+def install_idempotency(app):
+    """Remember registrations by idempotency key; call before admission control."""
+    app.extensions['idempotency_cache'] = make_cache(
+        app.config['IDEMPOTENCY_CACHE_BACKEND'],
+        max_entries=app.config['IDEMPOTENCY_MAX_ENTRIES'],
+        default_ttl=app.config['IDEMPOTENCY_TTL'],
+        directory=(app.config['IDEMPOTENCY_CACHE_DIR']
+                   or os.path.join(app.instance_path, 'idempotency')),
+    )
+    app.before_request(replay_registration)
+
+
+@route('/register', methods=['POST'])
 def register():
+    key = idempotency_key()
+    writer = current_app.extensions.get('registration_queue')
+    if writer is not None:
+        return queue_registration(writer, key)
     try:
         first_name = request.form['first_name']
         last_name = request.form['last_name']
-        email = request.form['email']
+        email = normalize_email(request.form['email'])
         phone = request.form['phone']
         dob_str = request.form['date_of_birth']
         gender = request.form['gender']
@@ -48,10 +1031,8 @@ def register():
 
         date_of_birth = datetime.strptime(dob_str, '%Y-%m-%d').date()
 
-        existing_student = Student.query.filter_by(email=email).first()
-        if existing_student:
-            flash('A student with this email already exists!', 'error')
-            return redirect(url_for('index'))
+        if existing_emails([email]):
+            return duplicate_registration(key)
 
         new_student = Student(
             first_name=first_name,
@@ -65,34 +1046,1178 @@ def register():
             course=course
         )
 
+        release_deleted_emails([email])
         db.session.add(new_student)
+        record_student_change()
         db.session.commit()
+        email_index().add(email)
 
+        location = url_for('success', student_id=new_student.id)
+        remember_registration(key, email, location, 'Registration successful!')
         flash('Registration successful!', 'success')
-        return redirect(url_for('success', student_id=new_student.id))
+        return redirect(location)
 
+    except IntegrityError:
+        # Registered by another worker since our filter was loaded.
+        db.session.rollback()
+        return duplicate_registration(key)
     except Exception as e:
         flash(f'Registration failed: {str(e)}', 'error')
         return redirect(url_for('index'))
 
-@app.route('/success/<int:student_id>')
+def queue_registration(writer, key=None):
+    try:
+        values = parse_student_row(request.form)
+    except ValueError as e:
+        flash(f'Registration failed: {e}', 'error')
+        return redirect(url_for('index'))
+    values['date_of_birth'] = values['date_of_birth'].isoformat()
+    ticket = writer.submit(values)
+    # A resubmission follows the same ticket instead of queueing again.
+    location = url_for('registration_status', ticket=ticket)
+    remember_registration(key, values['email'], location)
+    return redirect(location)
+
+
+def write_registrations(batch):
+    """Write queued registrations in one transaction; return a result per entry.
+
+    Existing emails are found with at most one IN query and the remaining
+    rows go in one executemany. If the batch still conflicts with a concurrent
+    write, rows are retried one at a time so only the duplicates fail.
+    """
+    results = [None] * len(batch)
+    valid = {}
+    for index, raw in enumerate(batch):
+        try:
+            values = parse_student_row(raw)
+        except ValueError as e:
+            results[index] = (FAILED, f'Registration failed: {e}')
+            continue
+        if values['email'] in valid:
+            results[index] = (FAILED, 'A student with this email already exists!')
+            continue
+        valid[values['email']] = (index, values)
+
+    for email in existing_emails(list(valid)):
+        results[valid.pop(email)[0]] = (FAILED, 'A student with this email already exists!')
+
+    records = list(valid.values())
+    statement = insert(Student).returning(Student.id, sort_by_parameter_order=True)
+    retry = []
+    if records:
+        try:
+            release_deleted_emails([values['email'] for _, values in records])
+            ids = db.session.scalars(statement, [values for _, values in records]).all()
+            record_student_change()
+            db.session.commit()
+            for (index, _), student_id in zip(records, ids):
+                results[index] = (DONE, student_id)
+        except IntegrityError:
+            db.session.rollback()
+            retry = records
+    for index, values in retry:
+        try:
+            release_deleted_emails([values['email']])
+            student_id = db.session.scalars(statement, [values]).one()
+            record_student_change()
+            db.session.commit()
+            results[index] = (DONE, student_id)
+        except IntegrityError:
+            db.session.rollback()
+            results[index] = (FAILED, 'A student with this email already exists!')
+
+    email_index().add(*(values['email'] for index, values in valid.values()
+                        if results[index][0] == DONE))
+    return results
+
+
+def make_registration_queue(app):
+    spool = make_spool(
+        app.config['REGISTRATION_SPOOL'],
+        app.config['REGISTRATION_SPOOL_PATH'] or os.path.join(app.instance_path, 'registrations.db'),
+    )
+
+    def write_batch(batch):
+        with app.app_context():
+            return write_registrations(batch)
+
+    writer = GroupCommitWriter(
+        spool, write_batch,
+        max_batch=app.config['REGISTRATION_BATCH_SIZE'],
+        flush_interval=app.config['REGISTRATION_FLUSH_MS'] / 1000,
+    )
+    # Flush what is still queued on a clean shutdown.
+    atexit.register(writer.close)
+    return writer
+
+
+@route('/registrations/<ticket>')
+def registration_status(ticket):
+    writer = current_app.extensions.get('registration_queue')
+    status = writer and writer.status(ticket)
+    if status is None:
+        abort(404)
+    state, payload = status
+    if state == DONE:
+        flash('Registration successful!', 'success')
+        return redirect(url_for('success', student_id=payload))
+    if state == FAILED:
+        flash(payload, 'error')
+        return redirect(url_for('index'))
+    refresh = max(1, round(writer.flush_interval * 2))
+    response = make_response(render_template('pending.html', ticket=ticket, refresh=refresh), 202)
+    response.headers['Retry-After'] = str(refresh)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+@route('/success/<int:student_id>')
 def success(student_id):
-    student = Student.query.get_or_404(student_id)
-    return render_template('success.html', student=student)
+    # The page only depends on this student's row, so its validators come
+    # from a primary-key read of registration_date.
+    registered = db.session.scalar(
+        select(Student.registration_date).where(Student.id == student_id, LIVE_STUDENT)
+    )
+    if registered is None:
+        abort(404)
+    etag = f'{student_id}-{registered.timestamp():.6f}'
+    cached = not_modified(etag, registered)
+    if cached is not None:
+        return cached
+
+    key = success_cache_key(student_id, registered)
+    html = page_cache().get(key)
+    if html is None:
+        student = Student.query.get_or_404(student_id)
+        html = render_template('success.html', student=student)
+        page_cache().set(key, html)
+    return with_validators(make_response(html), etag, registered)
 
-@app.route('/students')
+@route('/students')
 def students():
-    all_students = Student.query.order_by(Student.registration_date.desc()).all()
-    return render_template('students.html', students=all_students)
+    per_page = request.args.get('per_page', type=int) or current_app.config['STUDENTS_PER_PAGE']
+    per_page = max(1, min(per_page, current_app.config['STUDENTS_MAX_PER_PAGE']))
+    version, changed_at = student_changes()
+    etag = f'students-{version}'
+    cached = not_modified(etag, changed_at)
+    if cached is not None:
+        return cached
+
+    key = listing_cache_key(version)
+    html = page_cache().get(key)
+    if html is not None:
+        return with_validators(make_response(html), etag, changed_at)
+    before = request.args.get('before')
+    if current_app.config['STUDENTS_STREAM'] and not before:
+        # Older-to-newer pages are read in reverse, so only forward pages
+        # can be rendered while their rows are still being fetched.
+        page = StreamedPage(request.args.get('after'), per_page)
+        body = stream_page('students.html', cache_key=key, students=page,
+                           total=student_count(), prev_url=page.prev_url, next_url=None)
+        response = Response(stream_with_context(body), mimetype='text/html')
+        return with_validators(response, etag, changed_at)
+    page = paginate_students(
+        after=request.args.get('after'),
+        before=before,
+        per_page=per_page,
+    )
+    html = render_template(
+        'students.html',
+        students=page['students'],
+        total=student_count(),
+        prev_url=page['prev_cursor'] and url_for('students', before=page['prev_cursor'], per_page=per_page),
+        next_url=page['next_cursor'] and url_for('students', after=page['next_cursor'], per_page=per_page),
+    )
+    page_cache().set(key, html)
+    return with_validators(make_response(html), etag, changed_at)
+
+def remove_students(*conditions):
+    """Delete the live students matching `conditions` in one statement.
+
+    With SOFT_DELETE the rows are only marked and the purger removes them
+    later. Returns the (id, email) of each removed student; the caller
+    commits and then calls students_removed().
+    """
+    if current_app.config['SOFT_DELETE']:
+        statement = update(Student).values(deleted_at=datetime.utcnow())
+        current_app.extensions['student_purger'].start()
+    else:
+        statement = delete(Student)
+    rows = db.session.execute(
+        statement.where(LIVE_STUDENT, *conditions).returning(Student.id, Student.email)
+    ).all()
+    if rows:
+        record_student_change()
+    return rows
+
+
+def students_removed(rows):
+    email_index().discard(*(email for _, email in rows))
+
+
+def bulk_delete_students(ids=None, course=None, registered_from=None, registered_to=None,
+                         batch_size=None):
+    """Delete students by id or by filter, batch_size rows per transaction.
+
+    Every batch is one set-based statement followed by a commit, so other
+    writers wait for at most one batch. Returns how many were removed.
+    """
+    batch_size = batch_size or current_app.config['DELETE_BATCH_SIZE']
+    conditions = []
+    if course:
+        conditions.append(Student.course == course)
+    if registered_from:
+        conditions.append(Student.registration_date >= registered_from)
+    if registered_to:
+        conditions.append(Student.registration_date < registered_to + timedelta(days=1))
+    if not ids and not conditions:
+        raise ValueError('give student ids or at least one filter')
+
+    removed = 0
+    if ids:
+        batches = (ids[start:start + batch_size] for start in range(0, len(ids), batch_size))
+    else:
+        batches = iter(lambda: db.session.scalars(
+            select(Student.id).where(LIVE_STUDENT, *conditions).limit(batch_size)
+        ).all(), [])
+    for batch in batches:
+        rows = remove_students(Student.id.in_(batch), *conditions)
+        db.session.commit()
+        students_removed(rows)
+        removed += len(rows)
+    return removed
+
 
-@app.route('/students/<int:student_id>/delete', methods=['POST'])
+def purge_deleted_students(batch_size=None):
+    """Remove soft-deleted students, batch_size rows per short transaction."""
+    batch_size = batch_size or current_app.config['DELETE_BATCH_SIZE']
+    purged = 0
+    while True:
+        ids = db.session.scalars(
+            select(Student.id).where(Student.deleted_at.is_not(None)).limit(batch_size)
+        ).all()
+        if not ids:
+            return purged
+        purged += db.session.execute(
+            delete(Student).where(Student.id.in_(ids), Student.deleted_at.is_not(None))
+        ).rowcount
+        db.session.commit()
+
+
+class StudentPurger:
+    """Daemon thread that purges soft-deleted students every `interval` seconds.
+
+    It is started by the first soft delete, so apps that never soft-delete
+    never run it.
+    """
+
+    def __init__(self, app, interval):
+        self.app = app
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='student-purger',
+                                                daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self.app.app_context():
+                try:
+                    purge_deleted_students()
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception('purging deleted students failed')
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+@route('/students/<int:student_id>/delete', methods=['POST'])
 def delete_student(student_id):
-    student = Student.query.get_or_404(student_id)
-    db.session.delete(student)
+    rows = remove_students(Student.id == student_id)
+    if not rows:
+        abort(404)
     db.session.commit()
+    students_removed(rows)
     flash('Student deleted successfully!', 'success')
     return redirect(url_for('students'))
 
+
+def parse_bulk_delete_request():
+    """Read ids and filters from a JSON body or form for bulk_delete_students."""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        data = request.form.to_dict()
+        data['ids'] = ','.join(request.form.getlist('ids'))
+    ids = data.get('ids') or []
+    if isinstance(ids, str):
+        ids = [part for part in ids.replace(',', ' ').split()]
+    try:
+        ids = [int(student_id) for student_id in ids]
+        dates = {name: data.get(name) and datetime.strptime(data[name], '%Y-%m-%d')
+                 for name in ('registered_from', 'registered_to')}
+    except (TypeError, ValueError):
+        raise ValueError('ids must be integers and dates YYYY-MM-DD')
+    return dict(dates, ids=ids, course=data.get('course'))
+
+
+@route('/students/bulk-delete', methods=['POST'])
+def bulk_delete_students_request():
+    try:
+        deleted = bulk_delete_students(**parse_bulk_delete_request())
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(deleted=deleted, soft=current_app.config['SOFT_DELETE'])
+
+
+@cli_command('delete-students')
+@click.option('--id', 'ids', type=int, multiple=True, help='Student id; repeat for several.')
+@click.option('--course', help='Delete students in this course.')
+@click.option('--from', 'registered_from', type=click.DateTime(['%Y-%m-%d']),
+              help='Registered on or after this date.')
+@click.option('--to', 'registered_to', type=click.DateTime(['%Y-%m-%d']),
+              help='Registered on or before this date.')
+@click.option('--batch-size', type=int, help='Rows per transaction.')
+def delete_students_command(ids, course, registered_from, registered_to, batch_size):
+    """Delete students by id or by course and registration date range."""
+    try:
+        deleted = bulk_delete_students(list(ids), course, registered_from, registered_to,
+                                       batch_size)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    print(f'Deleted {deleted} students.')
+
+
+@cli_command('purge-students')
+@click.option('--batch-size', type=int, help='Rows per transaction.')
+def purge_students_command(batch_size):
+    """Remove soft-deleted students now instead of waiting for the purger."""
+    print(f'Purged {purge_deleted_students(batch_size)} students.')
+
+STUDENT_FIELDS = ('first_name', 'last_name', 'email', 'phone', 'date_of_birth',
+                  'gender', 'address', 'city', 'course')
+
+
+def parse_student_row(row):
+    """Validate one imported record and return column values for Student.
+
+    Raises ValueError describing the first problem found. Emails are
+    normalized.
+    """
+    if not isinstance(row, dict):
+        raise ValueError('record is not an object')
+    values = {}
+    for field in STUDENT_FIELDS:
+        value = row.get(field)
+        value = str(value).strip() if value is not None else ''
+        if not value:
+            raise ValueError(f'missing {field}')
+        values[field] = value
+    try:
+        values['date_of_birth'] = datetime.strptime(values['date_of_birth'], '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError('date_of_birth must be YYYY-MM-DD')
+    values['email'] = normalize_email(values['email'])
+    return values
+
+
+def iter_import_rows(stream, fmt):
+    """Yield (row_number, record) pairs from a CSV or JSON Lines text stream.
+
+    Records are parsed one line at a time so arbitrarily large uploads never
+    have to fit in memory. Unparseable JSON lines are yielded as the error
+    message string so they can be reported against their row.
+    """
+    if fmt == 'csv':
+        for number, row in enumerate(csv.DictReader(stream), start=1):
+            yield number, row
+    elif fmt == 'json':
+        number = 0
+        for line in stream:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                yield number, json.loads(line)
+            except ValueError as e:
+                yield number, f'invalid JSON: {e}'
+    else:
+        raise ValueError(f'unsupported import format: {fmt}')
+
+
+def _insert_chunk(records):
+    """Insert a chunk in one executemany, falling back to row-by-row on conflict.
+
+    Returns a list of (row_number, error) for rows that could not be inserted.
+    """
+    try:
+        release_deleted_emails([values['email'] for _, values in records])
+        db.session.execute(insert(Student), [values for _, values in records])
+        record_student_change()
+        db.session.commit()
+        return []
+    except IntegrityError:
+        db.session.rollback()
+
+    errors = []
+    for number, values in records:
+        try:
+            release_deleted_emails([values['email']])
+            db.session.execute(insert(Student), [values])
+            record_student_change()
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            errors.append((number, 'a student with this email already exists'))
+    return errors
+
+
+def import_students(rows, batch_size=None):
+    """Bulk insert (row_number, record) pairs in chunked transactions.
+
+    Each chunk is validated, checked for existing emails with at most one IN
+    query and inserted with one executemany. Bad rows are reported and
+    skipped without aborting the rest of the load.
+    """
+    batch_size = batch_size or current_app.config['IMPORT_BATCH_SIZE']
+    max_errors = current_app.config['IMPORT_MAX_ERRORS']
+    report = {'processed': 0, 'inserted': 0, 'error_count': 0, 'errors': []}
+
+    def record_error(number, message):
+        report['error_count'] += 1
+        if len(report['errors']) < max_errors:
+            report['errors'].append({'row': number, 'error': message})
+
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            break
+        report['processed'] += len(chunk)
+
+        valid = {}
+        for number, row in chunk:
+            if isinstance(row, str):
+                record_error(number, row)
+                continue
+            try:
+                values = parse_student_row(row)
+            except ValueError as e:
+                record_error(number, str(e))
+                continue
+            if values['email'] in valid:
+                record_error(number, 'duplicate email in upload')
+                continue
+            valid[values['email']] = (number, values)
+
+        for email in existing_emails(list(valid)):
+            record_error(valid.pop(email)[0], 'a student with this email already exists')
+
+        records = list(valid.values())
+        if records:
+            failed = _insert_chunk(records)
+            for number, message in failed:
+                record_error(number, message)
+            report['inserted'] += len(records) - len(failed)
+            email_index().add(*valid)
+
+    report['errors'].sort(key=lambda error: error['row'])
+    return report
+
+
+def detect_import_format(filename, mimetype):
+    if (filename or '').lower().endswith(('.json', '.jsonl', '.ndjson')) or 'json' in (mimetype or ''):
+        return 'json'
+    return 'csv'
+
+
+@route('/students/import', methods=['POST'])
+def import_students_upload():
+    upload = request.files.get('file')
+    if upload is not None:
+        binary = upload.stream
+        fmt = request.args.get('format') or detect_import_format(upload.filename, upload.mimetype)
+    else:
+        binary = request.stream
+        fmt = request.args.get('format') or detect_import_format(None, request.mimetype)
+    if fmt not in ('csv', 'json'):
+        return jsonify(error=f'unsupported import format: {fmt}'), 400
+
+    stream = io.TextIOWrapper(binary, encoding='utf-8-sig', newline='')
+    try:
+        report = import_students(iter_import_rows(stream, fmt))
+    except (UnicodeDecodeError, csv.Error) as e:
+        db.session.rollback()
+        return jsonify(error=f'could not read upload: {e}'), 400
+    finally:
+        stream.detach()
+    return jsonify(report)
+
+
+@cli_command('import-students')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'json']),
+              help='Input format; defaults to the file extension.')
+@click.option('--batch-size', type=int, help='Rows per transaction.')
+def import_students_command(path, fmt, batch_size):
+    """Bulk import students from a CSV or JSON Lines file."""
+    fmt = fmt or detect_import_format(path, None)
+    with open(path, encoding='utf-8-sig', newline='') as stream:
+        report = import_students(iter_import_rows(stream, fmt), batch_size=batch_size)
+    print(f"Processed {report['processed']} rows: {report['inserted']} inserted, "
+          f"{report['error_count']} errors.")
+    for error in report['errors']:
+        print(f"  row {error['row']}: {error['error']}")
+
+
+EXPORT_COLUMNS = ('id',) + STUDENT_FIELDS + ('registration_date',)
+
+
+def parse_date_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        abort(400)
+
+
+def export_rows(course=None, registered_from=None, registered_to=None):
+    """Yield plain column rows in /students order from a server-side cursor.
+
+    Rows are fetched EXPORT_CHUNK_SIZE at a time and never become ORM
+    instances, so memory use does not grow with the table.
+    """
+    columns = [Student.__table__.c[name] for name in EXPORT_COLUMNS]
+    query = (select(*columns).where(LIVE_STUDENT)
+             .order_by(Student.registration_date.desc(), Student.id.desc()))
+    if course:
+        query = query.where(Student.course == course)
+    if registered_from:
+        query = query.where(Student.registration_date >= registered_from)
+    if registered_to:
+        query = query.where(Student.registration_date < registered_to + timedelta(days=1))
+    result = db.session.execute(
+        query.execution_options(yield_per=current_app.config['EXPORT_CHUNK_SIZE'])
+    )
+    try:
+        yield from result
+    finally:
+        result.close()
+
+
+def _export_value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def generate_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow([_export_value(value) for value in row])
+        if count % 100 == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def generate_ndjson(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(EXPORT_COLUMNS, map(_export_value, row)))) + '\n'
+
+
+@route('/students/export')
+def export_students():
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'ndjson'):
+        abort(400)
+    rows = export_rows(
+        course=request.args.get('course'),
+        registered_from=parse_date_arg('registered_from'),
+        registered_to=parse_date_arg('registered_to'),
+    )
+    if fmt == 'csv':
+        body, mimetype = generate_csv(rows), 'text/csv'
+    else:
+        body, mimetype = generate_ndjson(rows), 'application/x-ndjson'
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=students.{fmt}'},
+    )
+
+
+API_FIELDS = EXPORT_COLUMNS
+
+
+def parse_fields_arg():
+    """Return the columns named by ?fields=, or every column when absent."""
+    value = request.args.get('fields')
+    names = [name.strip() for name in value.split(',') if name.strip()] if value else list(API_FIELDS)
+    if not names:
+        abort(api_error('fields must name at least one column', 400))
+    unknown = [name for name in names if name not in API_FIELDS]
+    if unknown:
+        abort(api_error(f"unknown fields: {', '.join(unknown)}", 400))
+    return names
+
+
+def serialize_row(row, names):
+    return {name: _export_value(getattr(row, name)) for name in names}
+
+
+def api_error(message, status):
+    response = jsonify(error=message)
+    response.status_code = status
+    return response
+
+
+def api_response(payload, status=200):
+    """Build a JSON response with a weak ETag.
+
+    The compression middleware encodes it, and keeps the compressed body
+    for the ETag so identical listings are compressed once.
+    """
+    body = json.dumps(payload, separators=(',', ':')).encode()
+    response = Response(body, status=status, mimetype='application/json')
+    if status == 200 and request.method == 'GET':
+        # Weak, so the validator stays valid across content encodings.
+        response.set_etag(hashlib.sha1(body).hexdigest(), weak=True)
+        response.make_conditional(request)
+    return response
+
+
+@route('/api/students', methods=['GET'])
+def api_list_students():
+    names = parse_fields_arg()
+    per_page = request.args.get('per_page', type=int) or current_app.config['STUDENTS_PER_PAGE']
+    per_page = max(1, min(per_page, current_app.config['STUDENTS_MAX_PER_PAGE']))
+    page = paginate_students(
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        per_page=per_page,
+        columns=[Student.__table__.c[name] for name in names],
+    )
+    return api_response({
+        'students': [serialize_row(row, names) for row in page['students']],
+        'next_cursor': page['next_cursor'],
+        'prev_cursor': page['prev_cursor'],
+    })
+
+
+@route('/api/students/<int:student_id>', methods=['GET'])
+def api_get_student(student_id):
+    names = parse_fields_arg()
+    columns = [Student.__table__.c[name] for name in names]
+    row = db.session.execute(
+        select(*columns).where(Student.id == student_id, LIVE_STUDENT)
+    ).first()
+    if row is None:
+        return api_error('student not found', 404)
+    return api_response(serialize_row(row, names))
+
+
+@route('/api/students', methods=['POST'])
+def api_create_student():
+    try:
+        values = parse_student_row(request.get_json(silent=True))
+    except ValueError as e:
+        return api_error(str(e), 400)
+    if existing_emails([values['email']]):
+        return api_error('a student with this email already exists', 409)
+    student = Student(**values)
+    try:
+        release_deleted_emails([student.email])
+        db.session.add(student)
+        record_student_change()
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return api_error('a student with this email already exists', 409)
+    email_index().add(student.email)
+    response = api_response(serialize_row(student, API_FIELDS), status=201)
+    response.headers['Location'] = url_for('api_get_student', student_id=student.id)
+    return response
+
+
+@route('/api/students/<int:student_id>', methods=['DELETE'])
+def api_delete_student(student_id):
+    rows = remove_students(Student.id == student_id)
+    if not rows:
+        db.session.rollback()
+        return api_error('student not found', 404)
+    db.session.commit()
+    students_removed(rows)
+    return '', 204
+
+
+def search_terms(query):
+    return re.findall(r'\w+', (query or '').lower())
+
+
+def _use_fts():
+    return db.session.get_bind().dialect.name == 'sqlite'
+
+
+def search_students(query, page=1, per_page=None):
+    """Return (students, has_more) for one page of ranked search results.
+
+    Every term is matched as a prefix of a word in the first name, last name,
+    email, city or course, and all terms must match. On SQLite results come
+    from the FTS5 index ordered by bm25 relevance; other databases fall back
+    to LIKE prefix matching ordered newest first.
+    """
+    per_page = per_page or current_app.config['STUDENTS_PER_PAGE']
+    terms = search_terms(query)
+    if not terms:
+        return [], False
+    offset = (page - 1) * per_page
+
+    if _use_fts():
+        ids = db.session.scalars(
+            # Deleted students are filtered before the LIMIT so pages stay full.
+            text('SELECT student_fts.rowid FROM student_fts '
+                 'JOIN student ON student.id = student_fts.rowid '
+                 'WHERE student_fts MATCH :match AND student.deleted_at IS NULL '
+                 'ORDER BY student_fts.rank LIMIT :limit OFFSET :offset'),
+            {'match': ' '.join(f'"{term}"*' for term in terms),
+             'limit': per_page + 1, 'offset': offset},
+        ).all()
+        found = {s.id: s for s in db.session.scalars(
+            select(Student).where(Student.id.in_(ids), LIVE_STUDENT)
+        )}
+        students = [found[student_id] for student_id in ids if student_id in found]
+    else:
+        columns = [Student.__table__.c[name] for name in SEARCH_COLUMNS]
+        conditions = [or_(*(column.ilike(f'{term}%') for column in columns)) for term in terms]
+        students = db.session.scalars(
+            select(Student).where(LIVE_STUDENT, *conditions)
+            .order_by(Student.registration_date.desc(), Student.id.desc())
+            .limit(per_page + 1).offset(offset)
+        ).all()
+    return students[:per_page], len(students) > per_page
+
+
+def search_page_args():
+    page = max(1, request.args.get('page', 1, type=int))
+    per_page = request.args.get('per_page', type=int) or current_app.config['STUDENTS_PER_PAGE']
+    return page, max(1, min(per_page, current_app.config['STUDENTS_MAX_PER_PAGE']))
+
+
+@route('/students/search')
+def search():
+    query = request.args.get('q', '').strip()
+    page, per_page = search_page_args()
+    results, has_more = search_students(query, page, per_page)
+    return render_template(
+        'students.html',
+        students=results,
+        query=query,
+        prev_url=page > 1 and url_for('search', q=query, page=page - 1, per_page=per_page),
+        next_url=has_more and url_for('search', q=query, page=page + 1, per_page=per_page),
+    )
+
+
+@route('/api/students/search')
+def api_search_students():
+    names = parse_fields_arg()
+    page, per_page = search_page_args()
+    results, has_more = search_students(request.args.get('q'), page, per_page)
+    return api_response({
+        'students': [serialize_row(student, names) for student in results],
+        'page': page,
+        'has_more': has_more,
+    })
+
+
+def stats_days_arg():
+    return max(0, request.args.get('days', current_app.config['STATS_DAYS'], type=int))
+
+
+@route('/stats')
+def stats():
+    days = stats_days_arg()
+    version, changed_at = student_changes()
+    # The day window moves at midnight even when nothing was written.
+    etag = f'stats-{version}-{days}-{datetime.utcnow().date().isoformat()}'
+    cached = not_modified(etag, changed_at)
+    if cached is not None:
+        return cached
+    counts = student_stats(days)
+    html = render_template('stats.html', stats=counts, total=sum(counts['gender'].values()),
+                           days=days)
+    return with_validators(make_response(html), etag, changed_at)
+
+
+@route('/api/stats')
+def api_stats():
+    days = stats_days_arg()
+    counts = student_stats(days)
+    return api_response(dict(counts, total=sum(counts['gender'].values()), days=days))
+
+
+def hashed_static_url(endpoint, values):
+    if endpoint == 'static' and 'filename' in values:
+        manifest = current_app.extensions['asset_manifest']
+        values['filename'] = manifest.get(values['filename'], values['filename'])
+
+
+def serve_static(filename):
+    """Serve a static file; built assets are immutable and sent precompressed."""
+    if filename not in current_app.extensions['built_assets']:
+        return current_app.send_static_file(filename)
+    folder = current_app.static_folder
+    max_age = current_app.config['ASSETS_MAX_AGE']
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if (request.accept_encodings[encoding]
+                and os.path.exists(os.path.join(folder, filename + suffix))):
+            response = send_from_directory(folder, filename + suffix, mimetype=mimetype,
+                                           max_age=max_age)
+            response.content_encoding = encoding
+            break
+    else:
+        response = send_from_directory(folder, filename, mimetype=mimetype, max_age=max_age)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def install_compression(app):
+    """Wrap the WSGI app in response compression."""
+    config = app.config
+    entries = config['COMPRESSION_CACHE_ENTRIES']
+    middleware = CompressionMiddleware(
+        app.wsgi_app,
+        min_size=config['COMPRESSION_MIN_SIZE'],
+        levels={
+            'gzip': config['COMPRESSION_GZIP_LEVEL'],
+            'br': config['COMPRESSION_BROTLI_LEVEL'],
+            'zstd': config['COMPRESSION_ZSTD_LEVEL'],
+        },
+        cache=make_cache('memory' if entries else 'none', max_entries=entries,
+                         default_ttl=config['COMPRESSION_CACHE_TTL']),
+    )
+    app.extensions['compression'] = middleware
+    app.wsgi_app = middleware
+
+
+def load_critical_css(app):
+    """The above-the-fold rules of the app stylesheet, ready to inline."""
+    with open(os.path.join(app.static_folder, 'css', 'style.css')) as f:
+        return Markup(critical_css(f.read()))
+
+
+def use_asset_manifest(app, manifest):
+    app.extensions['asset_manifest'] = manifest
+    app.extensions['built_assets'] = frozenset(manifest.values())
+
+
+@cli_command('build-assets')
+def build_assets_command():
+    """Write hashed, minified and precompressed copies of the static files."""
+    manifest = build_assets(current_app.static_folder, current_app.config['ASSETS_DIR'])
+    use_asset_manifest(current_app, manifest)
+    print(f"Built {len(manifest)} assets into "
+          f"{os.path.join(current_app.static_folder, current_app.config['ASSETS_DIR'])}.")
+
+
+@cli_command('fetch-fonts')
+def fetch_fonts_command():
+    """Download the web fonts into static/ for SELF_HOSTED_FONTS."""
+    written = fetch_fonts(current_app.config['FONTS_STYLESHEET_URL'], current_app.static_folder)
+    print(f'Saved {len(written)} files; run `flask build-assets` to fingerprint them.')
+
+
+def compile_templates(app):
+    """Load every template so it is compiled and stored in the bytecode cache."""
+    names = app.jinja_env.list_templates()
+    for name in names:
+        app.jinja_env.get_template(name)
+    return names
+
+
+@cli_command('compile-templates')
+def compile_templates_command():
+    """Compile all templates into the bytecode cache."""
+    names = compile_templates(current_app)
+    print(f'Compiled {len(names)} templates.')
+
+
+def request_timer():
+    return g.get('request_timer') if has_request_context() else None
+
+
+def start_request_timer():
+    g.request_timer = RequestTimer()
+
+
+def call_once_on_close(response, callback):
+    """Run `callback` when `response` is closed, however many times that is.
+
+    Servers close a response once, but wrappers such as the test client may
+    close it again.
+    """
+    pending = [callback]
+
+    def close():
+        if pending:
+            pending.pop()()
+    response.call_on_close(close)
+
+
+def finish_request_timer(response):
+    timer = g.request_timer
+    elapsed = timer.elapsed()
+    registry = current_app.extensions['metrics']
+    instrumentation = current_app.extensions.get('instrumentation')
+    endpoint = request.endpoint or 'unmatched'
+    method, status = request.method, response.status_code
+
+    def record(elapsed):
+        registry.observe_request(endpoint, method, status, elapsed)
+        if instrumentation is not None:
+            instrumentation.record(endpoint, timer)
+
+    if response.is_streamed:
+        # A streamed body keeps querying and rendering into the same timer
+        # while it is sent, so it is recorded once the server closes it. The
+        # Server-Timing header can only cover the work before the headers.
+        call_once_on_close(response, lambda: record(timer.elapsed()))
+    else:
+        record(elapsed)
+    collector = current_app.extensions['metrics_collector']
+    if collector is not None:
+        collector.start()
+    if instrumentation is not None and current_app.config['SERVER_TIMING']:
+        response.headers['Server-Timing'] = server_timing(timer, elapsed)
+    return response
+
+
+def sql_started(conn, cursor, statement, parameters, context, executemany):
+    timer = request_timer()
+    if timer is not None:
+        timer.sql_started()
+
+
+def sql_finished(conn, cursor, statement, parameters, context, executemany):
+    timer = request_timer()
+    if timer is not None:
+        timer.sql_finished()
+
+
+def template_started(sender, template, context, **extra):
+    timer = request_timer()
+    if timer is not None:
+        timer.template_started()
+
+
+def template_finished(sender, template, context, **extra):
+    timer = request_timer()
+    if timer is not None:
+        timer.template_finished()
+
+
+def instrument_app(app):
+    """Time the SQL and templates of the requests install_metrics times. Needs an app context."""
+    app.extensions['instrumentation'] = Instrumentation(app.extensions['metrics'])
+    event.listen(db.engine, 'before_cursor_execute', sql_started)
+    event.listen(db.engine, 'after_cursor_execute', sql_finished)
+    before_render_template.connect(template_started, app)
+    template_rendered.connect(template_finished, app)
+
+
+def pool_gauges(pool):
+    """Connection pool occupancy; pools without a fixed size report nothing."""
+    if not isinstance(pool, QueuePool):
+        return {}
+    return {
+        'db_pool_size': pool.size(),
+        'db_pool_checked_in': pool.checkedin(),
+        'db_pool_checked_out': pool.checkedout(),
+        'db_pool_overflow': pool.overflow(),
+    }
+
+
+def install_metrics(app):
+    """Time and count every request once, for /metrics and /timings. Needs an app context."""
+    registry = app.extensions['metrics'] = MetricsRegistry()
+    collector = None
+    if app.config['METRICS'] and app.config['METRICS_DIR']:
+        engine = db.engine
+        collector = FileCollector(registry, app.config['METRICS_DIR'],
+                                  app.config['METRICS_FLUSH_INTERVAL'],
+                                  gauges=lambda: pool_gauges(engine.pool))
+        atexit.register(collector.stop)
+    app.extensions['metrics_collector'] = collector
+    app.before_request(start_request_timer)
+    app.after_request(finish_request_timer)
+
+
+@route('/metrics')
+def metrics():
+    if not current_app.config['METRICS']:
+        abort(404)
+    registry = current_app.extensions['metrics']
+    collector = current_app.extensions['metrics_collector']
+    if collector is None:
+        totals = registry.snapshot()
+        process_gauges = {str(os.getpid()): pool_gauges(db.engine.pool)}
+    else:
+        totals, process_gauges = collector.collect()
+    body = render_metrics(totals, registry.buckets, process_gauges,
+                          {'registered_students': student_count()})
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+
+def current_endpoint():
+    return request.endpoint if has_request_context() else None
+
+
+def request_query_counts():
+    return g.setdefault('query_counts', Counter()) if has_request_context() else None
+
+
+def report_repeated_queries(response):
+    detector = current_app.extensions['repeated_queries']
+    if response.is_streamed:
+        # Streamed bodies keep querying while they are sent, into this
+        # same Counter; check it once the server closes the response.
+        counts = g.setdefault('query_counts', Counter())
+        endpoint = request.endpoint
+        call_once_on_close(response, lambda: detector.check(counts, endpoint))
+        return response
+    counts = g.pop('query_counts', None)
+    if counts:
+        detector.check(counts, request.endpoint)
+    return response
+
+
+def install_query_log(app):
+    """Attach the slow-query log and N+1 detector to the engine. Needs an app context."""
+    if app.config['SLOW_QUERY_MS'] > 0:
+        app.extensions['slow_queries'] = SlowQueryLog(
+            app.config['SLOW_QUERY_MS'] / 1000, explain=app.config['SLOW_QUERY_EXPLAIN'],
+            endpoint=current_endpoint,
+        )
+        app.extensions['slow_queries'].install(db.engine)
+    if app.config['DETECT_REPEATED_QUERIES'] or app.debug:
+        app.extensions['repeated_queries'] = RepeatedQueryDetector(
+            app.config['REPEATED_QUERY_THRESHOLD'], request_query_counts,
+        )
+        app.extensions['repeated_queries'].install(db.engine)
+        app.after_request(report_repeated_queries)
+
+
+@route('/timings')
+def timings():
+    instrumentation = current_app.extensions.get('instrumentation')
+    if instrumentation is None:
+        abort(404)
+    return jsonify(instrumentation.snapshot())
+
+
+def create_app(config=None):
+    """Build the application.
+
+    Creating an app does not touch the database; run `flask db-upgrade` to
+    create or migrate the schema.
+    """
+    app = Flask(__name__)
+    app.config.from_mapping(default_config())
+    app.config.from_mapping(config or {})
+    app.config.setdefault(
+        'SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+    )
+
+    app.extensions['page_cache'] = make_cache(
+        app.config['PAGE_CACHE_BACKEND'],
+        max_entries=app.config['PAGE_CACHE_MAX_ENTRIES'],
+        default_ttl=app.config['PAGE_CACHE_TTL'],
+        directory=app.config['PAGE_CACHE_DIR'] or os.path.join(app.instance_path, 'page_cache'),
+    )
+
+    if app.config['JINJA_BYTECODE_CACHE']:
+        directory = app.config['JINJA_CACHE_DIR'] or os.path.join(app.instance_path, 'jinja_cache')
+        os.makedirs(directory, exist_ok=True)
+        app.jinja_options = dict(app.jinja_options,
+                                 bytecode_cache=FileSystemBytecodeCache(directory))
+
+    app.extensions['email_index'] = EmailIndex(
+        capacity=app.config['EMAIL_INDEX_CAPACITY'],
+        error_rate=app.config['EMAIL_INDEX_ERROR_RATE'],
+    )
+
+    db.init_app(app)
+    with app.app_context():
+        pragmas = sqlite_pragmas(app.config)
+        event.listen(db.engine, 'connect',
+                     lambda connection, record: apply_sqlite_pragmas(connection, pragmas))
+        if app.config['METRICS'] or app.config['INSTRUMENTATION']:
+            install_metrics(app)
+        if app.config['INSTRUMENTATION']:
+            instrument_app(app)
+        install_query_log(app)
+    app.before_request(warm_email_index_on_request)
+
+    app.extensions['student_purger'] = StudentPurger(app, app.config['PURGE_INTERVAL'])
+    atexit.register(app.extensions['student_purger'].stop)
+
+    if app.config['REGISTRATION_MODE'] == 'queue':
+        app.extensions['registration_queue'] = make_registration_queue(app)
+    elif app.config['REGISTRATION_MODE'] != 'sync':
+        raise ValueError(f"unknown registration mode: {app.config['REGISTRATION_MODE']}")
+
+    hops = app.config['TRUSTED_PROXY_HOPS']
+    if hops:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
+    install_idempotency(app)
+    install_admission_control(app)
+
+    use_asset_manifest(app, load_manifest(app.static_folder, app.config['ASSETS_DIR']))
+    app.url_defaults(hashed_static_url)
+    app.view_functions['static'] = serve_static
+    app.jinja_env.globals['critical_css'] = (
+        load_critical_css(app) if app.config['CRITICAL_CSS'] else None
+    )
+
+    for rule, view, options in VIEWS:
+        app.add_url_rule(rule, view_func=view, **options)
+    for command in COMMANDS:
+        app.cli.add_command(command)
+    if app.config['JINJA_PRECOMPILE']:
+        compile_templates(app)
+    if app.config['COMPRESSION']:
+        install_compression(app)
+    return app
+
+
+def __getattr__(name):
+    # `from app import app` and `flask --app app` keep working, but the
+    # default application is only built the first time it is asked for.
+    if name == 'app':
+        globals()['app'] = create_app()
+        return globals()['app']
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
 if __name__ == '__main__':  # pragma: no cover
+    app = create_app()
+    with app.app_context():
+        upgrade_database()
+        refresh_email_index()
     app.run(debug=True, port=5000)
 
@@ -0,0 +1,242 @@
+"""
+Static asset build: minified CSS, content-hashed filenames and precompressed
+copies, plus self-hosted web fonts.
+
+build_assets() copies every file under the static folder into a build
+directory (static/dist by default) as `<name>.<hash>.<ext>`, minifying CSS
+and rewriting its url() references to the hashed names, and writes `.gz`
+(and, with the brotli module installed, `.br`) siblings for text files. A
+manifest.json maps each original path to its hashed one; the app resolves
+url_for('static', ...) through it, and since a hashed URL's content never
+changes it can be cached for a year.
+
+Earlier builds are left in place, so pages cached before a deploy keep
+finding the assets they reference.
+
+critical_css() picks out the rules needed to paint the top of every page,
+for inlining in the page head while the full stylesheet loads.
+"""
+import gzip
+import hashlib
+import json
+import os
+import posixpath
+import re
+from urllib.request import Request, urlopen
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+MANIFEST = 'manifest.json'
+# Only these are worth compressing; fonts and images already are.
+COMPRESSIBLE = {'.css', '.js', '.svg', '.json', '.txt', '.html'}
+# Google Fonts serves woff2 only to browsers it recognises.
+FONT_USER_AGENT = ('Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 '
+                   '(KHTML, like Gecko) Chrome/120.0 Safari/537.36')
+# What every page shows before scrolling: the layout, header and page title.
+CRITICAL_SELECTORS = (
+    ':root', '*', 'html', 'body',
+    '.background-shapes', '.shape', '.shape-1', '.shape-2', '.shape-3',
+    '.container', '.header', '.logo', '.logo-icon', '.logo-text', '.nav', '.nav-link',
+    '.main-content', '.form-wrapper', '.form-header', '.students-wrapper', '.page-header',
+    '.success-wrapper',
+)
+
+_STRING_OR_COMMENT = re.compile(r'''("(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')|/\*.*?\*/''',
+                                re.DOTALL)
+_SPACE = re.compile(r'\s+')
+_AROUND_PUNCTUATION = re.compile(r'\s*([{};,>])\s*')
+_AFTER_COLON = re.compile(r':\s+')
+_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+_EXTERNAL = re.compile(r'^(?:[a-z][a-z0-9+.-]*:|//|/|#)', re.IGNORECASE)
+_SELECTOR_SUBJECT = re.compile(r':root|\*|\.?[\w-]+')
+_ANIMATION = re.compile(r'animation(?:-name)?:([^;}]+)')
+_WORD = re.compile(r'[\w-]+')
+
+
+def minify_css(css):
+    """Drop comments and redundant whitespace, leaving strings untouched."""
+    out = []
+    position = 0
+    for match in _STRING_OR_COMMENT.finditer(css):
+        out.append(_minify_code(css[position:match.start()]))
+        # group(1) is a string, kept verbatim; comments have no group and vanish.
+        out.append(match.group(1) or '')
+        position = match.end()
+    out.append(_minify_code(css[position:]))
+    return ''.join(out).strip()
+
+
+def _minify_code(code):
+    code = _SPACE.sub(' ', code)
+    code = _AROUND_PUNCTUATION.sub(r'\1', code)
+    return _AFTER_COLON.sub(':', code).replace(';}', '}')
+
+
+def _blocks(css):
+    """Yield the (prelude, body) of each top-level block in minified CSS."""
+    depth = 0
+    start = 0
+    quote = None
+    i = 0
+    while i < len(css):
+        char = css[i]
+        if quote:
+            if char == '\\':
+                i += 1
+            elif char == quote:
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char == '{':
+            if depth == 0:
+                prelude, opened = css[start:i], i + 1
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                yield prelude.strip(), css[opened:i]
+                start = i + 1
+        i += 1
+
+
+def _subject(selector):
+    match = _SELECTOR_SUBJECT.match(selector)
+    return match and match.group(0)
+
+
+def _critical_rules(css, selectors, keyframes):
+    rules = []
+    for prelude, body in _blocks(css):
+        if prelude.startswith('@keyframes'):
+            keyframes[prelude.split()[1]] = f'{prelude}{{{body}}}'
+        elif prelude.startswith('@media'):
+            inner = _critical_rules(body, selectors, keyframes)
+            if inner:
+                rules.append(f'{prelude}{{{inner}}}')
+        elif not prelude.startswith('@') and all(
+                _subject(selector) in selectors for selector in prelude.split(',')):
+            rules.append(f'{prelude}{{{body}}}')
+    return ''.join(rules)
+
+
+def critical_css(css, selectors=CRITICAL_SELECTORS):
+    """Return the minified rules of `css` needed to paint above the fold.
+
+    A rule is kept when each of its selectors starts with one of
+    `selectors`, e.g. `.nav-link:hover` for '.nav-link'; @media blocks keep
+    their matching rules and @keyframes are kept when a kept rule animates
+    with them. Relative url()s are not rewritten, so the selected rules
+    must not use any.
+    """
+    keyframes = {}
+    rules = _critical_rules(minify_css(css), frozenset(selectors), keyframes)
+    animations = set(_WORD.findall(' '.join(_ANIMATION.findall(rules))))
+    return rules + ''.join(block for name, block in keyframes.items() if name in animations)
+
+
+def rewrite_css_urls(css, css_path, manifest):
+    """Point relative url() references at the hashed names in `manifest`."""
+    directory = posixpath.dirname(css_path)
+
+    def replace(match):
+        quote, reference = match.groups()
+        path, suffix = re.match(r'([^?#]*)(.*)', reference).groups()
+        if _EXTERNAL.match(path):
+            return match.group(0)
+        target = manifest.get(posixpath.normpath(posixpath.join(directory, path)))
+        if target is None:
+            return match.group(0)
+        hashed = posixpath.join(posixpath.dirname(path), posixpath.basename(target))
+        return f'url({quote}{hashed}{suffix}{quote})'
+    return _URL.sub(replace, css)
+
+
+def hashed_name(path, data):
+    stem, ext = posixpath.splitext(path)
+    return f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _source_files(static_folder, output):
+    for directory, subdirectories, files in os.walk(static_folder):
+        relative = os.path.relpath(directory, static_folder).replace(os.sep, '/')
+        if relative == output or relative.startswith(output + '/'):
+            subdirectories[:] = []
+            continue
+        for name in files:
+            yield posixpath.normpath(posixpath.join(relative, name))
+
+
+def build_assets(static_folder, output='dist', compress_min_size=256):
+    """Write hashed, minified and precompressed copies of every static file.
+
+    Returns the manifest, mapping paths relative to the static folder to the
+    path of their hashed copy.
+    """
+    sources = sorted(_source_files(static_folder, output))
+    # CSS last, so the files it references already have their hashed names.
+    sources.sort(key=lambda path: path.endswith('.css'))
+    manifest = {}
+    for path in sources:
+        with open(os.path.join(static_folder, path), 'rb') as f:
+            data = f.read()
+        if path.endswith('.css'):
+            data = minify_css(rewrite_css_urls(data.decode(), path, manifest)).encode()
+        target = posixpath.join(output, hashed_name(path, data))
+        destination = os.path.join(static_folder, target)
+        _write(destination, data)
+        if posixpath.splitext(path)[1] in COMPRESSIBLE and len(data) >= compress_min_size:
+            # mtime=0 keeps rebuilds of unchanged files byte-identical.
+            _write(destination + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+            if brotli is not None:
+                _write(destination + '.br', brotli.compress(data))
+        manifest[path] = target
+    with open(os.path.join(static_folder, output, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(static_folder, output='dist'):
+    """Read the build manifest, or return {} when no build has been run."""
+    try:
+        with open(os.path.join(static_folder, output, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def fetch_fonts(stylesheet_url, static_folder):
+    """Download a Google Fonts stylesheet and its font files into the static folder.
+
+    The fonts go to static/fonts and the stylesheet, pointing at them, to
+    static/css/fonts.css. Returns the paths written, relative to the
+    static folder.
+    """
+    def fetch(url):
+        request = Request(url, headers={'User-Agent': FONT_USER_AGENT})
+        with urlopen(request, timeout=30) as response:
+            return response.read()
+
+    css = fetch(stylesheet_url).decode()
+    written = []
+
+    def download(match):
+        url = match.group(2)
+        name = posixpath.basename(url.split('?')[0])
+        path = posixpath.join('fonts', name)
+        if path not in written:
+            _write(os.path.join(static_folder, 'fonts', name), fetch(url))
+            written.append(path)
+        return f'url(../fonts/{name})'
+
+    css = _URL.sub(download, css)
+    _write(os.path.join(static_folder, 'css', 'fonts.css'), css.encode())
+    return written + ['css/fonts.css']
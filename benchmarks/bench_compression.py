@@ -0,0 +1,99 @@
+"""
+Measure the CPU cost and the bytes saved of each compression level.
+
+Renders a few pages with compression off (the students listing showing
+STUDENTS students, 1000 by default), then compresses each with every level
+of every encoding installed (gzip always; br and zstd with the brotli and
+zstandard modules) and prints, per page and level:
+
+* the compressed size and the share of bytes saved
+* the median time to compress the whole body, and the throughput
+* the size when the body is streamed in 8 KB chunks, each flushed as the
+  middleware does for streamed responses
+
+Usage:
+    python benchmarks/bench_compression.py [STUDENTS] [REPEATS]
+"""
+import os
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import insert  # noqa: E402
+from app import create_app, db, Student  # noqa: E402
+from compress import StreamCompressor, available_encodings, compress  # noqa: E402
+
+LEVELS = {
+    'gzip': range(1, 10),
+    'br': range(0, 12),
+    'zstd': (1, 2, 3, 4, 6, 9, 12, 15, 19),
+}
+CHUNK = 8192
+
+
+def populate(count):
+    base = datetime(2024, 1, 1)
+    db.session.execute(insert(Student), [{
+        'first_name': f'First{i}', 'last_name': f'Last{i}', 'email': f'student{i}@example.com',
+        'phone': '1234567890', 'date_of_birth': date(2000, 1, 1), 'gender': 'Female',
+        'address': f'{i} Bench St', 'city': f'City{i % 50}', 'course': f'Course{i % 20}',
+        'registration_date': base + timedelta(seconds=i),
+    } for i in range(count)])
+    db.session.commit()
+
+
+def render_pages(students):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'COMPRESSION': False,
+        'STUDENTS_PER_PAGE': students,
+        'STUDENTS_MAX_PER_PAGE': students,
+    })
+    with app.app_context():
+        db.create_all()
+        populate(students)
+        client = app.test_client()
+        return {url: client.get(url).data
+                for url in ('/', '/students', '/success/1', f'/api/students?per_page={students}')}
+
+
+def streamed_size(encoding, level, data):
+    stream = StreamCompressor(encoding, level)
+    size = sum(len(stream.compress(data[i:i + CHUNK])) for i in range(0, len(data), CHUNK))
+    return size + len(stream.finish())
+
+
+def bench(encoding, level, data, repeats):
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        compressed = compress(encoding, data, level)
+        samples.append(time.perf_counter() - started)
+    return len(compressed), statistics.median(samples)
+
+
+def main():
+    students = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    pages = render_pages(students)
+    print(f'Encodings available: {", ".join(available_encodings())}')
+    for url, data in pages.items():
+        print()
+        print('=' * 78)
+        print(f'{url}: {len(data):,} bytes')
+        print(f'{"encoding":<9} {"level":>5} {"bytes":>10} {"saved":>7} {"ms":>9} '
+              f'{"MB/s":>8} {"streamed":>10}')
+        print('=' * 78)
+        for encoding in available_encodings():
+            for level in LEVELS[encoding]:
+                size, seconds = bench(encoding, level, data, repeats)
+                print(f'{encoding:<9} {level:>5} {size:>10,} {1 - size / len(data):>7.1%} '
+                      f'{seconds * 1000:>9.3f} {len(data) / seconds / 1e6:>8.1f} '
+                      f'{streamed_size(encoding, level, data):>10,}')
+
+
+if __name__ == '__main__':
+    main()
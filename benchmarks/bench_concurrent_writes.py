@@ -0,0 +1,105 @@
+"""
+Load test concurrent registrations against a file-backed SQLite database.
+
+Runs several worker processes, each posting registrations through the app's
+test client, first with SQLite's stock settings (rollback journal,
+synchronous=FULL, no mmap) and then with the tuned pragmas applied by
+app.py. Reports write throughput and how many registrations failed.
+
+Usage:
+    python benchmarks/bench_concurrent_writes.py [WORKERS] [PER_WORKER]
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+PROFILES = {
+    'stock': {
+        'SQLITE_JOURNAL_MODE': 'DELETE',
+        'SQLITE_SYNCHRONOUS': 'FULL',
+        'SQLITE_BUSY_TIMEOUT_MS': '5000',
+        'SQLITE_MMAP_SIZE': '0',
+    },
+    'tuned': {},
+}
+
+
+def load_app(env):
+    os.environ.update(env)
+    sys.path.insert(0, ROOT)
+    import app
+    return app
+
+
+def worker(env, worker_id, count, ready, start, results):
+    app = load_app(env).app
+    client = app.test_client()
+    ready.put(worker_id)
+    start.wait()
+    ok = failed = 0
+    for i in range(count):
+        response = client.post('/register', data={
+            'first_name': 'Load', 'last_name': f'Worker{worker_id}',
+            'email': f'load-{worker_id}-{i}@example.com', 'phone': '1234567890',
+            'date_of_birth': '2000-01-01', 'gender': 'Other', 'address': '1 Bench St',
+            'city': 'Benchville', 'course': 'Computer Science',
+        })
+        if '/success/' in response.headers.get('Location', ''):
+            ok += 1
+        else:
+            failed += 1
+    results.put((ok, failed))
+
+
+def setup(env):
+    module = load_app(env)
+    with module.app.app_context():
+        module.upgrade_database()
+
+
+def run_profile(name, overrides, workers, per_worker):
+    ctx = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as tmp:
+        # All the load comes from one address, so lift the registration limits.
+        env = dict(overrides, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'load.db')}",
+                   REGISTER_RATE_LIMIT_IP='', REGISTER_MAX_CONCURRENT='0')
+        init = ctx.Process(target=setup, args=(env,))
+        init.start()
+        init.join()
+
+        ready, start, results = ctx.Queue(), ctx.Event(), ctx.Queue()
+        processes = [ctx.Process(target=worker, args=(env, w, per_worker, ready, start, results))
+                     for w in range(workers)]
+        for process in processes:
+            process.start()
+        # Time only the registrations, not interpreter start-up and imports.
+        for _ in processes:
+            ready.get()
+        started = time.perf_counter()
+        start.set()
+        outcomes = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - started
+
+    ok = sum(o for o, _ in outcomes)
+    failed = sum(f for _, f in outcomes)
+    print(f'{name:<8} {workers:>7} {ok:>9} {failed:>7} {elapsed:>9.2f} {ok / elapsed:>12.1f}')
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    per_worker = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    print('=' * 60)
+    print(f'{"profile":<8} {"workers":>7} {"ok":>9} {"failed":>7} {"seconds":>9} {"writes/sec":>12}')
+    print('=' * 60)
+    for name, overrides in PROFILES.items():
+        run_profile(name, overrides, workers, per_worker)
+
+
+if __name__ == '__main__':
+    main()
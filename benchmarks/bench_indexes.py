@@ -0,0 +1,94 @@
+"""
+Benchmark sort and filter queries on the students table with and without
+the Student access-pattern indexes.
+
+Seeds a throwaway SQLite database at several sizes, times the queries the
+application issues, then repeats them after creating the indexes.
+
+Usage:
+    python benchmarks/bench_indexes.py [ROWS ...]
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import Student
+
+COURSES = ['Computer Science', 'Business Administration', 'Mechanical Engineering',
+           'Electrical Engineering', 'Medicine', 'Law', 'Arts', 'Psychology']
+CITIES = [f'City {i}' for i in range(200)]
+LAST_NAMES = [f'Surname{i}' for i in range(5000)]
+
+QUERIES = {
+    'list newest page': (
+        'SELECT * FROM student ORDER BY registration_date DESC, id DESC LIMIT 50', ()),
+    'filter course, newest page': (
+        'SELECT * FROM student WHERE course = ? ORDER BY registration_date DESC LIMIT 50',
+        ('Medicine',)),
+    'filter city, newest page': (
+        'SELECT * FROM student WHERE city = ? ORDER BY registration_date DESC LIMIT 50',
+        ('City 7',)),
+    'lookup last name': (
+        'SELECT * FROM student WHERE last_name = ? ORDER BY first_name', ('Surname42',)),
+}
+
+
+def compile_ddl(element):
+    return str(element.compile(dialect=create_engine('sqlite://').dialect))
+
+
+def seed(connection, rows):
+    connection.execute(compile_ddl(CreateTable(Student.__table__)))
+    base = datetime(2020, 1, 1)
+    rng = random.Random(0)
+    connection.executemany(
+        'INSERT INTO student (first_name, last_name, email, phone, date_of_birth, gender, '
+        'address, city, course, registration_date) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        (
+            (f'First{i}', rng.choice(LAST_NAMES), f'student{i}@example.com', '1234567890',
+             '2000-01-01', rng.choice(['Male', 'Female', 'Other']), '1 Main St',
+             rng.choice(CITIES), rng.choice(COURSES),
+             (base + timedelta(seconds=rng.randrange(10 ** 8))).isoformat(' '))
+            for i in range(rows)
+        ),
+    )
+    connection.commit()
+
+
+def time_query(connection, sql, params, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        connection.execute(sql, params).fetchall()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def run(sizes):
+    print('=' * 72)
+    print(f'{"query":<30} {"rows":>9} {"no index (ms)":>14} {"indexed (ms)":>14}')
+    print('=' * 72)
+    for rows in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            connection = sqlite3.connect(os.path.join(tmp, 'bench.db'))
+            seed(connection, rows)
+            before = {name: time_query(connection, *q) for name, q in QUERIES.items()}
+            for index in Student.__table__.indexes:
+                connection.execute(compile_ddl(CreateIndex(index)))
+            connection.execute('ANALYZE')
+            after = {name: time_query(connection, *q) for name, q in QUERIES.items()}
+            connection.close()
+        for name in QUERIES:
+            print(f'{name:<30} {rows:>9} {before[name]:>14.3f} {after[name]:>14.3f}')
+        print('-' * 72)
+
+
+if __name__ == '__main__':
+    run([int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 100_000])
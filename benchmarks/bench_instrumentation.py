@@ -0,0 +1,71 @@
+"""
+Measure what request instrumentation costs per request.
+
+Times the same requests with INSTRUMENTATION off and on, against an
+in-memory database holding a few hundred students, and prints the median
+time per request for each page.
+
+Usage:
+    python benchmarks/bench_instrumentation.py [REQUESTS]
+"""
+import os
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import insert  # noqa: E402
+from app import create_app, db, Student  # noqa: E402
+
+URLS = ('/', '/students', '/success/1', '/api/students/1')
+
+
+def populate(count):
+    base = datetime(2024, 1, 1)
+    db.session.execute(insert(Student), [{
+        'first_name': f'First{i}', 'last_name': f'Last{i}', 'email': f'student{i}@example.com',
+        'phone': '1234567890', 'date_of_birth': date(2000, 1, 1), 'gender': 'Female',
+        'address': f'{i} Bench St', 'city': 'Benchville', 'course': 'Computer Science',
+        'registration_date': base + timedelta(seconds=i),
+    } for i in range(count)])
+    db.session.commit()
+
+
+def bench(instrumented, requests):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'PAGE_CACHE_BACKEND': 'none',
+        'INSTRUMENTATION': instrumented,
+    })
+    results = {}
+    with app.app_context():
+        db.create_all()
+        populate(500)
+        client = app.test_client()
+        for url in URLS:
+            client.get(url)
+            samples = []
+            for _ in range(requests):
+                started = time.perf_counter()
+                client.get(url).close()
+                samples.append(time.perf_counter() - started)
+            results[url] = statistics.median(samples)
+    return results
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    off = bench(False, requests)
+    on = bench(True, requests)
+    print('=' * 58)
+    print(f'{"url":<18} {"off us":>10} {"on us":>10} {"overhead us":>14}')
+    print('=' * 58)
+    for url in URLS:
+        print(f'{url:<18} {off[url] * 1e6:>10.1f} {on[url] * 1e6:>10.1f} '
+              f'{(on[url] - off[url]) * 1e6:>14.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Compare registration throughput with and without the write-behind queue.
+
+Several client threads post registrations to one app backed by a file
+SQLite database, once per mode:
+
+* sync          - the default path, one duplicate check and commit per request
+* queue-memory  - queued in process memory, written by group commits
+* queue-sqlite  - journaled to a SQLite spool first, then group committed
+
+"acked/sec" is how fast requests are answered. For the queue modes the
+clock keeps running until the writer has committed everything, which
+gives "written/sec". Runs with synchronous=FULL by default so each commit
+pays for an fsync, as a registration-day server with durable settings
+would; pass another level to compare.
+
+Usage:
+    python benchmarks/bench_registration_queue.py [THREADS] [PER_THREAD] [SYNCHRONOUS]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+MODES = {
+    'sync': {'REGISTRATION_MODE': 'sync'},
+    'queue-memory': {'REGISTRATION_MODE': 'queue', 'REGISTRATION_SPOOL': 'memory'},
+    'queue-sqlite': {'REGISTRATION_MODE': 'queue', 'REGISTRATION_SPOOL': 'sqlite'},
+}
+
+
+def run_mode(name, overrides, threads, per_thread):
+    from app import create_app, db, upgrade_database, Student
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app(dict(
+            overrides,
+            SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(tmp, 'load.db')}",
+            REGISTRATION_SPOOL_PATH=os.path.join(tmp, 'spool.db'),
+            # All the load comes from one address, so lift the registration limits.
+            REGISTER_RATE_LIMIT_IP='',
+            REGISTER_MAX_CONCURRENT=0,
+        ))
+        with app.app_context():
+            upgrade_database()
+
+        start = threading.Barrier(threads + 1)
+
+        def client_thread(thread_id):
+            client = app.test_client()
+            start.wait()
+            for i in range(per_thread):
+                client.post('/register', data={
+                    'first_name': 'Load', 'last_name': f'Thread{thread_id}',
+                    'email': f'load-{thread_id}-{i}@example.com', 'phone': '1234567890',
+                    'date_of_birth': '2000-01-01', 'gender': 'Other', 'address': '1 Bench St',
+                    'city': 'Benchville', 'course': 'Computer Science',
+                })
+
+        workers = [threading.Thread(target=client_thread, args=(t,)) for t in range(threads)]
+        for worker in workers:
+            worker.start()
+        start.wait()
+        started = time.perf_counter()
+        for worker in workers:
+            worker.join()
+        acked = time.perf_counter() - started
+        writer = app.extensions.get('registration_queue')
+        if writer is not None:
+            writer.close()
+        written = time.perf_counter() - started
+
+        with app.app_context():
+            count = Student.query.count()
+            db.engine.dispose()
+
+    total = threads * per_thread
+    print(f'{name:<13} {total:>7} {count:>8} {total / acked:>11.1f} {count / written:>12.1f}')
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    per_thread = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    os.environ['SQLITE_SYNCHRONOUS'] = sys.argv[3] if len(sys.argv) > 3 else 'FULL'
+    os.environ.setdefault('PAGE_CACHE_BACKEND', 'none')
+    print('=' * 56)
+    print(f'{"mode":<13} {"posted":>7} {"written":>8} {"acked/sec":>11} {"written/sec":>12}')
+    print('=' * 56)
+    for name, overrides in MODES.items():
+        run_mode(name, overrides, threads, per_thread)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,316 @@
+"""
+Load test every page route against a seeded database and track regressions.
+
+Seeds STUDENTS synthetic students (10k by default; 1M works, it just takes
+a while) into a file SQLite database, then measures throughput and
+p50/p99 latency for:
+
+* index     - GET /
+* register  - POST /register with a new email
+* students  - GET /students
+* success   - GET /success/<id> for random seeded students
+* delete    - POST /students/<id>/delete, each request a different student
+
+Two ways of driving the app, each on its own copy of the seeded database:
+
+* inprocess - the Flask test client, one request at a time; measures the
+              app alone
+* server    - Werkzeug's threaded WSGI server on a local port with
+              CONCURRENCY client threads; adds sockets, HTTP parsing and
+              contention between requests
+
+Results are printed and, with --output, written as JSON labelled with the
+current git commit. --baseline compares against an earlier JSON file and
+exits with status 1 if any route got slower, or served fewer requests per
+second, by more than --threshold (15% by default).
+
+Usage:
+    python benchmarks/bench_routes.py [--students N] [--requests N]
+        [--mode inprocess|server|both] [--concurrency N] [--config KEY=VALUE ...]
+        [--output results.json] [--baseline old.json] [--threshold 0.15]
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from urllib.parse import urlencode
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import insert  # noqa: E402
+from werkzeug.serving import make_server  # noqa: E402
+from app import create_app, db, upgrade_database, refresh_email_index, Student  # noqa: E402
+
+ROUTES = ('index', 'register', 'students', 'success', 'delete')
+SEED_BATCH = 10000
+
+
+def registration(label, i):
+    return {
+        'first_name': 'Load', 'last_name': f'Client{i}', 'email': f'{label}-{i}@example.com',
+        'phone': '1234567890', 'date_of_birth': '2000-01-01', 'gender': 'Other',
+        'address': '1 Bench St', 'city': 'Benchville', 'course': 'Computer Science',
+    }
+
+
+def plan_requests(route, count, students, label):
+    """Return `count` (method, path, form) tuples for one route."""
+    if route == 'index':
+        return [('GET', '/', None)] * count
+    if route == 'register':
+        return [('POST', '/register', registration(label, i)) for i in range(count)]
+    if route == 'students':
+        return [('GET', '/students', None)] * count
+    if route == 'success':
+        # The lower half, so the delete run that follows cannot remove them first.
+        rng = random.Random(1)
+        return [('GET', f'/success/{rng.randint(1, max(1, students // 2))}', None)
+                for _ in range(count)]
+    return [('POST', f'/students/{students - i}/delete', None) for i in range(count)]
+
+
+EXPECTED_STATUS = {'index': 200, 'register': 302, 'students': 200, 'success': 200,
+                   'delete': 302}
+
+
+def seed(path, count, config):
+    app = make_app(path, config)
+    base = datetime(2024, 1, 1)
+    with app.app_context():
+        upgrade_database()
+        for start in range(0, count, SEED_BATCH):
+            db.session.execute(insert(Student), [{
+                'first_name': f'First{i}', 'last_name': f'Last{i}',
+                'email': f'student{i}@example.com', 'phone': '1234567890',
+                'date_of_birth': date(2000, 1, 1), 'gender': ('Female', 'Male')[i % 2],
+                'address': f'{i} Bench St', 'city': f'City{i % 50}',
+                'course': f'Course{i % 20}', 'registration_date': base + timedelta(seconds=i),
+            } for i in range(start, min(count, start + SEED_BATCH))])
+            db.session.commit()
+        db.session.execute(db.text('PRAGMA wal_checkpoint(TRUNCATE)'))
+        db.engine.dispose()
+
+
+# All the load comes from one address, so the registration limits are
+# lifted unless --config sets them.
+UNLIMITED = {'REGISTER_RATE_LIMIT_IP': '', 'REGISTER_RATE_LIMIT_EMAIL': '',
+             'REGISTER_MAX_CONCURRENT': 0}
+
+
+def make_app(path, config):
+    return create_app({**UNLIMITED, **config, 'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'})
+
+
+def summarize(latencies, elapsed, errors):
+    if len(latencies) > 1:
+        cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+        p50, p99 = cuts[49], cuts[98]
+    else:
+        p50 = p99 = latencies[0]
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': len(latencies) / elapsed,
+        'mean_ms': statistics.fmean(latencies) * 1000,
+        'p50_ms': p50 * 1000,
+        'p99_ms': p99 * 1000,
+    }
+
+
+def run_inprocess(app, route, plan):
+    client = app.test_client()
+    latencies = []
+    errors = 0
+    started = time.perf_counter()
+    for method, path, form in plan:
+        sent = time.perf_counter()
+        response = client.open(path, method=method, data=form)
+        response.get_data()
+        latencies.append(time.perf_counter() - sent)
+        errors += response.status_code != EXPECTED_STATUS[route]
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+def run_server(app, route, plan, concurrency):
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    port = server.server_port
+
+    def send(request):
+        method, path, form = request
+        body = urlencode(form) if form else None
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'} if form else {}
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        sent = time.perf_counter()
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+        except OSError:
+            status = None
+        finally:
+            connection.close()
+        return time.perf_counter() - sent, status
+
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(send, plan))
+        elapsed = time.perf_counter() - started
+    finally:
+        server.shutdown()
+        thread.join()
+    errors = sum(status != EXPECTED_STATUS[route] for _, status in results)
+    return summarize([latency for latency, _ in results], elapsed, errors)
+
+
+def run_mode(mode, seeded, tmp, args, config):
+    path = os.path.join(tmp, f'{mode}.db')
+    shutil.copy(seeded, path)
+    app = make_app(path, config)
+    with app.app_context():
+        refresh_email_index()
+    results = {}
+    for route in ROUTES:
+        plan = plan_requests(route, args.requests, args.students, f'{mode}-{route}')
+        # One untimed request so first-use costs (template compile, pool
+        # connect) are not charged to the route; writes cannot be repeated.
+        if plan[0][0] == 'GET':
+            app.test_client().get(plan[0][1])
+        if mode == 'inprocess':
+            results[route] = run_inprocess(app, route, plan)
+        else:
+            results[route] = run_server(app, route, plan, args.concurrency)
+    writer = app.extensions.get('registration_queue')
+    if writer is not None:
+        writer.close()
+    with app.app_context():
+        db.engine.dispose()
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Print changes against `baseline` and return the regressions found."""
+    regressions = []
+    print()
+    print(f'Compared with {baseline.get("commit") or "baseline"} '
+          f'(threshold {threshold:.0%})')
+    for mode, routes in results['results'].items():
+        for route, current in routes.items():
+            old = baseline.get('results', {}).get(mode, {}).get(route)
+            if old is None:
+                continue
+            changes = {
+                'p50_ms': current['p50_ms'] / old['p50_ms'] - 1,
+                'p99_ms': current['p99_ms'] / old['p99_ms'] - 1,
+                'rps': old['rps'] / current['rps'] - 1,
+            }
+            worst = max(changes, key=changes.get)
+            flag = ''
+            if changes[worst] > threshold:
+                regressions.append((mode, route, worst, changes[worst]))
+                flag = '  REGRESSION'
+            print(f'  {mode:<10} {route:<9} p50 {changes["p50_ms"]:+7.1%}  '
+                  f'p99 {changes["p99_ms"]:+7.1%}  rps {-changes["rps"]:+7.1%}{flag}')
+    return regressions
+
+
+def print_table(mode, results):
+    print('=' * 70)
+    print(f'{mode:<10} {"route":<9} {"reqs":>6} {"errors":>6} {"req/s":>9} '
+          f'{"mean ms":>9} {"p50 ms":>8} {"p99 ms":>8}')
+    print('=' * 70)
+    for route, r in results.items():
+        print(f'{"":<10} {route:<9} {r["requests"]:>6} {r["errors"]:>6} {r["rps"]:>9.1f} '
+              f'{r["mean_ms"]:>9.2f} {r["p50_ms"]:>8.2f} {r["p99_ms"]:>8.2f}')
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--students', type=int, default=10000)
+    parser.add_argument('--requests', type=int, default=200, help='Requests per route.')
+    parser.add_argument('--mode', choices=('inprocess', 'server', 'both'), default='both')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--config', action='append', default=[], metavar='KEY=VALUE',
+                        help='App setting for the run; values are parsed as JSON when they can be.')
+    parser.add_argument('--output')
+    parser.add_argument('--baseline')
+    parser.add_argument('--threshold', type=float, default=0.15)
+    args = parser.parse_args(argv)
+    if args.requests > args.students // 2:
+        parser.error('--requests must be at most half of --students')
+    return args
+
+
+def parse_config(pairs):
+    config = {}
+    for pair in pairs:
+        key, _, value = pair.partition('=')
+        try:
+            config[key] = json.loads(value)
+        except ValueError:
+            config[key] = value
+    return config
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = parse_config(args.config)
+    modes = ('inprocess', 'server') if args.mode == 'both' else (args.mode,)
+    results = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'students': args.students,
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'config': config,
+        'results': {},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        seeded = os.path.join(tmp, 'seeded.db')
+        started = time.perf_counter()
+        seed(seeded, args.students, config)
+        print(f'Seeded {args.students} students in {time.perf_counter() - started:.1f}s')
+        for mode in modes:
+            results['results'][mode] = run_mode(mode, seeded, tmp, args, config)
+            print_table(mode, results['results'][mode])
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'Wrote {args.output}')
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
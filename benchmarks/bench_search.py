@@ -0,0 +1,70 @@
+"""
+Benchmark full-text student search at increasing table sizes.
+
+Seeds a throwaway SQLite database through the real schema (so the FTS5
+triggers index every row) and times search_students() for a mix of
+selective and broad prefix queries.
+
+Usage:
+    python benchmarks/bench_search.py [ROWS ...]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db, search_students, upgrade_database
+
+FIRST_NAMES = ['James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda',
+               'David', 'Elizabeth', 'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica']
+COURSES = ['Computer Science', 'Business Administration', 'Mechanical Engineering',
+           'Electrical Engineering', 'Medicine', 'Law', 'Arts', 'Psychology']
+QUERIES = ['jo', 'jennifer', 'surname123', 'mary law', 'city 42 medicine', 'student77']
+
+
+def seed(rows):
+    rng = random.Random(0)
+    connection = db.engine.raw_connection()
+    connection.executemany(
+        'INSERT INTO student (first_name, last_name, email, phone, date_of_birth, gender, '
+        'address, city, course, registration_date) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        (
+            (rng.choice(FIRST_NAMES), f'Surname{rng.randrange(20000)}', f'student{i}@example.com',
+             '1234567890', '2000-01-01', 'Other', '1 Main St', f'City {rng.randrange(500)}',
+             rng.choice(COURSES), '2024-01-01 00:00:00')
+            for i in range(rows)
+        ),
+    )
+    connection.commit()
+    connection.close()
+
+
+def time_search(query, repeat=10):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        search_students(query, per_page=20)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]
+    print('=' * 56)
+    print(f'{"query":<22} {"rows":>10} {"ms / search":>20}')
+    print('=' * 56)
+    for rows in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'search.db')}"})
+            with app.app_context():
+                upgrade_database()
+                seed(rows)
+                for query in QUERIES:
+                    print(f'{query:<22} {rows:>10} {time_search(query):>20.3f}')
+                db.engine.dispose()
+        print('-' * 56)
+
+
+if __name__ == '__main__':
+    main()
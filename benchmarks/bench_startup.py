@@ -0,0 +1,61 @@
+"""
+Measure cold-start latency: module import, create_app() and the first
+request, each in a fresh interpreter as an autoscaled worker would see it.
+
+Usage:
+    python benchmarks/bench_startup.py [RUNS]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+PROBE = '''
+import json, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+application = app.create_app()
+t2 = time.perf_counter()
+response = application.test_client().get('/students')
+t3 = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({'import': t1 - t0, 'create_app': t2 - t1, 'first_request': t3 - t2}))
+'''
+
+
+def prepare_database(url):
+    code = 'import app\nwith app.app.app_context(): app.upgrade_database()'
+    subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True,
+                   env=dict(os.environ, DATABASE_URL=url))
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'startup.db')}"
+        prepare_database(url)
+        samples = []
+        for _ in range(runs):
+            output = subprocess.run(
+                [sys.executable, '-c', PROBE], cwd=ROOT, check=True, capture_output=True,
+                text=True, env=dict(os.environ, DATABASE_URL=url),
+            ).stdout
+            samples.append(json.loads(output))
+
+    print('=' * 52)
+    print(f'{"phase":<16} {"median (ms)":>16} {"max (ms)":>16}')
+    print('=' * 52)
+    for phase in ('import', 'create_app', 'first_request'):
+        values = [sample[phase] * 1000 for sample in samples]
+        print(f'{phase:<16} {statistics.median(values):>16.1f} {max(values):>16.1f}')
+    total = [sum(sample.values()) * 1000 for sample in samples]
+    print(f'{"total":<16} {statistics.median(total):>16.1f} {max(total):>16.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Compare time to first byte and peak memory for /students, buffered and
+streamed, on a file SQLite database with synthetic students.
+
+The page cache is disabled so every request renders the page.
+
+Usage:
+    python benchmarks/bench_streaming.py [STUDENTS] [PER_PAGE] [RUNS]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import insert  # noqa: E402
+from app import create_app, db, upgrade_database, Student  # noqa: E402
+
+
+def populate(count):
+    base = datetime(2024, 1, 1)
+    db.session.execute(insert(Student), [{
+        'first_name': f'First{i}', 'last_name': f'Last{i}', 'email': f'student{i}@example.com',
+        'phone': '1234567890', 'date_of_birth': date(2000, 1, 1), 'gender': 'Female',
+        'address': f'{i} Bench St', 'city': 'Benchville', 'course': 'Computer Science',
+        'registration_date': base + timedelta(seconds=i),
+    } for i in range(count)])
+    db.session.commit()
+
+
+def measure(client, url):
+    tracemalloc.start()
+    started = time.perf_counter()
+    response = client.get(url)
+    chunks = iter(response.response)
+    next(chunks)
+    first_byte = time.perf_counter() - started
+    for _ in chunks:
+        pass
+    total = time.perf_counter() - started
+    response.close()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return first_byte, total, peak
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    per_page = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    runs = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+            'PAGE_CACHE_BACKEND': 'none',
+            'STUDENTS_MAX_PER_PAGE': per_page,
+        })
+        with app.app_context():
+            upgrade_database()
+            populate(count)
+        client = app.test_client()
+        url = f'/students?per_page={per_page}'
+        print('=' * 60)
+        print(f'{"mode":<10} {"TTFB ms":>10} {"total ms":>10} {"peak KiB":>10}')
+        print('=' * 60)
+        for mode, stream in (('buffered', False), ('streamed', True)):
+            app.config['STUDENTS_STREAM'] = stream
+            measure(client, url)
+            results = [measure(client, url) for _ in range(runs)]
+            print(f'{mode:<10} '
+                  f'{statistics.median(r[0] for r in results) * 1000:>10.2f} '
+                  f'{statistics.median(r[1] for r in results) * 1000:>10.2f} '
+                  f'{statistics.median(r[2] for r in results) / 1024:>10.0f}')
+        with app.app_context():
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Template rendering micro-benchmarks.
+
+For each page template this reports:
+
+* compile      - parsing and compiling the source, as a worker without a
+                 bytecode cache does on first use
+* cached load  - loading the same template from the on-disk bytecode cache
+* render       - rendering with 10, 1,000 and 100,000 synthetic students,
+                 with wall time and peak Python memory from tracemalloc
+
+Only students.html depends on the number of students; index.html and
+success.html are rendered once per size for comparison.
+
+Usage:
+    python benchmarks/bench_templates.py [SIZES...]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app  # noqa: E402
+
+TEMPLATES = ('index.html', 'success.html', 'students.html')
+DEFAULT_SIZES = (10, 1000, 100000)
+
+
+def synthetic_students(count):
+    return [
+        SimpleNamespace(
+            id=i + 1, first_name=f'First{i}', last_name=f'Last{i}',
+            email=f'student{i}@example.com', phone='1234567890',
+            date_of_birth=date(2000, 1, 1), gender='Female', address=f'{i} Bench St',
+            city='Benchville', course='Computer Science',
+            registration_date=datetime(2024, 1, 1, 9, 30),
+        )
+        for i in range(count)
+    ]
+
+
+def context_for(name, students):
+    if name == 'success.html':
+        return {'student': students[0]}
+    if name == 'students.html':
+        return {'students': students, 'total': len(students), 'prev_url': None,
+                'next_url': '/students?after=x'}
+    return {}
+
+
+def measure(func):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def bench_loading(cache_dir):
+    print('=' * 56)
+    print(f'{"template":<16} {"compile ms":>12} {"cached load ms":>16}')
+    print('=' * 56)
+    for name in TEMPLATES:
+        cold = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'JINJA_BYTECODE_CACHE': False})
+        compile_time, _, _ = measure(lambda: cold.jinja_env.get_template(name))
+
+        create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'JINJA_CACHE_DIR': cache_dir}) \
+            .jinja_env.get_template(name)
+        warm = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'JINJA_CACHE_DIR': cache_dir})
+        load_time, _, _ = measure(lambda: warm.jinja_env.get_template(name))
+        print(f'{name:<16} {compile_time * 1000:>12.2f} {load_time * 1000:>16.2f}')
+
+
+def bench_rendering(sizes):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'JINJA_BYTECODE_CACHE': False,
+                      'JINJA_PRECOMPILE': True})
+    print()
+    print('=' * 66)
+    print(f'{"template":<16} {"students":>9} {"render ms":>11} {"peak MiB":>10} {"HTML KiB":>11}')
+    print('=' * 66)
+    with app.test_request_context('/'):
+        for size in sizes:
+            students = synthetic_students(size)
+            for name in TEMPLATES:
+                template = app.jinja_env.get_template(name)
+                elapsed, peak, html = measure(
+                    lambda: template.render(**context_for(name, students))
+                )
+                print(f'{name:<16} {size:>9} {elapsed * 1000:>11.2f} '
+                      f'{peak / 2 ** 20:>10.2f} {len(html.encode()) / 1024:>11.1f}')
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    with tempfile.TemporaryDirectory() as cache_dir:
+        bench_loading(cache_dir)
+    bench_rendering(sizes)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""
+Pluggable response cache backends with per-entry TTL and LRU eviction.
+
+MemoryCache keeps entries in the current process. FileCache keeps them in a
+directory so several worker processes on one host share hits and
+invalidations. NullCache disables caching without changing call sites.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+class NullCache:
+    """A cache that never stores anything."""
+
+    def get(self, key, default=None):
+        return default
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def delete(self, *keys):
+        pass
+
+    def clear(self):
+        pass
+
+
+class MemoryCache:
+    """Thread-safe in-process LRU cache.
+
+    Entries expire `ttl` seconds after they are set; once `max_entries` is
+    reached the least recently used entry is evicted.
+    """
+
+    def __init__(self, max_entries=1024, default_ttl=60):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + (self.default_ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class FileCache:
+    """Cache stored as one JSON file per entry in a shared directory.
+
+    Values must be JSON serialisable. Writes go through a temporary file and
+    an atomic rename, so concurrent readers never see a partial entry. File
+    modification times double as the LRU clock: reads touch the file, and
+    when the directory grows past `max_entries` the oldest files are removed
+    until it is back under the limit.
+    """
+
+    suffix = '.cache'
+
+    def __init__(self, directory, max_entries=1024, default_ttl=60):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        return os.path.join(self.directory, digest + self.suffix)
+
+    def get(self, key, default=None):
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return default
+        if entry['expires'] < time.time() or entry['key'] != key:
+            return default
+        try:
+            os.utime(path)
+        except OSError:  # pragma: no cover - removed by another process
+            pass
+        return entry['value']
+
+    def set(self, key, value, ttl=None):
+        expires = time.time() + (self.default_ttl if ttl is None else ttl)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'key': key, 'expires': expires, 'value': value}, f)
+        os.replace(tmp, self._path(key))
+        self._prune()
+
+    def delete(self, *keys):
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        for path in self._entry_paths():
+            try:
+                os.remove(path)
+            except FileNotFoundError:  # pragma: no cover - concurrent delete
+                pass
+
+    def _entry_paths(self):
+        return [entry.path for entry in os.scandir(self.directory)
+                if entry.name.endswith(self.suffix)]
+
+    def _prune(self):
+        paths = self._entry_paths()
+        if len(paths) <= self.max_entries:
+            return
+        # Evict down to 90% so pruning is not repeated on every write.
+        keep = int(self.max_entries * 0.9)
+        by_age = []
+        for path in paths:
+            try:
+                by_age.append((os.stat(path).st_mtime_ns, path))
+            except FileNotFoundError:  # pragma: no cover - concurrent delete
+                pass
+        by_age.sort()
+        for _, path in by_age[:len(by_age) - keep]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:  # pragma: no cover - concurrent delete
+                pass
+
+    def __len__(self):
+        return len(self._entry_paths())
+
+
+def make_cache(backend, max_entries=1024, default_ttl=60, directory=None):
+    """Build a cache from configuration values."""
+    if backend == 'memory':
+        return MemoryCache(max_entries=max_entries, default_ttl=default_ttl)
+    if backend == 'file':
+        return FileCache(directory, max_entries=max_entries, default_ttl=default_ttl)
+    if backend in (None, '', 'none'):
+        return NullCache()
+    raise ValueError(f'unknown cache backend: {backend}')
@@ -0,0 +1,245 @@
+"""
+WSGI middleware compressing responses with zstd, brotli or gzip.
+
+The encoding is the one the client rates highest in Accept-Encoding, ties
+going to the first of ENCODINGS; zstd and brotli are only offered when the
+optional zstandard and brotli modules are installed (see
+requirements-optional.txt). Text-like responses
+are compressed unless they are already encoded, partial, marked
+no-transform, or smaller than `min_size` bytes. When the app does not say
+how long a body is, it is read until `min_size` bytes have arrived before
+deciding.
+
+Streamed responses stay streamed: every chunk the app yields is compressed
+and flushed at once, so the client can render it before the rest exists.
+
+Compressing the same output twice is wasted work, so the compressed bodies
+of responses any cache could reuse (those with an ETag, without
+Cache-Control private or no-store, varying on nothing but Accept-Encoding)
+are kept in `cache`, keyed by URL, ETag and encoding. A hit is sent
+without reading the app's body at all.
+"""
+import gzip
+import zlib
+from itertools import chain
+
+from werkzeug.datastructures import Headers, ResponseCacheControl
+from werkzeug.http import (dump_header, parse_accept_header, parse_cache_control_header,
+                           parse_set_header)
+
+from cache import NullCache
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+# Preferred first when the client rates several equally.
+ENCODINGS = ('zstd', 'br', 'gzip')
+# Fast levels suit responses compressed per request; see
+# benchmarks/bench_compression.py for what each level costs and saves.
+DEFAULT_LEVELS = {'zstd': 3, 'br': 4, 'gzip': 6}
+COMPRESSIBLE_TYPES = {
+    'application/json', 'application/javascript', 'application/xml',
+    'application/x-ndjson', 'image/svg+xml',
+}
+
+
+def available_encodings():
+    """The encodings this process can produce, most preferred first."""
+    modules = {'zstd': zstandard, 'br': brotli, 'gzip': gzip}
+    return [encoding for encoding in ENCODINGS if modules[encoding] is not None]
+
+
+def negotiate(accept_encoding):
+    """Pick an encoding for an Accept-Encoding header value, or None."""
+    accepted = parse_accept_header(accept_encoding)
+    candidates = [encoding for encoding in available_encodings() if accepted[encoding] > 0]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda encoding: (accepted[encoding], -ENCODINGS.index(encoding)))
+
+
+def compress(encoding, data, level):
+    """Compress a whole body in one call."""
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+class StreamCompressor:
+    """Compress a body chunk by chunk, flushing after each one."""
+
+    def __init__(self, encoding, level):
+        self.encoding = encoding
+        if encoding == 'gzip':
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        elif encoding == 'br':
+            self._compressor = brotli.Compressor(quality=level)
+        else:
+            self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        """Return `data` compressed and flushed, decodable by the client as is."""
+        compressor = self._compressor
+        if self.encoding == 'gzip':
+            return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if self.encoding == 'br':
+            return compressor.process(data) + compressor.flush()
+        return compressor.compress(data) + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        """Return the end of the compressed stream."""
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+class _Captured:
+    """What the wrapped app passed to start_response."""
+
+    def __init__(self):
+        self.status = None
+        self.headers = None
+        self.exc_info = None
+        self.written = []
+
+    def start_response(self, status, headers, exc_info=None):
+        self.status, self.headers, self.exc_info = status, headers, exc_info
+        return self.written.append
+
+
+def status_code(status):
+    return int(status.split(None, 1)[0])
+
+
+def compressible(status, headers):
+    """Whether a response with this status and these headers may be encoded."""
+    code = status_code(status)
+    if code < 200 or code in (204, 206, 304):
+        return False
+    if 'Content-Encoding' in headers or 'Content-Range' in headers:
+        return False
+    if 'no-transform' in headers.get('Cache-Control', ''):
+        return False
+    mimetype = headers.get('Content-Type', '').split(';')[0].strip().lower()
+    return mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES
+
+
+def reusable(status, headers):
+    """Whether every client asking for this URL and ETag gets the same body."""
+    if status_code(status) != 200 or 'ETag' not in headers:
+        return False
+    cache_control = parse_cache_control_header(headers.get('Cache-Control'),
+                                               cls=ResponseCacheControl)
+    if cache_control.no_store or cache_control.private:
+        return False
+    vary = parse_set_header(headers.get('Vary'))
+    return all(field.lower() == 'accept-encoding' for field in vary)
+
+
+class CompressionMiddleware:
+    """Compress the responses of the WSGI app `app`.
+
+    `levels` overrides DEFAULT_LEVELS per encoding; `cache` stores the
+    compressed bodies of reusable responses and needs get and set.
+    """
+
+    def __init__(self, app, min_size=500, levels=None, cache=None):
+        self.app = app
+        self.min_size = min_size
+        self.levels = dict(DEFAULT_LEVELS, **(levels or {}))
+        self.cache = cache if cache is not None else NullCache()
+
+    def __call__(self, environ, start_response):
+        if environ.get('REQUEST_METHOD') == 'HEAD':
+            return self.app(environ, start_response)
+        captured = _Captured()
+        app_iter = self.app(environ, captured.start_response)
+        return self._respond(environ, start_response, captured, app_iter)
+
+    def _wants_more(self, captured, size):
+        # Apps may call start_response on their first chunk; bodies of
+        # unknown length are read up to min_size before deciding.
+        if captured.status is None:
+            return True
+        headers = Headers(captured.headers)
+        return (compressible(captured.status, headers) and 'Content-Length' not in headers
+                and size < self.min_size)
+
+    def _respond(self, environ, start_response, captured, app_iter):
+        try:
+            body = iter(app_iter)
+            head = []
+            size = 0
+            ended = False
+            while self._wants_more(captured, size):
+                chunk = next(body, None)
+                if chunk is None:
+                    ended = True
+                    break
+                head.append(chunk)
+                size += len(chunk)
+            head = captured.written + head
+            headers = Headers(captured.headers)
+            encoding = None
+            if compressible(captured.status, headers):
+                vary = parse_set_header(headers.get('Vary'))
+                vary.add('Accept-Encoding')
+                headers['Vary'] = dump_header(vary)
+                length = int(headers.get('Content-Length', size if ended else self.min_size))
+                if length >= self.min_size:
+                    encoding = negotiate(environ.get('HTTP_ACCEPT_ENCODING', ''))
+            if encoding is None:
+                start_response(captured.status, headers.to_wsgi_list(), captured.exc_info)
+                yield from head
+                yield from body
+                return
+
+            headers['Content-Encoding'] = encoding
+            level = self.levels[encoding]
+            key = None
+            if reusable(captured.status, headers):
+                key = (f"{encoding} {headers['ETag']} {environ.get('SCRIPT_NAME', '')}"
+                       f"{environ.get('PATH_INFO', '')}?{environ.get('QUERY_STRING', '')}")
+                cached = self.cache.get(key)
+                if cached is not None:
+                    headers['Content-Length'] = str(len(cached))
+                    start_response(captured.status, headers.to_wsgi_list(), captured.exc_info)
+                    yield cached
+                    return
+
+            if ended or 'Content-Length' in headers:
+                compressed = compress(encoding, b''.join(chain(head, body)), level)
+                headers['Content-Length'] = str(len(compressed))
+                if key is not None:
+                    self.cache.set(key, compressed)
+                start_response(captured.status, headers.to_wsgi_list(), captured.exc_info)
+                yield compressed
+                return
+
+            start_response(captured.status, headers.to_wsgi_list(), captured.exc_info)
+            stream = StreamCompressor(encoding, level)
+            # Only a reusable body is kept, and only once all of it was produced.
+            sent = [] if key is not None else None
+            # What was read before deciding goes out as one chunk.
+            for chunk in chain([b''.join(head)], body):
+                if chunk:
+                    compressed = stream.compress(chunk)
+                    if sent is not None:
+                        sent.append(compressed)
+                    yield compressed
+            tail = stream.finish()
+            if sent is not None:
+                self.cache.set(key, b''.join(sent) + tail)
+            yield tail
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
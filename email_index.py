@@ -0,0 +1,111 @@
+"""
+In-process Bloom filter of registered emails for cheap duplicate checks.
+
+A negative answer is definite, so registrations with a new email skip the
+duplicate-check SELECT and rely on the unique constraint alone. A positive
+answer may be a false positive (about `error_rate` of new emails) or a
+student deleted since the filter was built, so callers confirm it against
+the database.
+
+The filter is per process. Emails inserted by another worker are not in it,
+which only means the unique constraint reports that duplicate instead of the
+SELECT; deletions elsewhere just leave stale positives. Bloom filters cannot
+remove entries, so deletions are counted and the owner rebuilds the filter
+once `needs_rebuild` says stale entries or growth have degraded it.
+refresh() does so in one thread at a time; the others carry on with the
+filter they have, which never misses an email it was given.
+"""
+import hashlib
+import math
+import threading
+
+
+def normalize_email(email):
+    """Emails are compared and stored trimmed and lower-cased."""
+    return email.strip().lower()
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter sized for `capacity` items at `error_rate`."""
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = max(1, capacity)
+        self.size = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        # Double hashing: k positions derived from two 64-bit halves of one digest.
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self._bits[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(item))
+
+
+class EmailIndex:
+    """Membership test for normalized emails, built lazily from the database.
+
+    `ready` stays False until `rebuild` has loaded the existing emails; until
+    then every lookup answers "maybe" so callers fall back to the database.
+    """
+
+    def __init__(self, capacity=100000, error_rate=0.01):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.ready = False
+        self._filter = BloomFilter(capacity, error_rate)
+        self._count = 0
+        self._stale = 0
+        self._lock = threading.Lock()
+        self._rebuilding = threading.Lock()
+
+    def rebuild(self, emails):
+        """Replace the filter with one holding `emails`."""
+        emails = [normalize_email(email) for email in emails]
+        bloom = BloomFilter(max(self.capacity, 2 * len(emails)), self.error_rate)
+        for email in emails:
+            bloom.add(email)
+        with self._lock:
+            self._filter = bloom
+            self._count = len(emails)
+            self._stale = 0
+            self.ready = True
+
+    def add(self, *emails):
+        with self._lock:
+            for email in emails:
+                self._filter.add(normalize_email(email))
+            self._count += len(emails)
+
+    def discard(self, *emails):
+        with self._lock:
+            self._stale += len(emails)
+
+    def might_contain(self, email):
+        return not self.ready or normalize_email(email) in self._filter
+
+    @property
+    def needs_rebuild(self):
+        """True once the filter is over capacity or a quarter of it is stale."""
+        return self._count > self._filter.capacity or self._stale * 4 > max(self._count, 100)
+
+    def refresh(self, load):
+        """Rebuild from `load()` when not ready or degraded, unless another
+        thread already is; never waits for that thread."""
+        if self.ready and not self.needs_rebuild:
+            return
+        if not self._rebuilding.acquire(blocking=False):
+            return
+        try:
+            if not self.ready or self.needs_rebuild:
+                self.rebuild(load())
+        finally:
+            self._rebuilding.release()
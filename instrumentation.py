@@ -0,0 +1,167 @@
+"""
+Per-request timing: wall time, SQL statements and template rendering.
+
+A RequestTimer collects the numbers for one request while it runs. When the
+request finishes, its duration goes into the app's MetricsRegistry, the one
+latency recorder behind both /metrics and /timings, and Instrumentation adds
+its SQL and template time to running totals for its endpoint.
+server_timing() formats a timer as a Server-Timing header for the browser's
+network panel.
+
+Recording is a few float additions per SQL statement and one short locked
+update per request. When instrumentation is turned off the app listens to
+no SQL or template events, so requests pay only for the registry.
+"""
+import threading
+import time
+
+# Upper bounds in seconds; anything slower lands in a final overflow bucket.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class LatencyHistogram:
+    """Request durations counted into fixed buckets, plus their count and sum.
+
+    `values` is one endpoint's latency row from a MetricsRegistry: the count
+    in each bucket, the count over the last one, then the sum of seconds.
+    """
+
+    def __init__(self, buckets, values):
+        self.buckets = tuple(buckets)
+        self.counts = list(values[:-1])
+        self.count = sum(self.counts)
+        self.sum = values[-1]
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile, or None if empty.
+
+        Requests slower than the last bucket report infinity.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def snapshot(self):
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'buckets': buckets,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+        }
+
+
+class RequestTimer:
+    """Counters for the request in progress."""
+
+    __slots__ = ('started', 'sql_count', 'sql_time', 'template_time',
+                 '_sql_started', '_template_started')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self._sql_started = None
+        self._template_started = None
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def sql_started(self):
+        self._sql_started = time.perf_counter()
+
+    def sql_finished(self):
+        if self._sql_started is not None:
+            self.sql_time += time.perf_counter() - self._sql_started
+            self.sql_count += 1
+            self._sql_started = None
+
+    def template_started(self):
+        self._template_started = time.perf_counter()
+
+    def template_finished(self):
+        if self._template_started is not None:
+            self.template_time += time.perf_counter() - self._template_started
+            self._template_started = None
+
+
+def server_timing(timer, elapsed):
+    """Format a finished request's timer as a Server-Timing header value."""
+    return (f'app;dur={elapsed * 1000:.2f}, '
+            f'db;dur={timer.sql_time * 1000:.2f};desc="{timer.sql_count} queries", '
+            f'tpl;dur={timer.template_time * 1000:.2f}')
+
+
+class EndpointStats:
+    """SQL and template totals for every finished request to one endpoint."""
+
+    def __init__(self):
+        self.requests = 0
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+
+    def snapshot(self, latency):
+        return dict(
+            latency.snapshot(),
+            sql_queries=self.sql_count,
+            sql_seconds=self.sql_time,
+            template_seconds=self.template_time,
+            queries_per_request=self.sql_count / self.requests,
+        )
+
+
+class Instrumentation:
+    """Per-endpoint SQL and template totals, reported with `registry`'s latencies.
+
+    The registry's counters never go backwards, so reset() remembers its
+    latencies at that point and later snapshots subtract them.
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+        self._endpoints = {}
+        self._baseline = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, timer):
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = EndpointStats()
+            stats.requests += 1
+            stats.sql_count += timer.sql_count
+            stats.sql_time += timer.sql_time
+            stats.template_time += timer.template_time
+
+    def snapshot(self):
+        buckets = self.registry.buckets
+        with self._lock:
+            # Taken under the lock: every endpoint recorded here was observed
+            # by the registry first.
+            latency = self.registry.snapshot().latency
+            snapshot = {}
+            for endpoint, stats in sorted(self._endpoints.items()):
+                values = latency[endpoint]
+                baseline = self._baseline.get(endpoint, [0] * len(values))
+                since_reset = [value - before for value, before in zip(values, baseline)]
+                snapshot[endpoint] = stats.snapshot(LatencyHistogram(buckets, since_reset))
+            return snapshot
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+            self._baseline = self.registry.snapshot().latency
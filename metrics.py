@@ -0,0 +1,228 @@
+"""
+Request metrics in the Prometheus text format.
+
+MetricsRegistry counts requests and their latencies without taking a lock
+per request: every thread records into its own shard, and collecting sums
+the shards. Only a thread's first sample takes a lock, to add its shard to
+the list; shards of finished threads are folded into one retired shard
+when metrics are collected, so servers that start a thread per request do
+not grow the list forever.
+
+A registry only sees its own process. With several worker processes,
+FileCollector has each one write its totals to `<directory>/<pid>.json`
+every few seconds and merges every file on a scrape, so whichever worker
+answers reports the whole host.
+"""
+import bisect
+import glob
+import json
+import os
+import tempfile
+import threading
+
+from instrumentation import DEFAULT_BUCKETS
+
+PREFIX = 'student_app'
+
+
+class Totals:
+    """Request counts and latency histograms, as recorded or as merged."""
+
+    __slots__ = ('requests', 'latency')
+
+    def __init__(self):
+        # (endpoint, method, status) -> count
+        self.requests = {}
+        # endpoint -> [count per bucket..., overflow count, sum of seconds]
+        self.latency = {}
+
+    def merge(self, other):
+        # Copying another thread's dicts and lists is atomic under the GIL,
+        # so the owner keeps recording while they are read.
+        for key, count in list(other.requests.items()):
+            self.requests[key] = self.requests.get(key, 0) + count
+        for endpoint, values in list(other.latency.items()):
+            values = list(values)
+            totals = self.latency.get(endpoint)
+            if totals is None:
+                self.latency[endpoint] = values
+            else:
+                self.latency[endpoint] = [a + b for a, b in zip(totals, values)]
+
+    def to_json(self):
+        return {
+            'requests': [[*key, count] for key, count in self.requests.items()],
+            'latency': self.latency,
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        totals = cls()
+        totals.requests = {tuple(row[:3]): row[3] for row in data['requests']}
+        totals.latency = data['latency']
+        return totals
+
+
+class MetricsRegistry:
+    """Per-thread request counters and latency histograms for one process."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._local = threading.local()
+        self._shards = []
+        self._retired = Totals()
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = Totals()
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def observe_request(self, endpoint, method, status, seconds):
+        shard = self._shard()
+        key = (endpoint, method, status)
+        shard.requests[key] = shard.requests.get(key, 0) + 1
+        histogram = shard.latency.get(endpoint)
+        if histogram is None:
+            histogram = shard.latency[endpoint] = [0] * (len(self.buckets) + 2)
+        histogram[bisect.bisect_left(self.buckets, seconds)] += 1
+        histogram[-1] += seconds
+
+    def snapshot(self):
+        """Sum every thread's shard into one Totals."""
+        with self._lock:
+            live = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    live.append((thread, shard))
+                else:
+                    self._retired.merge(shard)
+            self._shards = live
+            totals = Totals()
+            totals.merge(self._retired)
+            for _, shard in live:
+                totals.merge(shard)
+        return totals
+
+
+class FileCollector:
+    """Shares metrics between worker processes through files in `directory`.
+
+    Every process writes its own file at most `interval` seconds after
+    recording, from a daemon thread started by its first request. Files
+    of exited workers are kept so counters never go backwards.
+    """
+
+    def __init__(self, registry, directory, interval=5.0, gauges=None):
+        self.registry = registry
+        self.directory = directory
+        self.interval = interval
+        self.gauges = gauges or (lambda: {})
+        self._pid = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def start(self):
+        # Compared by pid so a worker forked after the parent started its
+        # thread starts its own.
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._pid = os.getpid()
+                    threading.Thread(target=self._run, name='metrics-flush',
+                                     daemon=True).start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def stop(self):
+        self._stop.set()
+
+    def flush(self):
+        data = dict(self.registry.snapshot().to_json(), gauges=self.gauges())
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, os.path.join(self.directory, f'{os.getpid()}.json'))
+
+    def collect(self):
+        """Merge every process's file, this process's written fresh first.
+
+        Returns the merged Totals and {pid: gauges}.
+        """
+        self.flush()
+        totals = Totals()
+        gauges = {}
+        for path in sorted(glob.glob(os.path.join(self.directory, '*.json'))):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            totals.merge(Totals.from_json(data))
+            gauges[os.path.basename(path)[:-len('.json')]] = data['gauges']
+        return totals, gauges
+
+
+def _labels(**labels):
+    escaped = (str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+               for value in labels.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+
+def render(totals, buckets, process_gauges, gauges):
+    """Format merged totals and gauges in the Prometheus text format.
+
+    `process_gauges` maps a pid to that process's {name: value}; `gauges`
+    are host-wide {name: value} pairs.
+    """
+    lines = [
+        f'# HELP {PREFIX}_requests_total Requests handled, by endpoint, method and status.',
+        f'# TYPE {PREFIX}_requests_total counter',
+    ]
+    errors = {}
+    for (endpoint, method, status), count in sorted(totals.requests.items()):
+        lines.append(f'{PREFIX}_requests_total'
+                     f'{_labels(endpoint=endpoint, method=method, status=status)} {count}')
+        if int(status) >= 500:
+            errors[endpoint] = errors.get(endpoint, 0) + count
+        else:
+            errors.setdefault(endpoint, 0)
+
+    lines += [
+        f'# HELP {PREFIX}_request_errors_total Requests answered with a 5xx status.',
+        f'# TYPE {PREFIX}_request_errors_total counter',
+    ]
+    for endpoint, count in sorted(errors.items()):
+        lines.append(f'{PREFIX}_request_errors_total{_labels(endpoint=endpoint)} {count}')
+
+    lines += [
+        f'# HELP {PREFIX}_request_duration_seconds Time to produce the whole response.',
+        f'# TYPE {PREFIX}_request_duration_seconds histogram',
+    ]
+    for endpoint, values in sorted(totals.latency.items()):
+        cumulative = 0
+        for bound, count in zip(tuple(buckets) + ('+Inf',), values):
+            cumulative += count
+            lines.append(f'{PREFIX}_request_duration_seconds_bucket'
+                         f'{_labels(endpoint=endpoint, le=bound)} {cumulative}')
+        lines.append(f'{PREFIX}_request_duration_seconds_sum{_labels(endpoint=endpoint)} '
+                     f'{values[-1]}')
+        lines.append(f'{PREFIX}_request_duration_seconds_count{_labels(endpoint=endpoint)} '
+                     f'{cumulative}')
+
+    names = sorted({name for values in process_gauges.values() for name in values})
+    for name in names:
+        lines.append(f'# TYPE {PREFIX}_{name} gauge')
+        for pid, values in sorted(process_gauges.items()):
+            if name in values:
+                lines.append(f'{PREFIX}_{name}{_labels(pid=pid)} {values[name]}')
+    for name, value in sorted(gauges.items()):
+        lines.append(f'# TYPE {PREFIX}_{name} gauge')
+        lines.append(f'{PREFIX}_{name} {value}')
+    return '\n'.join(lines) + '\n'
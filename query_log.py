@@ -0,0 +1,132 @@
+"""
+Slow-query logging and repeated-statement (N+1) detection.
+
+Both listen to SQLAlchemy's cursor events on one engine.
+
+SlowQueryLog times every statement and, for those over its threshold, logs
+the statement, its parameters, its duration, the endpoint that ran it and
+the database's query plan, fetched with EXPLAIN on the same connection.
+The last few entries are also kept in memory for inspection.
+
+RepeatedQueryDetector counts the statements each request issues, after
+normalizing away literals and IN-list lengths, and reports any that ran
+at least `threshold` times: the signature of a loop issuing one query per
+row where a single query would do. It is meant for development.
+"""
+import logging
+import re
+import time
+from collections import deque
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Statements EXPLAIN accepts; transaction control and PRAGMAs are skipped.
+EXPLAINABLE = {'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'REPLACE'}
+
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*(?:\?|%s|:\w+|__\[POSTCOMPILE_\w+\]),?)+\s*\)',
+                      re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SPACE = re.compile(r'\s+')
+
+
+def normalize_statement(statement):
+    """Reduce a statement to its shape so near-identical ones compare equal."""
+    statement = _STRING.sub('?', statement)
+    statement = _NUMBER.sub('?', statement)
+    statement = _IN_LIST.sub('IN (...)', statement)
+    return _SPACE.sub(' ', statement).strip()
+
+
+def explain(connection, statement, parameters):
+    """Return the query plan of `statement` as text, or None if it has none."""
+    words = statement.lstrip().split(None, 1)
+    if not words or words[0].upper() not in EXPLAINABLE:
+        return None
+    prefix = 'EXPLAIN QUERY PLAN' if connection.dialect.name == 'sqlite' else 'EXPLAIN'
+    cursor = connection.connection.cursor()
+    try:
+        cursor.execute(f'{prefix} {statement}', parameters)
+        rows = cursor.fetchall()
+    except Exception as e:
+        return f'unavailable: {e}'
+    finally:
+        cursor.close()
+    if connection.dialect.name == 'sqlite':
+        # (id, parent, notused, detail)
+        return '\n'.join(row[-1] for row in rows)
+    return '\n'.join(' '.join(str(value) for value in row) for row in rows)
+
+
+class SlowQueryLog:
+    """Log statements slower than `threshold` seconds with their query plans.
+
+    `endpoint` is called with no arguments and names what ran the statement,
+    or returns None outside a request.
+    """
+
+    def __init__(self, threshold, explain=True, keep=100, endpoint=None):
+        self.threshold = threshold
+        self.explain = explain
+        self.entries = deque(maxlen=keep)
+        self.endpoint = endpoint or (lambda: None)
+
+    def install(self, engine):
+        event.listen(engine, 'before_cursor_execute', self._started)
+        event.listen(engine, 'after_cursor_execute', self._finished)
+
+    def _started(self, conn, cursor, statement, parameters, context, executemany):
+        context._slow_query_started = time.perf_counter()
+
+    def _finished(self, conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - context._slow_query_started
+        if duration < self.threshold:
+            return
+        plan = None
+        if self.explain and not executemany:
+            plan = explain(conn, statement, parameters)
+        entry = {
+            'statement': statement,
+            'parameters': parameters,
+            'duration': duration,
+            'endpoint': self.endpoint(),
+            'plan': plan,
+        }
+        self.entries.append(entry)
+        logger.warning('slow query (%.1f ms, endpoint %s): %s\nparameters: %r\nplan:\n%s',
+                       duration * 1000, entry['endpoint'], statement, parameters, plan)
+
+
+class RepeatedQueryDetector:
+    """Report requests that run the same statement shape `threshold` times or more.
+
+    `counts` is called with no arguments and returns the Counter for the
+    current request, or None outside a request; the caller passes that
+    Counter to `check` when the request ends.
+    """
+
+    def __init__(self, threshold, counts, keep=100):
+        self.threshold = threshold
+        self.counts = counts
+        self.reports = deque(maxlen=keep)
+
+    def install(self, engine):
+        event.listen(engine, 'before_cursor_execute', self._executed)
+
+    def _executed(self, conn, cursor, statement, parameters, context, executemany):
+        counts = self.counts()
+        if counts is not None:
+            counts[normalize_statement(statement)] += 1
+
+    def check(self, counts, endpoint):
+        """Log and return the (statement, times) pairs at or over the threshold."""
+        repeated = [(statement, times) for statement, times in counts.most_common()
+                    if times >= self.threshold]
+        for statement, times in repeated:
+            logger.warning('%s ran %d near-identical statements; load them in one query: %s',
+                           endpoint, times, statement)
+        if repeated:
+            self.reports.append({'endpoint': endpoint, 'statements': repeated})
+        return repeated
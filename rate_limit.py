@@ -0,0 +1,179 @@
+"""
+Token-bucket rate limits and a concurrency cap, for admission control.
+
+A Limit lets a key (a client address, an email) make `capacity` requests
+at once and refills at `rate` requests per second; parse_limit('5/minute')
+allows a burst of five and one more every twelve seconds. Buckets live in
+a store whose take() is the whole hot path:
+
+* MemoryStore keeps buckets in this process, spread over `stripes`
+  dictionaries with a lock each so concurrent requests seldom wait on one
+  another. A check is one dictionary lookup and some arithmetic; beyond
+  `max_keys` the least recently used buckets are dropped.
+* SQLiteStore keeps them in a SQLite file that every worker on the host
+  opens, so a limit holds across processes. A check is one UPSERT, atomic
+  without any locking of ours.
+
+ConcurrencyLimit caps how many requests run at once in this process and
+turns the rest away immediately instead of queueing them.
+"""
+import itertools
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+_LIMIT = re.compile(r'\s*(\d+)\s*/\s*(\d*)\s*(second|minute|hour|day)s?\s*')
+
+
+class Limit:
+    """A burst of `capacity` requests, refilled at `rate` per second."""
+
+    __slots__ = ('name', 'capacity', 'rate')
+
+    def __init__(self, name, capacity, rate):
+        self.name = name
+        self.capacity = capacity
+        self.rate = rate
+
+
+def parse_limit(name, spec):
+    """Parse 'N/period', e.g. '5/minute' or '100/12hours'; empty means no limit."""
+    if not spec:
+        return None
+    match = _LIMIT.fullmatch(spec)
+    if match is None or int(match.group(1)) < 1:
+        raise ValueError(f'invalid rate limit: {spec!r}')
+    count, multiple, period = match.groups()
+    seconds = int(multiple or 1) * PERIODS[period]
+    return Limit(name, int(count), int(count) / seconds)
+
+
+class MemoryStore:
+    """Buckets in this process.
+
+    take() returns None when a token was taken, otherwise the seconds until
+    the next one is due.
+    """
+
+    def __init__(self, stripes=16, max_keys=100000, clock=time.monotonic):
+        self._stripes = [(threading.Lock(), OrderedDict()) for _ in range(stripes)]
+        self._stripe_keys = max(1, max_keys // stripes)
+        self.clock = clock
+
+    def take(self, key, limit):
+        lock, buckets = self._stripes[hash(key) % len(self._stripes)]
+        now = self.clock()
+        with lock:
+            bucket = buckets.get(key)
+            if bucket is None:
+                tokens = limit.capacity
+                if len(buckets) >= self._stripe_keys:
+                    buckets.popitem(last=False)
+            else:
+                tokens = min(limit.capacity, bucket[0] + (now - bucket[1]) * limit.rate)
+                buckets.move_to_end(key)
+            if tokens >= 1:
+                buckets[key] = (tokens - 1, now)
+                return None
+            buckets[key] = (tokens, now)
+        return (1 - tokens) / limit.rate
+
+    def __len__(self):
+        return sum(len(buckets) for _, buckets in self._stripes)
+
+
+class SQLiteStore:
+    """Buckets in a SQLite file shared by every worker process on the host.
+
+    take() behaves as MemoryStore.take(). Buckets untouched for
+    `expire_after` seconds are deleted every `prune_every` checks.
+    """
+
+    expire_after = 86400
+    prune_every = 1000
+
+    # Refill and take in one statement; when the bucket is empty the WHERE
+    # leaves it alone and nothing is returned.
+    _TAKE = (
+        'INSERT INTO rate_limit_buckets (key, tokens, updated) '
+        'VALUES (:key, :capacity - 1, :now) '
+        'ON CONFLICT (key) DO UPDATE SET '
+        'tokens = min(:capacity, tokens + max(:now - updated, 0) * :rate) - 1, updated = :now '
+        'WHERE min(:capacity, tokens + max(:now - updated, 0) * :rate) >= 1 '
+        'RETURNING tokens'
+    )
+
+    def __init__(self, path, clock=time.time):
+        self.path = path
+        self.clock = clock
+        self._local = threading.local()
+        self._checks = itertools.count(1)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection().execute(
+            'CREATE TABLE IF NOT EXISTS rate_limit_buckets ('
+            'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL) WITHOUT ROWID'
+        )
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None,
+                                         check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def take(self, key, limit):
+        connection = self._connection()
+        now = self.clock()
+        parameters = {'key': key, 'capacity': limit.capacity, 'rate': limit.rate, 'now': now}
+        # fetchall() finishes the statement, ending its implicit transaction.
+        taken = connection.execute(self._TAKE, parameters).fetchall()
+        if next(self._checks) % self.prune_every == 0:
+            self.prune(now)
+        if taken:
+            return None
+        row = connection.execute(
+            'SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?', (key,)
+        ).fetchone()
+        tokens = min(limit.capacity, row[0] + max(now - row[1], 0) * limit.rate)
+        # Another worker may have refilled it since; never report a zero wait.
+        return max(1 - tokens, 0.001) / limit.rate
+
+    def prune(self, now=None):
+        """Delete buckets that have not been used for `expire_after` seconds."""
+        now = self.clock() if now is None else now
+        self._connection().execute('DELETE FROM rate_limit_buckets WHERE updated < ?',
+                                   (now - self.expire_after,))
+
+    def __len__(self):
+        return self._connection().execute('SELECT count(*) FROM rate_limit_buckets').fetchone()[0]
+
+
+def make_store(backend, path=None):
+    """Build a bucket store from configuration values."""
+    if backend == 'memory':
+        return MemoryStore()
+    if backend == 'sqlite':
+        return SQLiteStore(path)
+    raise ValueError(f'unknown rate limit store: {backend}')
+
+
+class ConcurrencyLimit:
+    """Admit at most `limit` holders at once; acquire() never waits."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._slots = threading.BoundedSemaphore(limit)
+
+    def acquire(self):
+        return self._slots.acquire(blocking=False)
+
+    def release(self):
+        self._slots.release()
@@ -0,0 +1,280 @@
+"""
+Write-behind queue for registrations with group commit.
+
+In queue mode a validated registration is handed to a spool and the client
+gets a ticket to poll instead of waiting for its own transaction to commit.
+A single background writer drains the spool and writes whatever has
+accumulated in one transaction, either once `max_batch` registrations are
+waiting or `flush_interval` seconds after the first one arrived, so a burst
+of N registrations costs one commit rather than N.
+
+Durability trade-offs:
+
+* MemorySpool acknowledges as soon as the registration is in process
+  memory. Anything not yet flushed (at most `flush_interval` seconds worth)
+  is lost if the process crashes or is killed; a clean shutdown flushes
+  it. Ticket statuses also live in the process, so polling must reach the
+  same worker.
+* SQLiteSpool first appends the registration to a journal database in WAL
+  mode with synchronous=NORMAL. That survives a process crash, and pending
+  entries are written by the next writer to start, but not necessarily an
+  OS crash or power loss. Workers sharing one journal file share ticket
+  statuses, and each batch is claimed in an IMMEDIATE transaction so only
+  one writer writes it.
+
+Either way a duplicate email is only detected when the batch is written, so
+the client learns about it on the status page rather than from the form.
+"""
+import json
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+PENDING = 'pending'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class MemorySpool:
+    """Pending registrations held in process memory."""
+
+    def __init__(self, max_results=10000):
+        self.max_results = max_results
+        self._queue = queue.Queue()
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, values):
+        ticket = uuid.uuid4().hex
+        with self._lock:
+            self._remember(ticket, (PENDING, None))
+        self._queue.put((ticket, values))
+        return ticket
+
+    def take(self, limit, timeout):
+        """Wait up to `timeout` for a first entry, then gather until `limit` or the deadline."""
+        deadline = time.monotonic() + timeout
+        try:
+            batch = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while len(batch) < limit:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def complete(self, results):
+        with self._lock:
+            for ticket, result in results.items():
+                self._remember(ticket, result)
+
+    def status(self, ticket):
+        with self._lock:
+            return self._results.get(ticket)
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _remember(self, ticket, result):
+        self._results[ticket] = result
+        self._results.move_to_end(ticket)
+        while len(self._results) > self.max_results:
+            self._results.popitem(last=False)
+
+    def close(self):
+        pass
+
+
+class SQLiteSpool:
+    """Pending registrations journaled to a SQLite file before acknowledging."""
+
+    # Claimed entries whose writer died are retried after this many seconds.
+    claim_timeout = 60
+    # Finished entries are kept this long so clients can still poll them.
+    retention = 3600
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        connection = self._connection()
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS registration_spool ('
+            'ticket TEXT PRIMARY KEY, payload TEXT NOT NULL, state TEXT NOT NULL, '
+            'result TEXT, claimed_at REAL, created_at REAL NOT NULL)'
+        )
+        connection.execute(
+            'CREATE INDEX IF NOT EXISTS ix_registration_spool_state '
+            'ON registration_spool (state, created_at)'
+        )
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None,
+                                         check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def put(self, values):
+        ticket = uuid.uuid4().hex
+        self._connection().execute(
+            'INSERT INTO registration_spool (ticket, payload, state, created_at) '
+            'VALUES (?, ?, ?, ?)',
+            (ticket, json.dumps(values), PENDING, time.time()),
+        )
+        self._wakeup.set()
+        return ticket
+
+    def take(self, limit, timeout):
+        """Claim up to `limit` pending entries, waiting at most `timeout` for some to appear."""
+        batch = self._claim(limit)
+        if batch:
+            return batch
+        self._wakeup.wait(timeout)
+        self._wakeup.clear()
+        return self._claim(limit)
+
+    def _claim(self, limit):
+        connection = self._connection()
+        now = time.time()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            rows = connection.execute(
+                'SELECT ticket, payload FROM registration_spool '
+                'WHERE state = ? OR (state = ? AND claimed_at < ?) '
+                'ORDER BY created_at LIMIT ?',
+                (PENDING, 'claimed', now - self.claim_timeout, limit),
+            ).fetchall()
+            connection.executemany(
+                "UPDATE registration_spool SET state = 'claimed', claimed_at = ? WHERE ticket = ?",
+                [(now, ticket) for ticket, _ in rows],
+            )
+            connection.execute('COMMIT')
+        except BaseException:  # pragma: no cover - keeps the journal usable
+            connection.execute('ROLLBACK')
+            raise
+        return [(ticket, json.loads(payload)) for ticket, payload in rows]
+
+    def complete(self, results):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        connection.executemany(
+            'UPDATE registration_spool SET state = ?, result = ? WHERE ticket = ?',
+            [(state, json.dumps(payload), ticket) for ticket, (state, payload) in results.items()],
+        )
+        connection.execute(
+            'DELETE FROM registration_spool WHERE state IN (?, ?) AND created_at < ?',
+            (DONE, FAILED, time.time() - self.retention),
+        )
+        connection.execute('COMMIT')
+
+    def status(self, ticket):
+        row = self._connection().execute(
+            'SELECT state, result FROM registration_spool WHERE ticket = ?', (ticket,)
+        ).fetchone()
+        if row is None:
+            return None
+        state, result = row
+        if state == 'claimed':
+            return (PENDING, None)
+        return (state, json.loads(result) if result else None)
+
+    def pending(self):
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM registration_spool WHERE state IN (?, 'claimed')", (PENDING,)
+        ).fetchone()[0]
+
+    def close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+class GroupCommitWriter:
+    """Background thread that drains a spool in batches.
+
+    `write_batch` receives a list of registration dicts and returns one
+    (state, payload) result per entry, in order; it is responsible for
+    writing the whole batch in a single transaction.
+    """
+
+    def __init__(self, spool, write_batch, max_batch=200, flush_interval=0.05):
+        self.spool = spool
+        self.write_batch = write_batch
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+
+    def submit(self, values):
+        ticket = self.spool.put(values)
+        self.start()
+        return ticket
+
+    def status(self, ticket):
+        return self.spool.status(ticket)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._closed = False
+                self._stop.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name='registration-writer', daemon=True
+                )
+                self._thread.start()
+
+    def flush_once(self, timeout=0):
+        """Write one batch if any registrations are waiting; return how many were written."""
+        batch = self.spool.take(self.max_batch, timeout)
+        if not batch:
+            return 0
+        try:
+            results = self.write_batch([values for _, values in batch])
+        except Exception as e:
+            results = [(FAILED, f'Registration failed: {e}')] * len(batch)
+        self.spool.complete({ticket: result for (ticket, _), result in zip(batch, results)})
+        return len(batch)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.flush_once(self.flush_interval)
+
+    def close(self):
+        """Stop the writer, flush everything still waiting and close the spool."""
+        if self._closed:
+            return
+        self._closed = True
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        while self.flush_once():
+            pass
+        self.spool.close()
+
+
+def make_spool(backend, path=None):
+    """Build a spool from configuration values."""
+    if backend == 'memory':
+        return MemorySpool()
+    if backend == 'sqlite':
+        return SQLiteSpool(path)
+    raise ValueError(f'unknown registration spool: {backend}')
@@ -22,6 +22,15 @@ def run_tests():
         'tests/',
         '-v',
         '--cov=app',
+        '--cov=cache',
+        '--cov=registration_queue',
+        '--cov=email_index',
+        '--cov=instrumentation',
+        '--cov=metrics',
+        '--cov=query_log',
+        '--cov=assets',
+        '--cov=compress',
+        '--cov=rate_limit',
         '--cov-report=term-missing',
         '--cov-report=html:coverage_html',
         '--cov-fail-under=100',
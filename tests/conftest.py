@@ -4,23 +4,21 @@ Pytest configuration and fixtures for the Student Registration Application.
 import pytest
 import os
 import sys
+import zlib
 from datetime import datetime, date
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from app import app, db, Student
+import compress
+from app import create_app, db, Student
 
 
 @pytest.fixture(scope='function')
-def test_app():
+def test_app(make_app):
     """Create and configure a new app instance for each test."""
-    # Configure the app for testing
-    app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-    app.config['WTF_CSRF_ENABLED'] = False
-    app.config['SECRET_KEY'] = 'test-secret-key'
-    
+    app = make_app(WTF_CSRF_ENABLED=False)
+
     # Create tables
     with app.app_context():
         db.create_all()
@@ -29,6 +27,53 @@ def test_app():
         db.drop_all()
 
 
+@pytest.fixture(scope='function')
+def make_app(tmp_path):
+    """Build apps on an in-memory database; keyword arguments override the config."""
+    def make_app(**config):
+        return create_app(dict({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+            'SECRET_KEY': 'test-secret-key',
+            'JINJA_CACHE_DIR': str(tmp_path / 'jinja'),
+        }, **config))
+    return make_app
+
+
+def add_student(email, **fields):
+    """Insert and commit a student; keyword arguments override the other columns."""
+    student = Student(**dict({
+        'first_name': 'Ann',
+        'last_name': 'Lee',
+        'phone': '1234567890',
+        'date_of_birth': date(2000, 1, 1),
+        'gender': 'Female',
+        'address': '1 Main St',
+        'city': 'Boston',
+        'course': 'Law',
+    }, email=email, **fields))
+    db.session.add(student)
+    db.session.commit()
+    return student
+
+
+@pytest.fixture(scope='function')
+def queue_app(tmp_path, make_app):
+    """An app queueing registrations to a file database, so the writer thread sees them."""
+    queue_app = make_app(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'students.db'}",
+        REGISTRATION_MODE='queue',
+        REGISTRATION_FLUSH_MS=10,
+    )
+    with queue_app.app_context():
+        db.create_all()
+    yield queue_app
+    queue_app.extensions['registration_queue'].close()
+    with queue_app.app_context():
+        db.drop_all()
+        db.engine.dispose()
+
+
 @pytest.fixture(scope='function')
 def client(test_app):
     """A test client for the app."""
@@ -94,9 +139,52 @@ def created_student(test_app, sample_student_data):
         return student_id
 
 
+class FakeBrotli:
+    """brotli's interface over zlib, so output can be checked."""
+
+    @staticmethod
+    def compress(data, quality):
+        return zlib.compress(data)
 
+    class Compressor:
+        def __init__(self, quality):
+            self._compressor = zlib.compressobj()
 
+        def process(self, data):
+            return self._compressor.compress(data)
 
+        def flush(self):
+            return self._compressor.flush(zlib.Z_SYNC_FLUSH)
 
+        def finish(self):
+            return self._compressor.flush()
 
 
+class FakeZstandard:
+    """zstandard's interface over zlib."""
+
+    COMPRESSOBJ_FLUSH_BLOCK = zlib.Z_SYNC_FLUSH
+
+    class ZstdCompressor:
+        def __init__(self, level):
+            pass
+
+        def compress(self, data):
+            return zlib.compress(data)
+
+        def compressobj(self):
+            return zlib.compressobj()
+
+
+@pytest.fixture(scope='function')
+def all_encodings(monkeypatch):
+    """Offer brotli and zstandard through zlib-backed stand-ins."""
+    monkeypatch.setattr(compress, 'brotli', FakeBrotli)
+    monkeypatch.setattr(compress, 'zstandard', FakeZstandard)
+
+
+@pytest.fixture(scope='function')
+def gzip_only(monkeypatch):
+    """Compress as if neither optional codec were installed."""
+    monkeypatch.setattr(compress, 'brotli', None)
+    monkeypatch.setattr(compress, 'zstandard', None)
@@ -0,0 +1,165 @@
+"""
+Unit tests for the JSON student API.
+"""
+import gzip
+import json
+import zlib
+import pytest
+import app as app_module
+from app import db, Student
+
+
+@pytest.fixture
+def api_student(client, sample_student_data):
+    response = client.post('/api/students', json=sample_student_data)
+    return response.get_json()['id']
+
+
+class TestApiCreate:
+    """Test creating students through the API."""
+
+    def test_create_returns_201(self, client, test_app, sample_student_data):
+        """Test a valid payload creates a student."""
+        response = client.post('/api/students', json=sample_student_data)
+        assert response.status_code == 201
+        body = response.get_json()
+        assert body['email'] == 'john.doe@example.com'
+        assert body['date_of_birth'] == '2000-05-15'
+        assert response.headers['Location'].endswith(f"/api/students/{body['id']}")
+        with test_app.app_context():
+            assert Student.query.count() == 1
+
+    def test_create_invalid_payload(self, client, sample_student_data):
+        """Test an invalid payload is rejected with 400."""
+        del sample_student_data['email']
+        response = client.post('/api/students', json=sample_student_data)
+        assert response.status_code == 400
+        assert response.get_json()['error'] == 'missing email'
+
+    def test_create_non_json_body(self, client):
+        """Test a non-JSON body is rejected with 400."""
+        response = client.post('/api/students', data='hello')
+        assert response.status_code == 400
+
+    def test_create_duplicate_email(self, client, api_student, sample_student_data):
+        """Test a duplicate email is rejected with 409."""
+        response = client.post('/api/students', json=sample_student_data)
+        assert response.status_code == 409
+
+    def test_create_duplicate_email_race(self, client, api_student, sample_student_data,
+                                         monkeypatch):
+        """Test a duplicate inserted after the email check still gets 409."""
+        monkeypatch.setattr(app_module, 'existing_emails', lambda emails: set())
+        response = client.post('/api/students', json=sample_student_data)
+        assert response.status_code == 409
+
+
+class TestApiRead:
+    """Test reading students through the API."""
+
+    def test_get_student(self, client, api_student):
+        """Test fetching one student returns every field."""
+        response = client.get(f'/api/students/{api_student}')
+        assert response.status_code == 200
+        assert set(response.get_json()) == set(app_module.API_FIELDS)
+
+    def test_get_student_projection(self, client, api_student):
+        """Test fields= limits the returned fields."""
+        response = client.get(f'/api/students/{api_student}?fields=first_name,email')
+        assert response.get_json() == {'first_name': 'John', 'email': 'john.doe@example.com'}
+
+    def test_get_missing_student(self, client):
+        """Test fetching an unknown student returns 404."""
+        response = client.get('/api/students/999')
+        assert response.status_code == 404
+        assert response.get_json()['error'] == 'student not found'
+
+    def test_unknown_field(self, client, api_student):
+        """Test an unknown field name is rejected."""
+        response = client.get(f'/api/students/{api_student}?fields=first_name,password')
+        assert response.status_code == 400
+        assert response.get_json()['error'] == 'unknown fields: password'
+
+    def test_empty_fields(self, client):
+        """Test an empty projection is rejected."""
+        response = client.get('/api/students?fields=,')
+        assert response.status_code == 400
+
+    def test_list_projection_and_cursor(self, client, sample_student_data, another_student_data):
+        """Test listing pages through students with only the requested fields."""
+        client.post('/api/students', json=sample_student_data)
+        client.post('/api/students', json=another_student_data)
+        first = client.get('/api/students?fields=first_name&per_page=1').get_json()
+        assert first['students'] == [{'first_name': 'Jane'}]
+        assert first['prev_cursor'] is None
+        second = client.get(f"/api/students?fields=first_name&per_page=1&after={first['next_cursor']}").get_json()
+        assert second['students'] == [{'first_name': 'John'}]
+        assert second['next_cursor'] is None
+        back = client.get(f"/api/students?fields=first_name&per_page=1&before={second['prev_cursor']}").get_json()
+        assert back['students'] == [{'first_name': 'Jane'}]
+
+
+class TestApiDelete:
+    """Test deleting students through the API."""
+
+    def test_delete_student(self, client, test_app, api_student):
+        """Test deleting a student returns 204."""
+        response = client.delete(f'/api/students/{api_student}')
+        assert response.status_code == 204
+        with test_app.app_context():
+            assert Student.query.count() == 0
+
+    def test_delete_missing_student(self, client):
+        """Test deleting an unknown student returns 404."""
+        assert client.delete('/api/students/999').status_code == 404
+
+
+class TestApiConditionalRequests:
+    """Test ETag handling."""
+
+    def test_etag_and_304(self, client, api_student):
+        """Test a matching If-None-Match yields 304 without a body."""
+        response = client.get(f'/api/students/{api_student}')
+        etag = response.headers['ETag']
+        assert etag.startswith('W/')
+        cached = client.get(f'/api/students/{api_student}', headers={'If-None-Match': etag})
+        assert cached.status_code == 304
+        assert cached.data == b''
+
+    def test_etag_changes_with_data(self, client, api_student, another_student_data):
+        """Test the listing ETag changes after a write."""
+        before = client.get('/api/students').headers['ETag']
+        client.post('/api/students', json=another_student_data)
+        assert client.get('/api/students').headers['ETag'] != before
+
+
+class TestApiCompression:
+    """Test API responses are compressed by the middleware."""
+
+    @pytest.fixture
+    def small_bodies(self, test_app, monkeypatch):
+        monkeypatch.setattr(test_app.extensions['compression'], 'min_size', 10)
+
+    def test_gzip_when_accepted(self, client, api_student, small_bodies, gzip_only):
+        """Test gzip is applied above the size threshold."""
+        response = client.get('/api/students', headers={'Accept-Encoding': 'gzip, br'})
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert json.loads(gzip.decompress(response.data))['students'][0]['first_name'] == 'John'
+
+    def test_brotli_preferred_when_available(self, client, api_student, small_bodies,
+                                             all_encodings):
+        """Test brotli is used when the module is installed and accepted."""
+        response = client.get('/api/students', headers={'Accept-Encoding': 'gzip, br'})
+        assert response.headers['Content-Encoding'] == 'br'
+        assert json.loads(zlib.decompress(response.data))['students'][0]['first_name'] == 'John'
+
+    def test_small_bodies_not_compressed(self, client, api_student):
+        """Test bodies below the threshold are sent as-is."""
+        response = client.get(f'/api/students/{api_student}?fields=id', headers={'Accept-Encoding': 'gzip'})
+        assert 'Content-Encoding' not in response.headers
+
+    def test_identity_when_not_accepted(self, client, api_student, small_bodies):
+        """Test no encoding is applied without Accept-Encoding."""
+        response = client.get('/api/students')
+        assert 'Content-Encoding' not in response.headers
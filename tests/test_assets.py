@@ -0,0 +1,216 @@
+"""
+Unit tests for the static asset build and how built assets are served.
+"""
+import gzip
+import io
+import os
+import shutil
+import pytest
+import assets
+from app import use_asset_manifest
+from assets import build_assets, load_manifest, minify_css, rewrite_css_urls
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+FONT_CSS = """/* fonts */
+@font-face {
+    font-family: 'Body';
+    src: url("../fonts/body.woff2?v=1") format('woff2'), url(https://cdn.example.com/x.woff2);
+}
+"""
+
+
+@pytest.fixture
+def static_copy(tmp_path):
+    """A copy of the real static folder plus a font, to build into."""
+    folder = tmp_path / 'static'
+    shutil.copytree(os.path.join(ROOT, 'static'), folder,
+                    ignore=shutil.ignore_patterns('dist'))
+    (folder / 'fonts').mkdir()
+    (folder / 'fonts' / 'body.woff2').write_bytes(b'wOF2' + bytes(300))
+    (folder / 'css' / 'fonts.css').write_text(FONT_CSS)
+    return folder
+
+
+@pytest.fixture
+def built_app(test_app, static_copy, monkeypatch):
+    monkeypatch.setattr(test_app, 'static_folder', str(static_copy))
+    use_asset_manifest(test_app, build_assets(str(static_copy)))
+    return test_app
+
+
+class TestMinifyCss:
+    """Test CSS minification."""
+
+    def test_whitespace_and_comments(self):
+        """Test comments and layout whitespace are removed."""
+        css = '/* a */\n.a , .b > .c {\n    color : red;\n    margin: 0 auto;\n}\n'
+        assert minify_css(css) == '.a,.b>.c{color :red;margin:0 auto}'
+
+    def test_strings_and_calc_kept(self):
+        """Test quoted strings and meaningful spaces survive."""
+        css = ".a { content: '/* x */  {;}'; width: calc(100% - 2px); }"
+        assert minify_css(css) == ".a{content:'/* x */  {;}';width:calc(100% - 2px)}"
+
+    def test_real_stylesheet_shrinks(self):
+        """Test the app stylesheet gets smaller and keeps its data URL intact."""
+        with open(os.path.join(ROOT, 'static', 'css', 'style.css')) as f:
+            css = f.read()
+        minified = minify_css(css)
+        assert len(minified) < len(css) * 0.8
+        assert "points='6 9 12 15 18 9'" in minified
+
+
+class TestRewriteCssUrls:
+    """Test url() references follow the hashed names."""
+
+    def test_relative_references(self):
+        """Test relative paths are rewritten and everything else left alone."""
+        manifest = {'fonts/body.woff2': 'dist/fonts/body.abc.woff2'}
+        css = rewrite_css_urls(FONT_CSS, 'css/fonts.css', manifest)
+        assert 'url("../fonts/body.abc.woff2?v=1")' in css
+        assert 'url(https://cdn.example.com/x.woff2)' in css
+        assert rewrite_css_urls('a{b:url(missing.png)}', 'css/a.css', manifest) == \
+            'a{b:url(missing.png)}'
+
+
+class TestBuildAssets:
+    """Test writing hashed, minified and compressed copies."""
+
+    def test_manifest_and_outputs(self, static_copy):
+        """Test every file gets a hashed copy and text files a gzip sibling."""
+        manifest = build_assets(str(static_copy))
+        assert set(manifest) == {'css/style.css', 'css/fonts.css', 'fonts/body.woff2'}
+        style = static_copy / manifest['css/style.css']
+        assert manifest['css/style.css'].startswith('dist/css/style.')
+        assert gzip.decompress((static_copy / (manifest['css/style.css'] + '.gz')).read_bytes()) \
+            == style.read_bytes()
+        assert not (static_copy / (manifest['fonts/body.woff2'] + '.gz')).exists()
+        fonts = (static_copy / manifest['css/fonts.css']).read_text()
+        assert os.path.basename(manifest['fonts/body.woff2']) in fonts
+        assert load_manifest(str(static_copy)) == manifest
+
+    def test_rebuild_is_stable(self, static_copy):
+        """Test unchanged files keep their names and bytes, changed ones move."""
+        first = build_assets(str(static_copy))
+        gz = (static_copy / (first['css/style.css'] + '.gz')).read_bytes()
+        assert build_assets(str(static_copy)) == first
+        assert (static_copy / (first['css/style.css'] + '.gz')).read_bytes() == gz
+        with open(static_copy / 'css' / 'style.css', 'a') as f:
+            f.write('.new { color: red; }')
+        second = build_assets(str(static_copy))
+        assert second['css/style.css'] != first['css/style.css']
+        assert (static_copy / first['css/style.css']).exists()
+
+    def test_brotli_siblings(self, static_copy, monkeypatch):
+        """Test .br copies are written when brotli is installed."""
+        class FakeBrotli:
+            @staticmethod
+            def compress(data):
+                return b'br:' + data
+
+        monkeypatch.setattr(assets, 'brotli', FakeBrotli)
+        manifest = build_assets(str(static_copy))
+        assert (static_copy / (manifest['css/style.css'] + '.br')).read_bytes().startswith(b'br:')
+
+    def test_missing_manifest(self, tmp_path):
+        """Test an unbuilt folder has an empty manifest."""
+        assert load_manifest(str(tmp_path)) == {}
+
+
+class TestServingBuiltAssets:
+    """Test pages link to built assets and how they are served."""
+
+    def test_pages_link_hashed_names(self, client, built_app):
+        """Test url_for('static') resolves through the manifest."""
+        manifest = built_app.extensions['asset_manifest']
+        html = client.get('/').get_data(as_text=True)
+        assert f'/static/{manifest["css/style.css"]}' in html
+        assert '/static/css/style.css' not in html
+
+    def test_immutable_and_precompressed(self, client, built_app):
+        """Test a hashed asset is cached for a year and sent gzipped when accepted."""
+        url = f'/static/{built_app.extensions["asset_manifest"]["css/style.css"]}'
+        response = client.get(url, headers={'Accept-Encoding': 'gzip, deflate'})
+        assert response.status_code == 200
+        assert response.content_encoding == 'gzip'
+        assert response.mimetype == 'text/css'
+        assert 'immutable' in response.headers['Cache-Control']
+        assert 'max-age=31536000' in response.headers['Cache-Control']
+        assert 'Accept-Encoding' in response.headers['Vary']
+        plain = client.get(url)
+        assert plain.content_encoding is None
+        assert gzip.decompress(response.data) == plain.data
+        response.close()
+        plain.close()
+
+    def test_brotli_preferred(self, client, built_app, static_copy, monkeypatch):
+        """Test a .br sibling wins when the client accepts it."""
+        monkeypatch.setattr(assets, 'brotli', type('B', (), {'compress': staticmethod(bytes)}))
+        use_asset_manifest(built_app, build_assets(str(static_copy)))
+        url = f'/static/{built_app.extensions["asset_manifest"]["css/style.css"]}'
+        response = client.get(url, headers={'Accept-Encoding': 'br, gzip'})
+        assert response.content_encoding == 'br'
+        response.close()
+
+    def test_unbuilt_files_served_normally(self, client, built_app):
+        """Test files outside the build keep Flask's default caching."""
+        response = client.get('/static/css/style.css')
+        assert response.status_code == 200
+        assert 'immutable' not in response.headers.get('Cache-Control', '')
+        response.close()
+
+    def test_without_build(self, client, test_app):
+        """Test the original names are linked when nothing was built."""
+        use_asset_manifest(test_app, {})
+        assert b'/static/css/style.css' in client.get('/').data
+
+
+class TestCommands:
+    """Test the build-assets and fetch-fonts commands."""
+
+    def test_build_assets(self, test_app, static_copy, monkeypatch):
+        """Test the command builds and switches the app to the new manifest."""
+        monkeypatch.setattr(test_app, 'static_folder', str(static_copy))
+        result = test_app.test_cli_runner().invoke(args=['build-assets'])
+        assert result.exit_code == 0
+        assert 'Built 3 assets' in result.output
+        assert test_app.extensions['asset_manifest'] == load_manifest(str(static_copy))
+
+    def test_fetch_fonts(self, test_app, tmp_path, monkeypatch):
+        """Test the stylesheet and fonts are saved with local references."""
+        fetched = []
+        remote_css = ("@font-face{src:url(https://fonts.gstatic.com/s/a/v1/one.woff2)}"
+                      "@font-face{src:url(https://fonts.gstatic.com/s/a/v1/one.woff2)}")
+
+        def fake_urlopen(request, timeout):
+            fetched.append(request.full_url)
+            assert 'Chrome' in request.get_header('User-agent')
+            return io.BytesIO(remote_css.encode() if 'googleapis' in request.full_url
+                              else b'font-bytes')
+
+        monkeypatch.setattr(assets, 'urlopen', fake_urlopen)
+        monkeypatch.setattr(test_app, 'static_folder', str(tmp_path))
+        result = test_app.test_cli_runner().invoke(args=['fetch-fonts'])
+        assert result.exit_code == 0
+        assert 'Saved 2 files' in result.output
+        assert len(fetched) == 2
+        assert (tmp_path / 'fonts' / 'one.woff2').read_bytes() == b'font-bytes'
+        assert (tmp_path / 'css' / 'fonts.css').read_text().count('url(../fonts/one.woff2)') == 2
+
+
+class TestFonts:
+    """Test where pages load their fonts from."""
+
+    def test_google_fonts_by_default(self, client):
+        """Test the default pages preconnect to Google Fonts."""
+        html = client.get('/').get_data(as_text=True)
+        assert 'rel="preconnect" href="https://fonts.gstatic.com"' in html
+        assert 'fonts.googleapis.com/css2' in html
+
+    def test_self_hosted(self, client, built_app):
+        """Test SELF_HOSTED_FONTS links the local, fingerprinted stylesheet only."""
+        built_app.config['SELF_HOSTED_FONTS'] = True
+        html = client.get('/').get_data(as_text=True)
+        assert 'googleapis' not in html
+        assert f'/static/{built_app.extensions["asset_manifest"]["css/fonts.css"]}' in html
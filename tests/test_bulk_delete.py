@@ -0,0 +1,311 @@
+"""
+Unit tests for bulk deletes, soft deletes and the background purge.
+"""
+import threading
+import pytest
+from datetime import datetime
+from sqlalchemy import event
+from app import (db, Student, StudentPurger, STAT_TRIGGERS, bulk_delete_students, purge_deleted_students,
+                 existing_emails, import_students, student_count, student_stats, upgrade_database)
+from tests.conftest import add_student
+from tests.test_pagination import make_students
+
+
+def remaining_emails():
+    return sorted(db.session.scalars(db.select(Student.email).where(
+        Student.deleted_at.is_(None)
+    )))
+
+
+def count_commits():
+    commits = []
+    event.listen(db.session, 'after_commit', commits.append)
+    return commits
+
+
+@pytest.fixture
+def cohort(test_app):
+    with test_app.app_context():
+        add_student('jan@example.com', registration_date=datetime(2024, 1, 15))
+        add_student('feb@example.com', registration_date=datetime(2024, 2, 15))
+        add_student('mar@example.com', registration_date=datetime(2024, 3, 15))
+        add_student('med@example.com', course='Medicine', registration_date=datetime(2024, 2, 15))
+
+
+@pytest.fixture
+def soft_delete(test_app, monkeypatch):
+    monkeypatch.setitem(test_app.config, 'SOFT_DELETE', True)
+    monkeypatch.setattr(test_app.extensions['student_purger'], 'start', lambda: None)
+
+
+class TestBulkDelete:
+    """Test deleting many students with set-based batches."""
+
+    def test_delete_by_ids_in_batches(self, test_app):
+        """Test an id list is deleted with one commit per batch."""
+        with test_app.app_context():
+            make_students(5)
+            ids = db.session.scalars(db.select(Student.id)).all()
+            commits = count_commits()
+            assert bulk_delete_students(ids[:4] + [9999], batch_size=2) == 4
+            assert len(commits) == 3
+            assert remaining_emails() == ['student004@example.com']
+            assert student_count() == 1
+
+    def test_delete_by_filter(self, test_app, cohort):
+        """Test course and inclusive date filters are combined."""
+        with test_app.app_context():
+            deleted = bulk_delete_students(course='Law', registered_from=datetime(2024, 2, 1),
+                                           registered_to=datetime(2024, 3, 15), batch_size=1)
+            assert deleted == 2
+            assert remaining_emails() == ['jan@example.com', 'med@example.com']
+            assert student_stats()['course'] == {'Law': 1, 'Medicine': 1}
+
+    def test_requires_criteria(self, test_app, cohort):
+        """Test an empty request never deletes the whole table."""
+        with test_app.app_context():
+            with pytest.raises(ValueError):
+                bulk_delete_students()
+            assert len(remaining_emails()) == 4
+
+    def test_deleted_emails_can_register_again(self, client, test_app, cohort,
+                                               sample_student_data):
+        """Test the email filter forgets bulk-deleted addresses."""
+        with test_app.app_context():
+            bulk_delete_students(course='Law')
+        data = dict(sample_student_data, email='jan@example.com')
+        response = client.post('/register', data=data)
+        assert response.status_code == 302
+
+
+class TestBulkDeleteEndpoint:
+    """Test the bulk delete endpoint and command."""
+
+    def test_json_ids(self, client, test_app, cohort):
+        """Test a JSON id list is deleted."""
+        with test_app.app_context():
+            ids = db.session.scalars(db.select(Student.id).where(Student.course == 'Law')).all()
+        response = client.post('/students/bulk-delete', json={'ids': ids})
+        assert response.status_code == 200
+        assert response.get_json() == {'deleted': 3, 'soft': False}
+
+    def test_form_filters(self, client, test_app, cohort):
+        """Test form fields select students by course and date range."""
+        response = client.post('/students/bulk-delete', data={
+            'course': 'Law', 'registered_from': '2024-02-01', 'registered_to': '2024-02-28',
+        })
+        assert response.get_json()['deleted'] == 1
+        with test_app.app_context():
+            assert 'feb@example.com' not in remaining_emails()
+
+    def test_form_ids(self, client, test_app, cohort):
+        """Test repeated and comma-separated form ids are both accepted."""
+        with test_app.app_context():
+            ids = db.session.scalars(db.select(Student.id)).all()
+        response = client.post('/students/bulk-delete',
+                               data={'ids': [str(ids[0]), f'{ids[1]},{ids[2]}']})
+        assert response.get_json()['deleted'] == 3
+
+    def test_invalidates_listing(self, client, cohort):
+        """Test cached pages stop showing deleted students."""
+        assert b'jan@example.com' in client.get('/students').data
+        client.post('/students/bulk-delete', json={'course': 'Law'})
+        assert b'jan@example.com' not in client.get('/students').data
+
+    @pytest.mark.parametrize('body', [
+        {},
+        {'ids': ['x']},
+        {'ids': 5},
+        {'course': 'Law', 'registered_from': '15/01/2024'},
+    ])
+    def test_bad_requests(self, client, body):
+        """Test missing criteria and malformed values are rejected."""
+        response = client.post('/students/bulk-delete', json=body)
+        assert response.status_code == 400
+        assert 'error' in response.get_json()
+
+    def test_command(self, test_app, cohort):
+        """Test the CLI deletes by filter and reports the count."""
+        result = test_app.test_cli_runner().invoke(args=[
+            'delete-students', '--course', 'Law', '--from', '2024-02-01', '--batch-size', '1',
+        ])
+        assert result.exit_code == 0
+        assert 'Deleted 2 students.' in result.output
+
+    def test_command_by_id(self, test_app, cohort):
+        """Test the CLI deletes repeated --id options."""
+        with test_app.app_context():
+            ids = db.session.scalars(db.select(Student.id)).all()
+        result = test_app.test_cli_runner().invoke(
+            args=['delete-students', '--id', str(ids[0]), '--id', str(ids[1])]
+        )
+        assert 'Deleted 2 students.' in result.output
+
+    def test_command_requires_criteria(self, test_app):
+        """Test the CLI refuses to run without ids or filters."""
+        result = test_app.test_cli_runner().invoke(args=['delete-students'])
+        assert result.exit_code != 0
+        assert 'give student ids or at least one filter' in result.output
+
+
+class TestSoftDelete:
+    """Test marking students deleted and purging them later."""
+
+    def test_soft_deleted_rows_are_hidden(self, client, test_app, cohort, soft_delete):
+        """Test soft-deleted students vanish from every read path."""
+        with test_app.app_context():
+            student_id = Student.query.filter_by(email='jan@example.com').one().id
+        assert client.post(f'/students/{student_id}/delete').status_code == 302
+        with test_app.app_context():
+            assert db.session.get(Student, student_id).deleted_at is not None
+            assert student_count() == 3
+            assert student_stats()['course'] == {'Law': 2, 'Medicine': 1}
+        assert b'jan@example.com' not in client.get('/students').data
+        assert b'jan@example.com' not in client.get('/students/export?format=csv').data
+        assert client.get(f'/api/students/{student_id}').status_code == 404
+        assert client.get('/api/students/search?q=jan').get_json()['students'] == []
+        assert client.post(f'/students/{student_id}/delete').status_code == 404
+        assert client.delete(f'/api/students/{student_id}').status_code == 404
+
+    def test_bulk_soft_delete(self, client, cohort, soft_delete):
+        """Test the endpoint reports soft deletes."""
+        response = client.post('/students/bulk-delete', json={'course': 'Law'})
+        assert response.get_json() == {'deleted': 3, 'soft': True}
+
+    def test_email_reusable_before_purge(self, client, test_app, cohort, soft_delete,
+                                         sample_student_data):
+        """Test registering a soft-deleted email replaces the old row."""
+        client.post('/students/bulk-delete', json={'course': 'Law'})
+        data = dict(sample_student_data, email='jan@example.com')
+        assert client.post('/register', data=data).status_code == 302
+        with test_app.app_context():
+            students = Student.query.filter_by(email='jan@example.com').all()
+            assert [s.first_name for s in students] == [data['first_name']]
+            assert student_stats()['course'] == {'Computer Science': 1, 'Medicine': 1}
+
+    def test_email_reusable_after_batch_conflict(self, test_app, cohort, soft_delete):
+        """Test a soft-deleted email is released again when a batch is retried row by row."""
+        with test_app.app_context():
+            existing_emails([])
+            bulk_delete_students(course='Law')
+            # Registered by another worker, so only the unique constraint knows.
+            add_student('late@example.com')
+            row = {'first_name': 'Jo', 'last_name': 'Ray', 'phone': '1',
+                   'date_of_birth': '2000-01-01', 'gender': 'Male', 'address': 'x',
+                   'city': 'y', 'course': 'Law'}
+            report = import_students([(1, dict(row, email='jan@example.com')),
+                                      (2, dict(row, email='late@example.com'))])
+            assert report['inserted'] == 1
+            assert report['errors'] == [
+                {'row': 2, 'error': 'a student with this email already exists'}]
+            assert Student.query.filter_by(email='jan@example.com').one().first_name == 'Jo'
+
+    def test_email_reusable_from_another_worker(self, tmp_path, make_app, sample_student_data):
+        """Test a worker whose filter never saw a soft-deleted email still releases it."""
+        config = {'SOFT_DELETE': True, 'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'db'}"}
+        first, second = make_app(**config), make_app(**config)
+        first.extensions['student_purger'].start = lambda: None
+        with first.app_context():
+            db.create_all()
+        first_client, second_client = first.test_client(), second.test_client()
+        # Both filters are loaded before the student exists.
+        first_client.get('/')
+        second_client.get('/')
+        location = first_client.post('/register', data=sample_student_data).headers['Location']
+        first_client.post(f"/students/{location.rsplit('/', 1)[1]}/delete")
+        response = second_client.post('/register', data=sample_student_data)
+        assert '/success/' in response.headers['Location']
+        with first.app_context():
+            assert remaining_emails() == [sample_student_data['email']]
+            db.drop_all()
+            db.engine.dispose()
+        with second.app_context():
+            db.engine.dispose()
+
+    def test_purge(self, test_app, cohort, soft_delete):
+        """Test purging removes only soft-deleted rows, in batches."""
+        with test_app.app_context():
+            bulk_delete_students(course='Law')
+            commits = count_commits()
+            assert purge_deleted_students(batch_size=2) == 3
+            assert len(commits) == 2
+            assert Student.query.count() == 1
+            assert student_stats()['course'] == {'Medicine': 1}
+
+    def test_purge_command(self, test_app, cohort, soft_delete):
+        """Test the CLI purges immediately."""
+        with test_app.app_context():
+            bulk_delete_students(course='Medicine')
+        result = test_app.test_cli_runner().invoke(args=['purge-students'])
+        assert 'Purged 1 students.' in result.output
+
+    def test_migration_adds_column(self, test_app):
+        """Test upgrading a database from before soft deletes adds the column."""
+        with test_app.app_context():
+            for name in STAT_TRIGGERS:
+                db.session.execute(db.text(f'DROP TRIGGER student_stat_{name}'))
+            db.session.execute(db.text('DROP INDEX ix_student_deleted'))
+            db.session.execute(db.text('ALTER TABLE student DROP COLUMN deleted_at'))
+            db.session.commit()
+            db.session.execute(db.text(
+                "INSERT INTO student (first_name, last_name, email, phone, date_of_birth, gender, "
+                "address, city, course) VALUES ('R', 'R', 'r@example.com', '1', '2000-01-01', "
+                "'Male', 'a', 'b', 'Law')"
+            ))
+            db.session.commit()
+            upgrade_database()
+            assert Student.query.one().deleted_at is None
+            assert student_count() == 1
+            test_app.config['SOFT_DELETE'] = True
+            test_app.extensions['student_purger'].start = lambda: None
+            assert bulk_delete_students(course='Law') == 1
+            assert student_count() == 0
+
+
+class TestStudentPurger:
+    """Test the background purge thread."""
+
+    def test_started_by_first_soft_delete(self, test_app, cohort, monkeypatch):
+        """Test the thread starts once and purges on its interval."""
+        import app as app_module
+        purged = threading.Event()
+
+        def purge():
+            if purge_deleted_students():
+                purged.set()
+
+        monkeypatch.setattr(app_module, 'purge_deleted_students', purge)
+        monkeypatch.setitem(test_app.config, 'SOFT_DELETE', True)
+        purger = StudentPurger(test_app, 0.2)
+        test_app.extensions['student_purger'] = purger
+        with test_app.app_context():
+            bulk_delete_students(course='Law')
+            thread = purger._thread
+            bulk_delete_students(course='Medicine')
+            assert purger._thread is thread
+        assert purged.wait(5)
+        purger.stop()
+        assert not thread.is_alive()
+        with test_app.app_context():
+            assert Student.query.count() == 0
+
+    def test_failure_keeps_thread_running(self, test_app, monkeypatch):
+        """Test a failed purge is logged and retried on the next interval."""
+        import app as app_module
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError('database is locked')
+            purger._stop.set()
+
+        monkeypatch.setattr(app_module, 'purge_deleted_students', flaky)
+        purger = StudentPurger(test_app, 0.01)
+        purger.start()
+        purger._thread.join(5)
+        assert len(calls) == 2
+
+    def test_stop_without_start(self, test_app):
+        """Test stopping a purger that never ran is a no-op."""
+        StudentPurger(test_app, 1).stop()
@@ -0,0 +1,196 @@
+"""
+Unit tests for the page cache backends and their use by the views.
+"""
+import os
+import pytest
+from app import db, Student
+from cache import MemoryCache, FileCache, NullCache, make_cache
+
+
+@pytest.fixture(params=['memory', 'file'])
+def backend(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryCache(max_entries=3, default_ttl=60)
+    return FileCache(str(tmp_path / 'cache'), max_entries=3, default_ttl=60)
+
+
+class TestCacheBackends:
+    """Behaviour shared by the memory and file backends."""
+
+    def test_set_and_get(self, backend):
+        """Test stored values are returned."""
+        backend.set('a', 'page')
+        assert backend.get('a') == 'page'
+        assert backend.get('missing', 'default') == 'default'
+
+    def test_ttl_expiry(self, backend):
+        """Test entries disappear after their TTL."""
+        backend.set('a', 'page', ttl=-1)
+        assert backend.get('a') is None
+
+    def test_delete_and_clear(self, backend):
+        """Test explicit invalidation."""
+        backend.set('a', 1)
+        backend.set('b', 2)
+        backend.delete('a', 'not-there')
+        assert backend.get('a') is None
+        assert backend.get('b') == 2
+        backend.clear()
+        assert backend.get('b') is None
+        assert len(backend) == 0
+
+
+class TestMemoryCache:
+    """Test the in-process backend."""
+
+    def test_lru_eviction(self):
+        """Test the least recently used entry is evicted first."""
+        cache = MemoryCache(max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        assert cache.get('b') is None
+        assert cache.get('a') == 1
+        assert cache.get('c') == 3
+
+
+class TestFileCache:
+    """Test the shared directory backend."""
+
+    def test_shared_between_instances(self, tmp_path):
+        """Test two caches on one directory see each other's writes and deletes."""
+        first = FileCache(str(tmp_path))
+        second = FileCache(str(tmp_path))
+        first.set('page', '<html>')
+        assert second.get('page') == '<html>'
+        second.delete('page')
+        assert first.get('page') is None
+
+    def test_prunes_oldest_entries(self, tmp_path):
+        """Test the directory is pruned to below max_entries, oldest first."""
+        cache = FileCache(str(tmp_path), max_entries=10)
+        for i in range(10):
+            cache.set(f'k{i}', i)
+            os.utime(cache._path(f'k{i}'), ns=(i * 10 ** 9, i * 10 ** 9))
+        cache.set('k10', 10)
+        assert len(cache) == 9
+        assert cache.get('k0') is None
+        assert cache.get('k10') == 10
+
+    def test_corrupt_entry_is_a_miss(self, tmp_path):
+        """Test unreadable files are treated as misses."""
+        cache = FileCache(str(tmp_path))
+        with open(cache._path('a'), 'w') as f:
+            f.write('{not json')
+        assert cache.get('a') is None
+
+
+class TestMakeCache:
+    """Test building caches from configuration."""
+
+    def test_backends(self, tmp_path):
+        """Test each configured backend name."""
+        assert isinstance(make_cache('memory'), MemoryCache)
+        assert isinstance(make_cache('file', directory=str(tmp_path)), FileCache)
+        assert isinstance(make_cache('none'), NullCache)
+
+    def test_unknown_backend(self):
+        """Test an unknown backend name is rejected."""
+        with pytest.raises(ValueError):
+            make_cache('redis')
+
+    def test_null_cache_stores_nothing(self):
+        """Test the disabled backend always misses."""
+        cache = NullCache()
+        cache.set('a', 1)
+        cache.delete('a')
+        cache.clear()
+        assert cache.get('a', 'default') == 'default'
+
+
+class TestPageCaching:
+    """Test caching and invalidation in the views."""
+
+    def test_listing_served_from_cache(self, client, test_app, sample_student_data):
+        """Test a repeated listing request does not see unannounced writes."""
+        client.post('/register', data=sample_student_data)
+        client.get('/students').data
+        with test_app.app_context():
+            Student.query.delete()
+            db.session.commit()
+        assert b'John' in client.get('/students').data
+
+    def test_register_invalidates_listing(self, client, sample_student_data, another_student_data):
+        """Test a registration shows up on the next listing request."""
+        client.post('/register', data=sample_student_data)
+        assert b'1 student enrolled' in client.get('/students').data
+        client.post('/register', data=another_student_data)
+        assert b'2 students enrolled' in client.get('/students').data
+
+    def test_delete_invalidates_listing_and_success(self, client, test_app, sample_student_data):
+        """Test deleting a student drops its success page and the listing."""
+        client.post('/register', data=sample_student_data)
+        with test_app.app_context():
+            student_id = Student.query.one().id
+        assert client.get(f'/success/{student_id}').status_code == 200
+        client.get('/students')
+        client.post(f'/students/{student_id}/delete')
+        assert client.get(f'/success/{student_id}').status_code == 404
+        assert b'No Students Yet' in client.get('/students').data
+
+    def test_success_page_cached_per_student(self, client, test_app, sample_student_data,
+                                             another_student_data):
+        """Test deleting one student keeps other success pages cached."""
+        client.post('/register', data=sample_student_data)
+        client.post('/register', data=another_student_data)
+        with test_app.app_context():
+            john, jane = Student.query.order_by(Student.id).all()
+            john_id, jane_id = john.id, jane.id
+        client.get(f'/success/{john_id}')
+        client.get(f'/success/{jane_id}')
+        client.delete(f'/api/students/{jane_id}')
+        with test_app.app_context():
+            Student.query.filter_by(id=john_id).update({'first_name': 'Changed'})
+            db.session.commit()
+        assert b'John' in client.get(f'/success/{john_id}').data
+        assert client.get(f'/success/{jane_id}').status_code == 404
+
+    def test_reused_id_across_workers(self, tmp_path, make_app, sample_student_data,
+                                      another_student_data):
+        """Test a worker never serves a deleted student's page for a new one with the same id."""
+        config = {'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'db'}"}
+        first, second = make_app(**config), make_app(**config)
+        with first.app_context():
+            db.create_all()
+        first_client, second_client = first.test_client(), second.test_client()
+        location = first_client.post('/register', data=sample_student_data).headers['Location']
+        assert b'John' in first_client.get(location).data
+        student_id = int(location.rsplit('/', 1)[1])
+        second_client.post(f'/students/{student_id}/delete')
+        replaced = second_client.post('/register', data=another_student_data)
+        assert replaced.headers['Location'] == location
+        page = first_client.get(location).data
+        assert b'Jane' in page and b'John' not in page
+        with first.app_context():
+            db.drop_all()
+            db.engine.dispose()
+        with second.app_context():
+            db.engine.dispose()
+
+    def test_api_and_import_writes_invalidate(self, client, sample_student_data):
+        """Test API creates and bulk imports refresh the listing."""
+        client.get('/students')
+        client.post('/api/students', json=sample_student_data)
+        assert b'1 student enrolled' in client.get('/students').data
+        row = ('{"first_name": "A", "last_name": "B", "email": "ab@example.com", "phone": "1", '
+               '"date_of_birth": "2000-01-01", "gender": "Male", "address": "x", "city": "y", '
+               '"course": "Law"}\n')
+        client.post('/students/import', data=row, content_type='application/x-ndjson')
+        assert b'2 students enrolled' in client.get('/students').data
+
+    def test_file_backend_configuration(self, tmp_path, make_app):
+        """Test the app builds a shared file cache from config."""
+        test_app = make_app(PAGE_CACHE_BACKEND='file', PAGE_CACHE_DIR=str(tmp_path / 'pages'))
+        assert isinstance(test_app.extensions['page_cache'], FileCache)
+        assert os.path.isdir(tmp_path / 'pages')
@@ -0,0 +1,253 @@
+"""
+Unit tests for the response compression middleware.
+"""
+import gzip
+import re
+import zlib
+import pytest
+from werkzeug.test import Client
+import compress
+from cache import MemoryCache, NullCache
+from compress import CompressionMiddleware, negotiate
+from tests.test_pagination import make_students
+
+TEXT = b'<p>The same paragraph, over and over.</p>\n' * 40
+
+
+def text_app(body=TEXT, headers=(), status='200 OK', streamed=False, calls=None):
+    """A WSGI app sending `body`, as one chunk or, when `streamed`, line by line."""
+    def app(environ, start_response):
+        if calls is not None:
+            calls.append(environ['PATH_INFO'])
+        response_headers = [('Content-Type', 'text/html; charset=utf-8'), *headers]
+        if not streamed:
+            response_headers.append(('Content-Length', str(len(body))))
+        start_response(status, response_headers)
+        return body.splitlines(keepends=True) if streamed else [body]
+    return app
+
+
+def get(app, encoding='gzip', **kwargs):
+    return Client(app).get('/page', headers={'Accept-Encoding': encoding}, **kwargs)
+
+
+class TestNegotiate:
+    """Test choosing an encoding from Accept-Encoding."""
+
+    def test_preference_and_quality(self, all_encodings):
+        """Test client quality wins and ties go to the server's order."""
+        assert negotiate('gzip, br, zstd') == 'zstd'
+        assert negotiate('gzip, br') == 'br'
+        assert negotiate('br;q=0.5, gzip') == 'gzip'
+        assert negotiate('*') == 'zstd'
+        assert negotiate('zstd;q=0, *') == 'br'
+
+    def test_nothing_acceptable(self, all_encodings):
+        """Test identity is used when nothing offered is accepted."""
+        assert negotiate('') is None
+        assert negotiate('identity') is None
+        assert negotiate('gzip;q=0') is None
+
+    def test_missing_modules(self, gzip_only):
+        """Test encodings without their module are never chosen."""
+        assert negotiate('zstd, br, gzip') == 'gzip'
+        assert negotiate('zstd, br') is None
+
+
+class TestCompressionMiddleware:
+    """Test what the middleware compresses and how."""
+
+    def test_buffered_body(self, gzip_only):
+        """Test a body of known length is compressed whole."""
+        response = get(CompressionMiddleware(text_app()))
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert response.headers['Vary'] == 'Accept-Encoding'
+        assert int(response.headers['Content-Length']) == len(response.data)
+        assert gzip.decompress(response.data) == TEXT
+
+    @pytest.mark.parametrize('encoding', ['br', 'zstd'])
+    def test_optional_encodings(self, all_encodings, encoding):
+        """Test brotli and zstd bodies, whole and streamed."""
+        for streamed in (False, True):
+            response = get(CompressionMiddleware(text_app(streamed=streamed)), encoding)
+            assert response.headers['Content-Encoding'] == encoding
+            assert zlib.decompress(response.data) == TEXT
+
+    def test_streamed_body_is_flushed_per_chunk(self, gzip_only):
+        """Test each chunk can be decoded as soon as it arrives."""
+        response = get(CompressionMiddleware(text_app(streamed=True)), buffered=False)
+        assert 'Content-Length' not in response.headers
+        decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        chunks = iter(response.response)
+        first_line = TEXT.splitlines(keepends=True)[0]
+        # The first min_size bytes are read before deciding, then sent at once.
+        assert decoder.decompress(next(chunks)).startswith(first_line * 12)
+        assert decoder.decompress(next(chunks)) == first_line
+        rest = b''.join(decoder.decompress(chunk) for chunk in chunks)
+        assert decoder.eof
+        assert rest.endswith(first_line)
+        response.close()
+
+    def test_not_accepted(self, gzip_only):
+        """Test clients not asking for compression get the body as-is."""
+        response = get(CompressionMiddleware(text_app()), encoding='')
+        assert 'Content-Encoding' not in response.headers
+        assert response.headers['Vary'] == 'Accept-Encoding'
+        assert response.data == TEXT
+
+    def test_small_bodies(self, gzip_only):
+        """Test bodies under min_size are sent as-is, known length or not."""
+        for streamed in (False, True):
+            response = get(CompressionMiddleware(text_app(b'short\nbody', streamed=streamed)))
+            assert 'Content-Encoding' not in response.headers
+            assert response.data == b'short\nbody'
+
+    @pytest.mark.parametrize('headers, status', [
+        ([('Content-Type', 'text/html'), ('Content-Encoding', 'br')], '200 OK'),
+        ([('Content-Type', 'text/html'), ('Cache-Control', 'no-transform')], '200 OK'),
+        ([('Content-Type', 'text/html'), ('Content-Range', 'bytes 0-9/99')],
+         '206 Partial Content'),
+        ([('Content-Type', 'text/html')], '304 Not Modified'),
+        ([('Content-Type', 'image/png')], '200 OK'),
+    ])
+    def test_left_alone(self, gzip_only, headers, status):
+        """Test encoded, partial, no-transform and binary responses pass through."""
+        def app(environ, start_response):
+            start_response(status, headers)
+            return [TEXT]
+        response = get(CompressionMiddleware(app))
+        assert response.headers.get('Content-Encoding') in (None, 'br')
+        assert 'Vary' not in response.headers
+        assert response.data == TEXT
+
+    def test_head_requests(self, gzip_only):
+        """Test HEAD requests keep the identity headers."""
+        response = Client(CompressionMiddleware(text_app())).head(
+            '/page', headers={'Accept-Encoding': 'gzip'})
+        assert 'Content-Encoding' not in response.headers
+        assert response.headers['Content-Length'] == str(len(TEXT))
+
+    def test_lazy_start_response_and_write(self, gzip_only):
+        """Test apps that start on their first chunk or use write()."""
+        def app(environ, start_response):
+            write = start_response('200 OK', [('Content-Type', 'text/plain')])
+            write(TEXT[:100])
+            yield TEXT[100:]
+
+        def lazy(environ, start_response):
+            yield from app(environ, start_response)
+
+        response = get(CompressionMiddleware(lazy))
+        assert gzip.decompress(response.data) == TEXT
+
+    def test_closes_app_iterable(self, gzip_only):
+        """Test the app's iterable is closed, even when it was never read."""
+        closed = []
+
+        class Body(list):
+            def close(self):
+                closed.append(True)
+
+        def app(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/plain'), ('ETag', '"a"'),
+                                      ('Content-Length', str(len(TEXT)))])
+            return Body([TEXT])
+
+        middleware = CompressionMiddleware(app, cache=MemoryCache())
+        get(middleware)
+        get(middleware)
+        assert closed == [True, True]
+
+
+class TestCompressedCache:
+    """Test compressed variants of reusable responses are kept."""
+
+    @pytest.mark.parametrize('streamed', [False, True])
+    def test_reused(self, gzip_only, streamed, monkeypatch):
+        """Test identical output is compressed once per URL, ETag and encoding."""
+        compressions = []
+        monkeypatch.setattr(compress, 'StreamCompressor', counting(compress.StreamCompressor,
+                                                                   compressions))
+        monkeypatch.setattr(compress, 'compress', counting(compress.compress, compressions))
+        calls = []
+        middleware = CompressionMiddleware(
+            text_app(headers=[('ETag', '"v1"')], streamed=streamed, calls=calls),
+            cache=MemoryCache(),
+        )
+        # Bodies are read lazily; the variant is kept once one has been read.
+        first = get(middleware).data
+        second = get(middleware)
+        assert len(compressions) == 1
+        assert len(calls) == 2
+        assert gzip.decompress(second.data) == gzip.decompress(first) == TEXT
+        assert int(second.headers['Content-Length']) == len(second.data)
+        assert len(middleware.cache) == 1
+
+    @pytest.mark.parametrize('headers', [
+        [],
+        [('ETag', '"v1"'), ('Cache-Control', 'private')],
+        [('ETag', '"v1"'), ('Cache-Control', 'no-store')],
+        [('ETag', '"v1"'), ('Vary', 'Cookie')],
+    ])
+    def test_not_reusable(self, gzip_only, headers):
+        """Test responses that may differ between clients are not kept."""
+        middleware = CompressionMiddleware(text_app(headers=headers), cache=MemoryCache())
+        assert gzip.decompress(get(middleware).data) == TEXT
+        assert len(middleware.cache) == 0
+
+    def test_error_pages_not_kept(self, gzip_only):
+        """Test only 200 responses are kept."""
+        middleware = CompressionMiddleware(
+            text_app(headers=[('ETag', '"v1"')], status='404 NOT FOUND'), cache=MemoryCache())
+        assert get(middleware).status_code == 404
+        assert len(middleware.cache) == 0
+
+
+def without_key(page):
+    return re.sub(rb'name="idempotency_key" value="\w+"', b'', page)
+
+
+def counting(function, calls):
+    def wrapper(*args, **kwargs):
+        calls.append(args)
+        return function(*args, **kwargs)
+    return wrapper
+
+
+class TestAppCompression:
+    """Test the middleware as installed in the app."""
+
+    def test_html_pages(self, test_app, client, gzip_only):
+        """Test pages are compressed when the client accepts it."""
+        with test_app.app_context():
+            make_students(30)
+        for url in ('/', '/students'):
+            plain = client.get(url)
+            test_app.extensions['page_cache'].clear()
+            response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+            assert response.headers['Content-Encoding'] == 'gzip'
+            # The form's idempotency key differs on every rendering.
+            assert without_key(gzip.decompress(response.data)) == without_key(plain.data)
+            assert len(response.data) < len(plain.data) / 4
+
+    def test_api_compressed_once(self, test_app, client, gzip_only, monkeypatch):
+        """Test identical API responses are compressed once, keyed by their weak ETag."""
+        monkeypatch.setattr(test_app.extensions['compression'], 'min_size', 10)
+        with test_app.app_context():
+            make_students(5)
+        first = client.get('/api/students', headers={'Accept-Encoding': 'gzip'})
+        assert first.headers['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(first.data).startswith(b'{')
+        cache = test_app.extensions['compression'].cache
+        assert len(cache) == 1
+        assert client.get('/api/students', headers={'Accept-Encoding': 'gzip'}).data == first.data
+        assert len(cache) == 1
+
+    def test_configuration(self, make_app):
+        """Test levels and cache come from the config, and it can be turned off."""
+        middleware = make_app(COMPRESSION_GZIP_LEVEL=9).extensions['compression']
+        assert middleware.levels['gzip'] == 9
+        assert isinstance(middleware.cache, MemoryCache)
+        uncached = make_app(COMPRESSION_CACHE_ENTRIES=0)
+        assert isinstance(uncached.extensions['compression'].cache, NullCache)
+        assert 'compression' not in make_app(COMPRESSION=False).extensions
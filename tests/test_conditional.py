@@ -0,0 +1,143 @@
+"""
+Unit tests for conditional GET on the student pages.
+"""
+import pytest
+from datetime import datetime, timedelta, timezone
+from app import (db, Student, StudentChanges, student_changes, record_student_change,
+                 upgrade_database)
+
+
+@pytest.fixture
+def registered(client, test_app, sample_student_data):
+    client.post('/register', data=sample_student_data)
+    with test_app.app_context():
+        return Student.query.one().id
+
+
+class TestChangeCounter:
+    """Test the student change counter."""
+
+    def test_starts_at_zero(self, test_app):
+        """Test a fresh database reports version 0."""
+        with test_app.app_context():
+            assert student_changes()[0] == 0
+
+    def test_row_seeded_with_table(self, test_app):
+        """Test the counter row exists from the start, so writes only update it."""
+        with test_app.app_context():
+            assert StudentChanges.query.one().version == 0
+            record_student_change()
+            db.session.commit()
+            record_student_change()
+            db.session.commit()
+            assert StudentChanges.query.one().version == 2
+
+    def test_upgrade_seeds_missing_row(self, test_app):
+        """Test databases created before the row was seeded get it on upgrade."""
+        with test_app.app_context():
+            StudentChanges.query.delete()
+            db.session.commit()
+            upgrade_database()
+            upgrade_database()
+            assert StudentChanges.query.one().version == 0
+
+    def test_writes_bump_counter(self, client, test_app, sample_student_data, another_student_data):
+        """Test every write path bumps the counter."""
+        client.post('/register', data=sample_student_data)
+        client.post('/api/students', json=another_student_data)
+        with test_app.app_context():
+            assert student_changes()[0] == 2
+            student_id = Student.query.filter_by(email='john.doe@example.com').one().id
+        client.post(f'/students/{student_id}/delete')
+        with test_app.app_context():
+            assert student_changes()[0] == 3
+
+    def test_failed_writes_do_not_bump(self, client, test_app, registered, sample_student_data):
+        """Test rejected writes leave the counter alone."""
+        client.post('/api/students', json=sample_student_data)
+        client.delete('/api/students/999')
+        with test_app.app_context():
+            assert student_changes()[0] == 1
+
+
+class TestStudentsConditionalGet:
+    """Test validators on the listing page."""
+
+    def test_listing_sends_validators(self, client, registered):
+        """Test the listing carries ETag, Last-Modified and no-cache."""
+        response = client.get('/students')
+        assert response.headers['ETag'] == 'W/"students-1"'
+        assert 'Last-Modified' in response.headers
+        assert 'no-cache' in response.headers['Cache-Control']
+
+    def test_if_none_match_returns_304(self, client, registered):
+        """Test a matching ETag short-circuits the listing."""
+        etag = client.get('/students').headers['ETag']
+        response = client.get('/students', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.data == b''
+        assert response.headers['ETag'] == etag
+
+    def test_write_changes_etag(self, client, registered, another_student_data):
+        """Test a registration invalidates the old ETag."""
+        etag = client.get('/students').headers['ETag']
+        client.post('/register', data=another_student_data)
+        response = client.get('/students', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+
+    def test_if_modified_since(self, client, registered):
+        """Test If-Modified-Since compares against the last change."""
+        last_modified = client.get('/students').headers['Last-Modified']
+        assert client.get('/students', headers={'If-Modified-Since': last_modified}).status_code == 304
+        earlier = (datetime.now(timezone.utc) - timedelta(days=1)).strftime('%a, %d %b %Y %H:%M:%S GMT')
+        assert client.get('/students', headers={'If-Modified-Since': earlier}).status_code == 200
+
+    def test_if_none_match_takes_precedence(self, client, registered):
+        """Test a stale ETag wins over a fresh If-Modified-Since."""
+        last_modified = client.get('/students').headers['Last-Modified']
+        response = client.get('/students', headers={
+            'If-None-Match': 'W/"students-0"', 'If-Modified-Since': last_modified,
+        })
+        assert response.status_code == 200
+
+    def test_304_skips_rendering(self, client, registered, monkeypatch):
+        """Test a 304 is answered without building the page."""
+        import app as app_module
+        etag = client.get('/students').headers['ETag']
+
+        def fail(*args, **kwargs):
+            raise AssertionError('page should not be built')
+
+        monkeypatch.setattr(app_module, 'paginate_students', fail)
+        monkeypatch.setattr(app_module, 'page_cache', fail)
+        assert client.get('/students', headers={'If-None-Match': etag}).status_code == 304
+
+
+class TestSuccessConditionalGet:
+    """Test validators on the success page."""
+
+    def test_success_etag_round_trip(self, client, registered):
+        """Test the success page answers 304 to its own ETag."""
+        response = client.get(f'/success/{registered}')
+        etag = response.headers['ETag']
+        assert etag.startswith(f'W/"{registered}-')
+        assert client.get(f'/success/{registered}', headers={'If-None-Match': etag}).status_code == 304
+
+    def test_success_unaffected_by_other_writes(self, client, registered, another_student_data):
+        """Test registering someone else keeps this page's ETag valid."""
+        etag = client.get(f'/success/{registered}').headers['ETag']
+        client.post('/register', data=another_student_data)
+        assert client.get(f'/success/{registered}', headers={'If-None-Match': etag}).status_code == 304
+
+    def test_success_cached_body_keeps_validators(self, client, registered):
+        """Test a page served from the cache still carries validators."""
+        client.get(f'/success/{registered}')
+        response = client.get(f'/success/{registered}')
+        assert response.status_code == 200
+        assert 'ETag' in response.headers
+
+    def test_deleted_student_404(self, client, registered):
+        """Test validators are not issued for missing students."""
+        client.post(f'/students/{registered}/delete')
+        assert client.get(f'/success/{registered}').status_code == 404
@@ -0,0 +1,81 @@
+"""
+Unit tests for database engine configuration.
+"""
+import sqlite3
+import pytest
+from app import db, default_config, engine_options, env_flag, apply_sqlite_pragmas, sqlite_pragmas
+
+
+class TestEngineOptions:
+    """Test pool configuration."""
+
+    def test_memory_sqlite_has_no_pool_options(self):
+        """Test in-memory SQLite keeps Flask-SQLAlchemy's static pool."""
+        assert engine_options('sqlite:///:memory:') == {}
+        assert engine_options('sqlite://') == {}
+
+    def test_file_database_defaults(self):
+        """Test file databases get tuned pool defaults."""
+        options = engine_options('sqlite:///students.db')
+        assert options == {
+            'pool_size': 5,
+            'max_overflow': 10,
+            'pool_timeout': 30,
+            'pool_recycle': 1800,
+            'pool_pre_ping': True,
+        }
+
+    def test_environment_overrides(self, monkeypatch):
+        """Test pool settings are read from the environment."""
+        monkeypatch.setenv('DB_POOL_SIZE', '20')
+        monkeypatch.setenv('DB_MAX_OVERFLOW', '0')
+        monkeypatch.setenv('DB_POOL_PRE_PING', 'false')
+        options = engine_options('postgresql://user@db/students')
+        assert options['pool_size'] == 20
+        assert options['max_overflow'] == 0
+        assert options['pool_pre_ping'] is False
+
+    def test_env_flag(self, monkeypatch):
+        """Test boolean environment parsing."""
+        monkeypatch.setenv('SOME_FLAG', 'Yes')
+        assert env_flag('SOME_FLAG', False) is True
+        monkeypatch.setenv('SOME_FLAG', '0')
+        assert env_flag('SOME_FLAG', True) is False
+        assert env_flag('UNSET_FLAG_FOR_TEST', True) is True
+
+
+class TestSqlitePragmas:
+    """Test SQLite connection pragmas."""
+
+    def test_pragmas_applied_to_file_database(self, tmp_path):
+        """Test WAL, synchronous, busy_timeout and mmap_size are set."""
+        pragmas = sqlite_pragmas(default_config())
+        connection = sqlite3.connect(tmp_path / 'pragmas.db')
+        apply_sqlite_pragmas(connection, pragmas)
+        assert connection.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        assert connection.execute('PRAGMA synchronous').fetchone()[0] == 1
+        assert connection.execute('PRAGMA busy_timeout').fetchone()[0] == pragmas['busy_timeout']
+        assert connection.execute('PRAGMA mmap_size').fetchone()[0] == pragmas['mmap_size']
+        connection.close()
+
+    def test_non_sqlite_connection_ignored(self):
+        """Test other DBAPI connections are left untouched."""
+        class OtherConnection:
+            def cursor(self):
+                raise AssertionError('should not be called')
+
+        apply_sqlite_pragmas(OtherConnection(), sqlite_pragmas(default_config()))
+
+    def test_app_engine_connections_use_pragmas(self, test_app):
+        """Test the application engine applies the pragmas on connect."""
+        with test_app.app_context():
+            timeout = db.session.execute(db.text('PRAGMA busy_timeout')).scalar()
+            assert timeout == test_app.config['SQLITE_BUSY_TIMEOUT_MS']
+
+    def test_read_when_app_created(self, monkeypatch, make_app):
+        """Test pragma settings from the environment apply to apps created afterwards."""
+        monkeypatch.setenv('SQLITE_BUSY_TIMEOUT_MS', '1234')
+        app = make_app()
+        with app.app_context():
+            assert db.session.execute(db.text('PRAGMA busy_timeout')).scalar() == 1234
+            db.session.remove()
@@ -0,0 +1,195 @@
+"""
+Unit tests for the email Bloom filter and duplicate detection.
+"""
+import threading
+import pytest
+from sqlalchemy import event
+from app import db, Student, upgrade_database, existing_emails, normalize_student_emails
+from email_index import BloomFilter, EmailIndex, normalize_email
+from tests.conftest import add_student
+
+
+@pytest.fixture
+def email_queries(test_app):
+    """Record duplicate-check SELECTs against student.email."""
+    statements = []
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().startswith('SELECT student.email'):
+            statements.append(statement)
+
+    with test_app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_execute)
+    yield statements
+    event.remove(engine, 'before_cursor_execute', before_execute)
+
+
+class TestBloomFilter:
+    """Test the filter data structure."""
+
+    def test_no_false_negatives(self):
+        """Test every added item is reported present."""
+        bloom = BloomFilter(1000)
+        items = [f'user{i}@example.com' for i in range(1000)]
+        for item in items:
+            bloom.add(item)
+        assert all(item in bloom for item in items)
+
+    def test_false_positive_rate(self):
+        """Test the false positive rate stays near the configured rate."""
+        bloom = BloomFilter(1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(f'user{i}@example.com')
+        false_positives = sum(f'other{i}@example.com' in bloom for i in range(10000))
+        assert false_positives < 300
+
+
+class TestEmailIndex:
+    """Test the email membership wrapper."""
+
+    def test_normalize(self):
+        """Test case and surrounding whitespace are ignored."""
+        assert normalize_email('  A.Person@Example.COM ') == 'a.person@example.com'
+
+    def test_not_ready_answers_maybe(self):
+        """Test lookups fall back to the database before the first load."""
+        index = EmailIndex(capacity=10)
+        assert index.might_contain('anyone@example.com')
+        index.rebuild(['Known@Example.com'])
+        assert index.might_contain('known@example.com')
+        assert not index.might_contain('new@example.com')
+
+    def test_add_normalizes(self):
+        """Test added emails are found in any case."""
+        index = EmailIndex(capacity=10)
+        index.rebuild([])
+        index.add('A@X.com')
+        assert index.might_contain(' a@x.COM')
+
+    def test_needs_rebuild(self):
+        """Test growth past capacity or many deletions ask for a rebuild."""
+        index = EmailIndex(capacity=10)
+        index.rebuild([])
+        assert not index.needs_rebuild
+        index.add(*(f'u{i}@x.com' for i in range(11)))
+        assert index.needs_rebuild
+        index.rebuild([f'u{i}@x.com' for i in range(200)])
+        assert not index.needs_rebuild
+        index.discard(*(f'u{i}@x.com' for i in range(51)))
+        assert index.needs_rebuild
+
+    def test_one_thread_rebuilds(self):
+        """Test threads arriving during a rebuild go on without loading too."""
+        index = EmailIndex(capacity=10)
+        loading, release, loads = threading.Event(), threading.Event(), []
+
+        def load():
+            loads.append(True)
+            loading.set()
+            release.wait()
+            return ['a@x.com']
+
+        rebuilder = threading.Thread(target=index.refresh, args=(load,))
+        rebuilder.start()
+        loading.wait()
+        index.refresh(load)
+        assert not index.ready
+        release.set()
+        rebuilder.join()
+        index.refresh(load)
+        assert len(loads) == 1
+        assert not index.might_contain('b@x.com')
+
+
+class TestDuplicateDetection:
+    """Test the app's duplicate checks use the filter."""
+
+    def test_loaded_on_first_request(self, client, test_app):
+        """Test a worker loads the filter on its first request, before any registration."""
+        client.get('/')
+        assert test_app.extensions['email_index'].ready
+
+    def test_first_request_without_schema(self, make_app):
+        """Test requests still work before the tables exist."""
+        app = make_app()
+        assert app.test_client().get('/').status_code == 200
+        assert not app.extensions['email_index'].ready
+
+    def test_case_variants_are_duplicates(self, client, test_app, sample_student_data):
+        """Test an email differing only in case or whitespace is rejected."""
+        client.post('/register', data=dict(sample_student_data, email=' John.Doe@Example.com '))
+        response = client.post('/register', data=sample_student_data, follow_redirects=True)
+        assert b'A student with this email already exists!' in response.data
+        with test_app.app_context():
+            assert [s.email for s in Student.query] == ['john.doe@example.com']
+
+    def test_new_email_skips_select(self, client, sample_student_data, another_student_data,
+                                    email_queries):
+        """Test only the first check, which loads the filter, queries emails."""
+        client.post('/register', data=sample_student_data)
+        loads = len(email_queries)
+        client.post('/register', data=another_student_data)
+        assert len(email_queries) == loads
+
+    def test_deleted_email_can_register_again(self, client, test_app, sample_student_data):
+        """Test a stale positive after a delete is confirmed against the database."""
+        client.post('/register', data=sample_student_data)
+        with test_app.app_context():
+            student_id = Student.query.one().id
+        client.post(f'/students/{student_id}/delete')
+        response = client.post('/register', data=sample_student_data)
+        assert '/success/' in response.headers['Location']
+
+    def test_api_delete_marks_stale(self, client, test_app, sample_student_data):
+        """Test API deletes are counted against the filter."""
+        client.post('/api/students', json=sample_student_data)
+        with test_app.app_context():
+            student_id = Student.query.one().id
+        client.delete(f'/api/students/{student_id}')
+        assert client.post('/api/students', json=sample_student_data).status_code == 201
+
+    def test_registered_elsewhere_hits_constraint(self, client, test_app, sample_student_data):
+        """Test a duplicate the filter has not seen is caught by the unique constraint."""
+        with test_app.app_context():
+            existing_emails(['warm@example.com'])
+            add_student('john.doe@example.com')
+        response = client.post('/register', data=sample_student_data, follow_redirects=True)
+        assert b'A student with this email already exists!' in response.data
+
+    def test_import_uses_filter(self, client, test_app, email_queries):
+        """Test a bulk import of new emails needs no duplicate query once loaded."""
+        with test_app.app_context():
+            existing_emails([])
+        email_queries.clear()
+        row = ('{"first_name": "A", "last_name": "B", "email": "AB@example.com", "phone": "1", '
+               '"date_of_birth": "2000-01-01", "gender": "Male", "address": "x", "city": "y", '
+               '"course": "Law"}\n')
+        client.post('/students/import', data=row, content_type='application/x-ndjson')
+        assert email_queries == []
+        report = client.post('/students/import', data=row,
+                             content_type='application/x-ndjson').get_json()
+        assert report['errors'] == [{'row': 1, 'error': 'a student with this email already exists'}]
+
+
+class TestNormalizeMigration:
+    """Test normalizing emails stored before the filter existed."""
+
+    def test_existing_emails_are_normalized(self, test_app):
+        """Test stored emails are lower-cased unless that would collide."""
+        with test_app.app_context():
+            add_student('Mixed@Example.com')
+            add_student('Taken@Example.com')
+            add_student('taken@example.com')
+            with db.engine.begin() as connection:
+                normalize_student_emails(connection)
+            assert sorted(s.email for s in Student.query) == [
+                'Taken@Example.com', 'mixed@example.com', 'taken@example.com'
+            ]
+
+    def test_part_of_upgrade(self, test_app):
+        """Test the migration runs with the others."""
+        with test_app.app_context():
+            add_student('Upper@Example.com')
+            upgrade_database()
+            assert Student.query.one().email == 'upper@example.com'
@@ -0,0 +1,93 @@
+"""
+Unit tests for streaming student export.
+"""
+import csv
+import io
+import json
+import pytest
+from datetime import datetime
+from app import db, EXPORT_COLUMNS
+from tests.conftest import add_student
+
+
+def export_student(i, **fields):
+    return add_student(f'export{i}@example.com', first_name=f'First{i}', last_name=f'Last{i}',
+                       gender='Male', address='1 Export Way, Suite 5', city='Denver', **fields)
+
+
+@pytest.fixture
+def export_students(test_app):
+    with test_app.app_context():
+        export_student(1, course='Law', registration_date=datetime(2024, 1, 10, 9, 0))
+        export_student(2, course='Medicine', registration_date=datetime(2024, 2, 10, 9, 0))
+        export_student(3, course='Law', registration_date=datetime(2024, 3, 10, 23, 30))
+        db.session.commit()
+
+
+class TestExportCsv:
+    """Test CSV export."""
+
+    def test_csv_headers_and_order(self, client, export_students):
+        """Test the CSV has a header row and lists newest first."""
+        response = client.get('/students/export')
+        assert response.status_code == 200
+        assert response.mimetype == 'text/csv'
+        assert 'attachment; filename=students.csv' in response.headers['Content-Disposition']
+        rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+        assert tuple(rows[0]) == EXPORT_COLUMNS
+        assert [row[1] for row in rows[1:]] == ['First3', 'First2', 'First1']
+        assert rows[1][7] == '1 Export Way, Suite 5'
+        assert rows[1][-1] == '2024-03-10T23:30:00'
+
+    def test_csv_empty_table(self, client):
+        """Test exporting an empty table yields only the header."""
+        response = client.get('/students/export')
+        assert response.get_data(as_text=True).strip() == ','.join(EXPORT_COLUMNS)
+
+    def test_csv_streams_in_chunks(self, client, test_app, monkeypatch):
+        """Test large exports are produced incrementally."""
+        monkeypatch.setitem(test_app.config, 'EXPORT_CHUNK_SIZE', 7)
+        with test_app.app_context():
+            for i in range(250):
+                export_student(i)
+            db.session.commit()
+        response = client.get('/students/export')
+        assert response.is_streamed
+        assert len(response.get_data(as_text=True).splitlines()) == 251
+
+
+class TestExportNdjson:
+    """Test NDJSON export."""
+
+    def test_ndjson_records(self, client, export_students):
+        """Test NDJSON emits one object per student."""
+        response = client.get('/students/export?format=ndjson')
+        assert response.mimetype == 'application/x-ndjson'
+        records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert [r['first_name'] for r in records] == ['First3', 'First2', 'First1']
+        assert records[0]['date_of_birth'] == '2000-01-01'
+
+    def test_unknown_format(self, client):
+        """Test an unknown format is rejected."""
+        assert client.get('/students/export?format=xml').status_code == 400
+
+
+class TestExportFilters:
+    """Test export filters."""
+
+    def test_filter_by_course(self, client, export_students):
+        """Test filtering by course."""
+        response = client.get('/students/export?format=ndjson&course=Law')
+        records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert [r['first_name'] for r in records] == ['First3', 'First1']
+
+    def test_filter_by_date_range_inclusive(self, client, export_students):
+        """Test the date range includes whole days at both ends."""
+        response = client.get('/students/export?format=ndjson'
+                              '&registered_from=2024-02-10&registered_to=2024-03-10')
+        records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert [r['first_name'] for r in records] == ['First3', 'First2']
+
+    def test_invalid_date(self, client):
+        """Test an invalid date argument is rejected."""
+        assert client.get('/students/export?registered_from=yesterday').status_code == 400
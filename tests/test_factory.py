@@ -0,0 +1,79 @@
+"""
+Unit tests for the application factory.
+"""
+import os
+import subprocess
+import sys
+import pytest
+from sqlalchemy import inspect
+import app as app_module
+from app import create_app, db
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+class TestCreateApp:
+    """Test building applications with create_app."""
+
+    def test_each_call_returns_new_app(self):
+        """Test the factory builds independent applications."""
+        first = create_app({'TESTING': True})
+        second = create_app({'TESTING': True})
+        assert first is not second
+
+    def test_config_overrides_defaults(self):
+        """Test explicit config wins over the defaults."""
+        test_app = create_app({'STUDENTS_PER_PAGE': 7, 'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+        assert test_app.config['STUDENTS_PER_PAGE'] == 7
+        assert test_app.config['SQLALCHEMY_ENGINE_OPTIONS'] == {}
+
+    def test_defaults_read_from_environment(self, monkeypatch):
+        """Test environment variables are read when the app is created."""
+        monkeypatch.setenv('STUDENTS_PER_PAGE', '12')
+        monkeypatch.setenv('DATABASE_URL', 'sqlite:///:memory:')
+        test_app = create_app()
+        assert test_app.config['STUDENTS_PER_PAGE'] == 12
+        assert test_app.config['SQLALCHEMY_DATABASE_URI'] == 'sqlite:///:memory:'
+
+    def test_routes_and_commands_registered(self):
+        """Test every declared view and command is attached."""
+        test_app = create_app({'TESTING': True})
+        endpoints = {rule.endpoint for rule in test_app.url_map.iter_rules()}
+        assert {'index', 'register', 'success', 'students', 'delete_student'} <= endpoints
+        assert {'db-upgrade', 'import-students'} <= set(test_app.cli.commands)
+
+    def test_create_app_does_not_create_schema(self, tmp_path):
+        """Test building an app leaves the database untouched."""
+        path = tmp_path / 'untouched.db'
+        test_app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'})
+        with test_app.app_context():
+            assert inspect(db.engine).get_table_names() == []
+            db.engine.dispose()
+
+    def test_db_upgrade_creates_schema(self, tmp_path):
+        """Test schema creation is an explicit CLI step."""
+        path = tmp_path / 'fresh.db'
+        test_app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'})
+        result = test_app.test_cli_runner().invoke(args=['db-upgrade'])
+        assert result.exit_code == 0
+        with test_app.app_context():
+            assert 'student' in inspect(db.engine).get_table_names()
+            db.engine.dispose()
+
+
+class TestDefaultApp:
+    """Test the lazily built module-level application."""
+
+    def test_default_app_is_cached(self):
+        """Test `app.app` is built once and reused."""
+        assert app_module.app is app_module.app
+
+    def test_import_does_not_build_app(self):
+        """Test importing the module does not create an application."""
+        code = "import app, sys; sys.exit('app' in vars(app))"
+        result = subprocess.run([sys.executable, '-c', code], cwd=ROOT)
+        assert result.returncode == 0
+
+    def test_unknown_attribute(self):
+        """Test other missing attributes still raise AttributeError."""
+        with pytest.raises(AttributeError):
+            app_module.does_not_exist
@@ -0,0 +1,125 @@
+"""
+Unit tests for idempotent registration resubmissions.
+"""
+import re
+from sqlalchemy import event, func, select
+from app import db, Student
+from cache import FileCache, MemoryCache
+from tests.test_registration_queue import ticket_of
+
+
+def with_key(data, key='retry-1'):
+    return dict(data, idempotency_key=key)
+
+
+def student_total():
+    return db.session.scalar(select(func.count()).select_from(Student))
+
+
+class RaceCache(MemoryCache):
+    """Misses the first lookup after a set, as when a retry arrives mid-registration."""
+
+    missed = True
+
+    def set(self, key, value, ttl=None):
+        super().set(key, value, ttl)
+        self.missed = False
+
+    def get(self, key, default=None):
+        if not self.missed:
+            self.missed = True
+            return default
+        return super().get(key, default)
+
+
+class TestIdempotentRegistration:
+    """Test resubmitted registrations get the original response."""
+
+    def test_form_carries_a_fresh_key(self, client):
+        """Test every rendering of the form has its own key."""
+        pattern = re.compile(rb'name="idempotency_key" value="([0-9a-f]{32})"')
+        first = pattern.search(client.get('/').data).group(1)
+        second = pattern.search(client.get('/').data).group(1)
+        assert first != second
+
+    def test_resubmission_replayed(self, client, test_app, sample_student_data):
+        """Test a retry is redirected to the original success page without queries."""
+        first = client.post('/register', data=with_key(sample_student_data))
+        statements = []
+        listener = lambda *args: statements.append(args[2])  # noqa: E731
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            retry = client.post('/register', data=with_key(sample_student_data))
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        assert statements == []
+        assert retry.status_code == 302
+        assert retry.headers['Location'] == first.headers['Location']
+        with client.session_transaction() as session:
+            assert session['_flashes'][-1] == ('success', 'Registration successful!')
+        assert student_total() == 1
+
+    def test_replays_not_rate_limited(self, test_app, client, sample_student_data):
+        """Test replays use neither the email limit nor a concurrency slot."""
+        cap = test_app.extensions['register_concurrency']
+        responses = [client.post('/register', data=with_key(sample_student_data))
+                     for _ in range(7)]
+        assert [response.status_code for response in responses] == [302] * 7
+        assert len({response.headers['Location'] for response in responses}) == 1
+        assert all(cap.acquire() for _ in range(cap.limit))
+
+    def test_header_key(self, client, sample_student_data):
+        """Test the key may be sent as an Idempotency-Key header."""
+        headers = {'Idempotency-Key': 'header-key'}
+        first = client.post('/register', data=sample_student_data, headers=headers)
+        retry = client.post('/register', data=sample_student_data, headers=headers)
+        assert retry.headers['Location'] == first.headers['Location']
+
+    def test_without_or_with_other_keys(self, client, sample_student_data):
+        """Test submissions without the key, or with another one, are checked as usual."""
+        client.post('/register', data=with_key(sample_student_data))
+        for data in (sample_student_data, with_key(sample_student_data, 'retry-2'),
+                     with_key(sample_student_data, 'not a key!')):
+            response = client.post('/register', data=data, follow_redirects=True)
+            assert b'A student with this email already exists!' in response.data
+
+    def test_key_bound_to_email(self, client, test_app, sample_student_data,
+                                another_student_data):
+        """Test a reused key with another email registers that student."""
+        first = client.post('/register', data=with_key(sample_student_data))
+        other = client.post('/register', data=with_key(another_student_data))
+        assert other.headers['Location'] != first.headers['Location']
+        assert student_total() == 2
+
+    def test_failures_not_remembered(self, client, sample_student_data):
+        """Test a failed submission can be corrected and sent again with its key."""
+        invalid = with_key(dict(sample_student_data, date_of_birth='01/15/2000'))
+        client.post('/register', data=invalid)
+        response = client.post('/register', data=with_key(sample_student_data))
+        assert '/success/' in response.headers['Location']
+
+    def test_retry_racing_the_original(self, client, test_app, sample_student_data):
+        """Test a retry that finds its email taken by the original gets its response."""
+        test_app.extensions['idempotency_cache'] = RaceCache()
+        first = client.post('/register', data=with_key(sample_student_data))
+        retry = client.post('/register', data=with_key(sample_student_data))
+        assert retry.headers['Location'] == first.headers['Location']
+
+    def test_queued_resubmission(self, queue_app, sample_student_data):
+        """Test a queued retry follows the first ticket instead of queueing again."""
+        client = queue_app.test_client()
+        first = client.post('/register', data=with_key(sample_student_data))
+        retry = client.post('/register', data=with_key(sample_student_data))
+        assert ticket_of(retry) == ticket_of(first)
+        queue_app.extensions['registration_queue'].close()
+        assert '/success/' in client.get(retry.headers['Location']).headers['Location']
+        with queue_app.app_context():
+            assert student_total() == 1
+
+    def test_configuration(self, tmp_path, make_app):
+        """Test keys can be shared between workers through files."""
+        app = make_app(IDEMPOTENCY_CACHE_BACKEND='file', IDEMPOTENCY_CACHE_DIR=str(tmp_path / 'keys'),
+                       IDEMPOTENCY_MAX_ENTRIES=50, IDEMPOTENCY_TTL=60)
+        cache = app.extensions['idempotency_cache']
+        assert isinstance(cache, FileCache)
+        assert (cache.max_entries, cache.default_ttl) == (50, 60)
@@ -0,0 +1,181 @@
+"""
+Unit tests for bulk student import.
+"""
+import io
+import json
+import pytest
+from datetime import date
+from app import db, Student, import_students, iter_import_rows, parse_student_row
+
+CSV_HEADER = 'first_name,last_name,email,phone,date_of_birth,gender,address,city,course\n'
+
+
+def csv_row(i, **overrides):
+    values = {
+        'first_name': f'First{i}', 'last_name': f'Last{i}', 'email': f'bulk{i}@example.com',
+        'phone': '1234567890', 'date_of_birth': '2000-01-01', 'gender': 'Female',
+        'address': '"1 Bulk Road, Unit 2"', 'city': 'Boston', 'course': 'Law',
+    }
+    values.update(overrides)
+    return ','.join(values.values()) + '\n'
+
+
+def json_row(i, **overrides):
+    values = {
+        'first_name': f'First{i}', 'last_name': f'Last{i}', 'email': f'bulk{i}@example.com',
+        'phone': '1234567890', 'date_of_birth': '2000-01-01', 'gender': 'Female',
+        'address': '1 Bulk Road', 'city': 'Boston', 'course': 'Law',
+    }
+    values.update(overrides)
+    return json.dumps(values) + '\n'
+
+
+class TestParseStudentRow:
+    """Test validation of imported records."""
+
+    def test_valid_row(self, sample_student_data):
+        """Test a complete row is converted to column values."""
+        values = parse_student_row(sample_student_data)
+        assert values['date_of_birth'] == date(2000, 5, 15)
+        assert values['email'] == 'john.doe@example.com'
+
+    def test_missing_field(self, sample_student_data):
+        """Test a blank field is rejected."""
+        sample_student_data['city'] = '  '
+        with pytest.raises(ValueError, match='missing city'):
+            parse_student_row(sample_student_data)
+
+    def test_bad_date(self, sample_student_data):
+        """Test an unparseable date is rejected."""
+        sample_student_data['date_of_birth'] = '15/05/2000'
+        with pytest.raises(ValueError, match='YYYY-MM-DD'):
+            parse_student_row(sample_student_data)
+
+    def test_non_object(self):
+        """Test a JSON value that is not an object is rejected."""
+        with pytest.raises(ValueError, match='not an object'):
+            parse_student_row(['a', 'b'])
+
+    def test_unsupported_format(self):
+        """Test iterating an unknown format raises."""
+        with pytest.raises(ValueError, match='unsupported'):
+            list(iter_import_rows(io.StringIO(''), 'xml'))
+
+
+class TestImportStudents:
+    """Test the chunked import routine."""
+
+    def test_inserts_across_chunks(self, test_app):
+        """Test rows spanning several chunks are all inserted."""
+        with test_app.app_context():
+            rows = iter_import_rows(io.StringIO(CSV_HEADER + ''.join(csv_row(i) for i in range(7))), 'csv')
+            report = import_students(rows, batch_size=3)
+            assert report['processed'] == 7
+            assert report['inserted'] == 7
+            assert report['error_count'] == 0
+            assert Student.query.count() == 7
+            student = Student.query.filter_by(email='bulk3@example.com').one()
+            assert student.address == '1 Bulk Road, Unit 2'
+            assert student.registration_date is not None
+
+    def test_reports_errors_without_aborting(self, test_app, created_student):
+        """Test bad rows are reported while good rows are still inserted."""
+        with test_app.app_context():
+            data = (
+                json_row(1)
+                + json_row(2, date_of_birth='bad')
+                + '{not json\n'
+                + '\n'
+                + json_row(3, email='john.doe@example.com')
+                + json_row(4, email='bulk1@example.com')
+                + json_row(5)
+            )
+            report = import_students(iter_import_rows(io.StringIO(data), 'json'), batch_size=10)
+            assert report['inserted'] == 2
+            assert [e['row'] for e in report['errors']] == [2, 3, 4, 5]
+            assert 'already exists' in report['errors'][2]['error']
+            assert 'duplicate email in upload' in report['errors'][3]['error']
+            assert Student.query.count() == 3
+
+    def test_error_list_is_capped(self, test_app, monkeypatch):
+        """Test only IMPORT_MAX_ERRORS errors are listed but all are counted."""
+        monkeypatch.setitem(test_app.config, 'IMPORT_MAX_ERRORS', 2)
+        with test_app.app_context():
+            data = ''.join(json_row(i, city='') for i in range(5))
+            report = import_students(iter_import_rows(io.StringIO(data), 'json'))
+            assert report['error_count'] == 5
+            assert len(report['errors']) == 2
+
+    def test_conflict_during_insert_falls_back_to_rows(self, test_app, monkeypatch):
+        """Test a unique violation on insert only rejects the conflicting row."""
+        with test_app.app_context():
+            # Simulate a concurrent writer: the email appears after the IN check.
+            original = db.session.scalars
+
+            def racing_scalars(*args, **kwargs):
+                result = list(original(*args, **kwargs))
+                db.session.execute(db.text(
+                    "INSERT INTO student (first_name, last_name, email, phone, date_of_birth, "
+                    "gender, address, city, course) VALUES ('R', 'R', 'bulk1@example.com', '1', "
+                    "'2000-01-01', 'Male', 'a', 'b', 'c')"
+                ))
+                db.session.commit()
+                return result
+
+            monkeypatch.setattr(db.session, 'scalars', racing_scalars)
+            report = import_students(iter_import_rows(io.StringIO(json_row(0) + json_row(1)), 'json'))
+            assert report['inserted'] == 1
+            assert report['errors'] == [{'row': 2, 'error': 'a student with this email already exists'}]
+
+
+class TestImportRoute:
+    """Test the bulk import endpoint."""
+
+    def test_csv_file_upload(self, client, test_app):
+        """Test uploading a CSV file."""
+        body = (CSV_HEADER + csv_row(1) + csv_row(2)).encode()
+        response = client.post('/students/import', data={'file': (io.BytesIO(body), 'students.csv')},
+                               content_type='multipart/form-data')
+        assert response.status_code == 200
+        assert response.get_json()['inserted'] == 2
+
+    def test_json_lines_file_upload(self, client):
+        """Test uploading a JSON Lines file detected from its extension."""
+        body = (json_row(1) + json_row(2, gender='')).encode()
+        response = client.post('/students/import', data={'file': (io.BytesIO(body), 'students.jsonl')},
+                               content_type='multipart/form-data')
+        report = response.get_json()
+        assert report['inserted'] == 1
+        assert report['errors'] == [{'row': 2, 'error': 'missing gender'}]
+
+    def test_raw_body_upload(self, client):
+        """Test posting the records directly as the request body."""
+        response = client.post('/students/import', data=json_row(1),
+                               content_type='application/x-ndjson')
+        assert response.get_json()['inserted'] == 1
+
+    def test_unsupported_format(self, client):
+        """Test an unknown format parameter is rejected."""
+        response = client.post('/students/import?format=xml', data='x')
+        assert response.status_code == 400
+
+    def test_undecodable_upload(self, client):
+        """Test a non UTF-8 upload is rejected."""
+        response = client.post('/students/import', data=b'\xff\xfe\x00bad', content_type='text/csv')
+        assert response.status_code == 400
+        assert 'could not read upload' in response.get_json()['error']
+
+
+class TestImportCommand:
+    """Test the import-students CLI command."""
+
+    def test_command_imports_file(self, runner, test_app, tmp_path):
+        """Test the command imports a file and prints a summary."""
+        path = tmp_path / 'students.csv'
+        path.write_text(CSV_HEADER + csv_row(1) + csv_row(2, course=''))
+        result = runner.invoke(args=['import-students', str(path), '--batch-size', '1'])
+        assert result.exit_code == 0
+        assert 'Processed 2 rows: 1 inserted, 1 errors.' in result.output
+        assert 'row 2: missing course' in result.output
+        with test_app.app_context():
+            assert Student.query.count() == 1
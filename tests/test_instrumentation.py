@@ -0,0 +1,163 @@
+"""
+Unit tests for request timing and the Server-Timing header.
+"""
+import re
+import pytest
+from app import db
+from instrumentation import LatencyHistogram, RequestTimer, server_timing
+from tests.test_pagination import make_students
+
+
+@pytest.fixture
+def timed_app(make_app):
+    app = make_app(INSTRUMENTATION=True)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def parse_server_timing(header):
+    metrics = {}
+    for part in header.split(', '):
+        name, *params = part.split(';')
+        metrics[name] = dict(param.split('=', 1) for param in params)
+    return metrics
+
+
+class TestLatencyHistogram:
+    """Test reading quantiles from a registry's latency row."""
+
+    def test_buckets_and_quantiles(self):
+        """Test quantiles are the upper bound of the bucket holding them."""
+        histogram = LatencyHistogram((0.01, 0.1, 1.0), [2, 1, 1, 1, 3.565])
+        assert histogram.count == 5
+        assert histogram.quantile(0.4) == 0.01
+        assert histogram.quantile(0.6) == 0.1
+        assert histogram.quantile(1.0) == float('inf')
+        snapshot = histogram.snapshot()
+        assert snapshot['buckets'] == {'0.01': 2, '0.1': 3, '1.0': 4, 'inf': 5}
+        assert snapshot['sum'] == pytest.approx(3.565)
+
+    def test_empty(self):
+        """Test an empty histogram has no quantiles."""
+        assert LatencyHistogram((0.1,), [0, 0, 0.0]).snapshot()['p99'] is None
+
+
+class TestRequestTimer:
+    """Test the per-request counters."""
+
+    def test_unmatched_finish_is_ignored(self):
+        """Test a finish without a start does not count."""
+        timer = RequestTimer()
+        timer.sql_finished()
+        timer.template_finished()
+        assert timer.sql_count == 0
+        assert timer.template_time == 0
+
+    def test_server_timing_format(self):
+        """Test the header lists app, db and template durations in milliseconds."""
+        timer = RequestTimer()
+        timer.sql_count, timer.sql_time, timer.template_time = 3, 0.0042, 0.0015
+        assert server_timing(timer, 0.0123) == \
+            'app;dur=12.30, db;dur=4.20;desc="3 queries", tpl;dur=1.50'
+
+
+class TestServerTiming:
+    """Test requests report their timings."""
+
+    def test_header_counts_queries_and_templates(self, timed_app, sample_student_data):
+        """Test a rendered page reports its SQL statements and template time."""
+        client = timed_app.test_client()
+        client.post('/register', data=sample_student_data)
+        timed_app.extensions['page_cache'].clear()
+        response = client.get('/success/1')
+        metrics = parse_server_timing(response.headers['Server-Timing'])
+        assert set(metrics) == {'app', 'db', 'tpl'}
+        assert re.fullmatch(r'"[1-9]\d* queries"', metrics['db']['desc'])
+        assert float(metrics['tpl']['dur']) > 0
+        assert float(metrics['app']['dur']) >= float(metrics['db']['dur'])
+
+    def test_header_can_be_disabled(self, timed_app):
+        """Test SERVER_TIMING=False still records but sends no header."""
+        timed_app.config['SERVER_TIMING'] = False
+        response = timed_app.test_client().get('/')
+        assert 'Server-Timing' not in response.headers
+        assert timed_app.extensions['instrumentation'].snapshot()['index']['count'] == 1
+
+    def test_off_by_default(self, client, test_app):
+        """Test the default app installs no timing hooks."""
+        assert 'Server-Timing' not in client.get('/').headers
+        assert 'instrumentation' not in test_app.extensions
+        assert client.get('/timings').status_code == 404
+
+    def test_queries_outside_requests_are_ignored(self, timed_app):
+        """Test SQL run outside a request does not fail or count."""
+        db.session.execute(db.text('SELECT 1'))
+        assert timed_app.extensions['instrumentation'].snapshot() == {}
+
+
+class TestTimingsEndpoint:
+    """Test the per-endpoint aggregates."""
+
+    def test_histograms_per_endpoint(self, timed_app):
+        """Test each endpoint gets its own histogram and totals."""
+        client = timed_app.test_client()
+        # The first request also loads the email filter.
+        for url in ('/students', '/', '/', '/no-such-page'):
+            client.get(url).close()
+        timings = client.get('/timings').get_json()
+        assert set(timings) == {'index', 'students', 'unmatched'}
+        assert timings['index']['count'] == 2
+        assert timings['index']['sql_queries'] == 0
+        assert timings['index']['template_seconds'] > 0
+        assert timings['students']['queries_per_request'] > 0
+        assert sum(timings['index']['buckets'].values()) >= 2
+
+    def test_streamed_page_recorded_when_sent(self, timed_app):
+        """Test a streamed listing is recorded with its body's rendering time."""
+        make_students(20)
+        client = timed_app.test_client()
+        client.get('/students').close()
+        instrumentation = timed_app.extensions['instrumentation']
+        instrumentation.reset()
+        timed_app.extensions['page_cache'].clear()
+        response = client.get('/students')
+        header = parse_server_timing(response.headers['Server-Timing'])
+        assert float(header['tpl']['dur']) == 0
+        assert instrumentation.snapshot() == {}
+        response.get_data()
+        response.close()
+        students = instrumentation.snapshot()['students']
+        assert students['count'] == 1
+        assert students['template_seconds'] > 0
+        assert students['sum'] * 1000 > float(header['app']['dur'])
+
+    def test_reset(self, timed_app):
+        """Test the aggregates can be cleared."""
+        client = timed_app.test_client()
+        client.get('/')
+        timed_app.extensions['instrumentation'].reset()
+        assert client.get('/timings').get_json() == {}
+        client.get('/')
+        assert client.get('/timings').get_json()['index']['count'] == 1
+
+    def test_latency_shared_with_metrics(self, timed_app):
+        """Test /timings reads the latencies /metrics records instead of timing again."""
+        client = timed_app.test_client()
+        client.get('/')
+        client.get('/')
+        latency = timed_app.extensions['metrics'].snapshot().latency['index']
+        index = client.get('/timings').get_json()['index']
+        assert index['count'] == sum(latency[:-1]) == 2
+        assert index['sum'] == latency[-1]
+
+    def test_without_metrics(self, tmp_path, make_app):
+        """Test /timings works with the /metrics endpoint and its files turned off."""
+        app = make_app(INSTRUMENTATION=True, METRICS=False, METRICS_DIR=str(tmp_path / 'metrics'))
+        client = app.test_client()
+        client.get('/')
+        assert client.get('/metrics').status_code == 404
+        assert client.get('/timings').get_json()['index']['count'] == 1
+        assert app.extensions['metrics_collector'] is None
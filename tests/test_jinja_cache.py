@@ -0,0 +1,57 @@
+"""
+Unit tests for the Jinja bytecode cache and template precompilation.
+"""
+import os
+from jinja2 import FileSystemBytecodeCache
+
+
+def cached_files(tmp_path):
+    return os.listdir(tmp_path / 'jinja')
+
+
+class TestBytecodeCache:
+    """Test compiled templates are shared through the cache directory."""
+
+    def test_render_writes_cache(self, tmp_path, make_app):
+        """Test rendering a template stores its bytecode."""
+        test_app = make_app()
+        assert isinstance(test_app.jinja_env.bytecode_cache, FileSystemBytecodeCache)
+        assert cached_files(tmp_path) == []
+        test_app.test_client().get('/')
+        # index.html, the base.html it extends and the fonts.html that includes.
+        assert len(cached_files(tmp_path)) == 3
+
+    def test_second_app_loads_from_cache(self, tmp_path, monkeypatch, make_app):
+        """Test another worker on the same directory skips compiling."""
+        make_app().test_client().get('/')
+        other = make_app()
+
+        def fail(*args, **kwargs):
+            raise AssertionError('template should come from the bytecode cache')
+
+        monkeypatch.setattr(other.jinja_env, 'compile', fail)
+        assert other.test_client().get('/').status_code == 200
+
+    def test_cache_can_be_disabled(self, tmp_path, make_app):
+        """Test JINJA_BYTECODE_CACHE=False compiles in memory only."""
+        test_app = make_app(JINJA_BYTECODE_CACHE=False)
+        assert test_app.jinja_env.bytecode_cache is None
+        assert not os.path.exists(tmp_path / 'jinja')
+
+
+class TestPrecompile:
+    """Test compiling every template ahead of the first request."""
+
+    def test_command_fills_cache(self, tmp_path, make_app):
+        """Test the CLI compiles every template into the cache."""
+        test_app = make_app()
+        result = test_app.test_cli_runner().invoke(args=['compile-templates'])
+        templates = test_app.jinja_env.list_templates()
+        assert result.exit_code == 0
+        assert f'Compiled {len(templates)} templates.' in result.output
+        assert len(cached_files(tmp_path)) == len(templates)
+
+    def test_precompile_on_create(self, tmp_path, make_app):
+        """Test JINJA_PRECOMPILE loads every template when the app is built."""
+        test_app = make_app(JINJA_PRECOMPILE=True)
+        assert len(test_app.jinja_env.cache) == len(test_app.jinja_env.list_templates())
@@ -0,0 +1,192 @@
+"""
+Unit tests for the /metrics endpoint and its collectors.
+"""
+import json
+import os
+import re
+import threading
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+from app import db, pool_gauges
+from metrics import MetricsRegistry, Totals, render
+
+
+def sample(body, name, **labels):
+    """Return the value of one sample line from a metrics page."""
+    label_text = ','.join(f'{key}="{value}"' for key, value in labels.items())
+    pattern = rf'^{re.escape(name)}' + (rf'\{{{re.escape(label_text)}\}}' if labels else '')
+    match = re.search(pattern + r' (\S+)$', body, re.MULTILINE)
+    return match and float(match.group(1))
+
+
+@pytest.fixture
+def shared_app(tmp_path, make_app):
+    app = make_app(METRICS_DIR=str(tmp_path / 'metrics'), METRICS_FLUSH_INTERVAL=0.01)
+    with app.app_context():
+        db.create_all()
+        yield app
+        app.extensions['metrics_collector'].stop()
+        db.session.remove()
+        db.drop_all()
+
+
+class TestMetricsRegistry:
+    """Test per-thread recording."""
+
+    def test_threads_record_into_own_shards(self):
+        """Test samples from many threads add up without a shared lock."""
+        registry = MetricsRegistry(buckets=(0.1, 1.0))
+        barrier = threading.Barrier(4)
+
+        def work():
+            barrier.wait()
+            for _ in range(1000):
+                registry.observe_request('index', 'GET', 200, 0.05)
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        totals = registry.snapshot()
+        assert totals.requests == {('index', 'GET', 200): 4000}
+        assert totals.latency['index'][:3] == [4000, 0, 0]
+        assert totals.latency['index'][-1] == pytest.approx(200)
+
+    def test_finished_threads_are_retired(self):
+        """Test shards of exited threads are folded in and dropped."""
+        registry = MetricsRegistry(buckets=(0.1,))
+        for _ in range(3):
+            thread = threading.Thread(
+                target=registry.observe_request, args=('students', 'GET', 200, 0.5))
+            thread.start()
+            thread.join()
+        registry.observe_request('students', 'GET', 500, 0.01)
+        assert registry.snapshot().requests == {('students', 'GET', 200): 3,
+                                                ('students', 'GET', 500): 1}
+        assert len(registry._shards) == 1
+        assert registry.snapshot().latency['students'] == [1, 3, pytest.approx(1.51)]
+
+
+class TestRender:
+    """Test the Prometheus text format."""
+
+    def test_counters_histograms_and_gauges(self):
+        """Test every family is written with cumulative buckets."""
+        registry = MetricsRegistry(buckets=(0.1, 1.0))
+        registry.observe_request('index', 'GET', 200, 0.05)
+        registry.observe_request('index', 'GET', 200, 2.0)
+        registry.observe_request('register', 'POST', 500, 0.5)
+        body = render(registry.snapshot(), registry.buckets, {'42': {'db_pool_size': 5}},
+                      {'registered_students': 7})
+        assert sample(body, 'student_app_requests_total',
+                      endpoint='index', method='GET', status=200) == 2
+        assert sample(body, 'student_app_request_errors_total', endpoint='index') == 0
+        assert sample(body, 'student_app_request_errors_total', endpoint='register') == 1
+        assert sample(body, 'student_app_request_duration_seconds_bucket',
+                      endpoint='index', le=0.1) == 1
+        assert sample(body, 'student_app_request_duration_seconds_bucket',
+                      endpoint='index', le='+Inf') == 2
+        assert sample(body, 'student_app_request_duration_seconds_count', endpoint='index') == 2
+        assert sample(body, 'student_app_request_duration_seconds_sum',
+                      endpoint='index') == pytest.approx(2.05)
+        assert sample(body, 'student_app_db_pool_size', pid=42) == 5
+        assert sample(body, 'student_app_registered_students') == 7
+        assert '# TYPE student_app_request_duration_seconds histogram' in body
+
+    def test_label_values_are_escaped(self):
+        """Test quotes and backslashes cannot break the format."""
+        totals = Totals()
+        totals.requests[('a"b\\c', 'GET', 200)] = 1
+        body = render(totals, (), {}, {})
+        assert 'endpoint="a\\"b\\\\c"' in body
+
+
+class TestMetricsEndpoint:
+    """Test scraping /metrics."""
+
+    def test_counts_requests_per_endpoint(self, client, test_app, sample_student_data):
+        """Test requests, statuses and registered students are reported."""
+        client.get('/')
+        client.post('/register', data=sample_student_data)
+        client.get('/success/1')
+        # Unhandled HTTP errors are streamed, so they count once closed.
+        client.get('/missing').close()
+        response = client.get('/metrics')
+        assert response.mimetype == 'text/plain'
+        body = response.get_data(as_text=True)
+        assert sample(body, 'student_app_requests_total',
+                      endpoint='index', method='GET', status=200) == 1
+        assert sample(body, 'student_app_requests_total',
+                      endpoint='register', method='POST', status=302) == 1
+        assert sample(body, 'student_app_requests_total',
+                      endpoint='unmatched', method='GET', status=404) == 1
+        assert sample(body, 'student_app_request_duration_seconds_count', endpoint='success') == 1
+        assert sample(body, 'student_app_registered_students') == 1
+
+    def test_server_errors_counted(self, test_app, client, monkeypatch):
+        """Test 5xx responses count as errors."""
+        import app as app_module
+        monkeypatch.setitem(test_app.config, 'PROPAGATE_EXCEPTIONS', False)
+
+        def boom(*args, **kwargs):
+            raise RuntimeError('boom')
+        monkeypatch.setattr(app_module, 'student_count', boom)
+        response = client.get('/students')
+        assert response.status_code == 500
+        response.close()
+        monkeypatch.undo()
+        body = client.get('/metrics').get_data(as_text=True)
+        assert sample(body, 'student_app_request_errors_total', endpoint='students') == 1
+
+    def test_disabled(self, make_app):
+        """Test METRICS=False installs no hooks and hides the endpoint."""
+        app = make_app(METRICS=False)
+        assert 'metrics' not in app.extensions
+        assert app.test_client().get('/metrics').status_code == 404
+
+    def test_pool_gauges(self, tmp_path):
+        """Test queue pools report occupancy and other pools nothing."""
+        engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", pool_size=3,
+                               poolclass=QueuePool)
+        with engine.connect():
+            assert pool_gauges(engine.pool) == {
+                'db_pool_size': 3, 'db_pool_checked_in': 0,
+                'db_pool_checked_out': 1, 'db_pool_overflow': -2,
+            }
+        engine.dispose()
+        assert pool_gauges(create_engine('sqlite://').pool) == {}
+
+
+class TestFileCollector:
+    """Test sharing metrics between worker processes."""
+
+    def test_merges_other_processes(self, shared_app, tmp_path):
+        """Test a scrape adds up every worker's file."""
+        directory = tmp_path / 'metrics'
+        other = MetricsRegistry()
+        other.observe_request('index', 'GET', 200, 0.01)
+        (directory / '99999.json').write_text(
+            json.dumps(dict(other.snapshot().to_json(),
+                                          gauges={'db_pool_size': 5})))
+        (directory / 'broken.json').write_text('{')
+        client = shared_app.test_client()
+        client.get('/')
+        body = client.get('/metrics').get_data(as_text=True)
+        assert sample(body, 'student_app_requests_total',
+                      endpoint='index', method='GET', status=200) == 2
+        assert sample(body, 'student_app_db_pool_size', pid=99999) == 5
+        assert os.path.exists(directory / f'{os.getpid()}.json')
+
+    def test_background_flush(self, shared_app, tmp_path):
+        """Test a worker writes its totals without being scraped."""
+        shared_app.test_client().get('/')
+        collector = shared_app.extensions['metrics_collector']
+        path = tmp_path / 'metrics' / f'{os.getpid()}.json'
+        for _ in range(500):
+            if path.exists():
+                break
+            threading.Event().wait(0.01)
+        assert path.exists()
+        collector.start()
+        assert collector._pid == os.getpid()
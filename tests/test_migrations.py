@@ -0,0 +1,101 @@
+"""
+Unit tests for Student indexes and the schema migration mechanism.
+"""
+import pytest
+from datetime import date
+from sqlalchemy import inspect
+from app import db, Student, SchemaVersion, MIGRATIONS, upgrade_database, get_schema_version
+
+
+def index_names():
+    return {index['name'] for index in inspect(db.engine).get_indexes('student')}
+
+
+class TestStudentIndexes:
+    """Test the Student model declares indexes for its access patterns."""
+
+    def test_indexes_created_with_table(self, test_app):
+        """Test create_all creates the access-pattern indexes."""
+        with test_app.app_context():
+            assert {
+                'ix_student_registration',
+                'ix_student_course_registration',
+                'ix_student_city_registration',
+                'ix_student_name',
+            } <= index_names()
+
+    def test_listing_query_uses_index(self, test_app):
+        """Test the /students ordering is served by an index."""
+        with test_app.app_context():
+            plan = db.session.execute(db.text(
+                'EXPLAIN QUERY PLAN SELECT * FROM student '
+                'ORDER BY registration_date DESC, id DESC LIMIT 50'
+            )).all()
+            detail = ' '.join(row[-1] for row in plan)
+            assert 'ix_student_registration' in detail
+            assert 'TEMP B-TREE' not in detail
+
+
+class TestUpgradeDatabase:
+    """Test applying migrations to existing databases."""
+
+    def test_upgrade_records_latest_version(self, test_app):
+        """Test upgrading a fresh database stamps the latest version."""
+        with test_app.app_context():
+            assert get_schema_version() == 0
+            applied = upgrade_database()
+            assert applied == [version for version, _ in MIGRATIONS]
+            assert get_schema_version() == MIGRATIONS[-1][0]
+
+    def test_upgrade_is_idempotent(self, test_app):
+        """Test a second upgrade applies nothing."""
+        with test_app.app_context():
+            upgrade_database()
+            assert upgrade_database() == []
+            assert SchemaVersion.query.count() == 1
+
+    def test_upgrade_adds_indexes_without_data_loss(self, test_app):
+        """Test a pre-index database gains indexes and keeps its rows."""
+        with test_app.app_context():
+            for index in Student.__table__.indexes:
+                index.drop(db.engine)
+            db.session.add(Student(
+                first_name='Legacy', last_name='Row', email='legacy@example.com',
+                phone='1234567890', date_of_birth=date(2000, 1, 1), gender='Male',
+                address='1 Old Road', city='Old Town', course='Medicine'
+            ))
+            db.session.commit()
+            assert 'ix_student_registration' not in index_names()
+
+            upgrade_database()
+
+            assert 'ix_student_registration' in index_names()
+            assert Student.query.filter_by(email='legacy@example.com').count() == 1
+
+    def test_upgrade_skips_applied_versions(self, test_app):
+        """Test migrations at or below the recorded version are not re-run."""
+        with test_app.app_context():
+            db.session.add(SchemaVersion(id=1, version=MIGRATIONS[-1][0]))
+            db.session.commit()
+            for index in Student.__table__.indexes:
+                index.drop(db.engine)
+            assert upgrade_database() == []
+            assert 'ix_student_registration' not in index_names()
+
+
+class TestDbUpgradeCommand:
+    """Test the db-upgrade CLI command."""
+
+    def test_command_applies_migrations(self, runner):
+        """Test the command reports the migrations it applied."""
+        result = runner.invoke(args=['db-upgrade'])
+        assert result.exit_code == 0
+        expected = ', '.join(str(version) for version, _ in MIGRATIONS)
+        assert f'Applied migrations: {expected}' in result.output
+
+    def test_command_reports_up_to_date(self, runner):
+        """Test the command reports when there is nothing to do."""
+        runner.invoke(args=['db-upgrade'])
+        result = runner.invoke(args=['db-upgrade'])
+        assert result.exit_code == 0
+        assert f'up to date (version {MIGRATIONS[-1][0]})' in result.output
@@ -0,0 +1,111 @@
+"""
+Unit tests for the shared layout, icon sprite and inlined critical CSS,
+and the size of the pages they produce.
+"""
+import os
+import pytest
+from app import db
+from assets import critical_css
+from tests.test_pagination import make_students
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Measured after the layout and sprite were introduced; the listing was
+# 2,630,765 bytes before. A failure here means every card grew.
+LISTING_BYTES_PER_STUDENT = 1450
+
+
+@pytest.fixture
+def listing_app(make_app):
+    app = make_app(STUDENTS_PER_PAGE=1000, STUDENTS_MAX_PER_PAGE=1000)
+    with app.app_context():
+        db.create_all()
+        make_students(1000)
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+class TestListingSize:
+    """Test the weight of a large students listing."""
+
+    def test_thousand_students(self, listing_app):
+        """Test a 1,000-student page stays under its size budget."""
+        html = listing_app.test_client().get('/students').get_data(as_text=True)
+        assert html.count('student-mini-card') == 1000
+        assert len(html.encode()) < 1000 * LISTING_BYTES_PER_STUDENT
+
+    def test_icons_are_shared(self, listing_app):
+        """Test each card references the sprite instead of repeating paths."""
+        html = listing_app.test_client().get('/students').get_data(as_text=True)
+        assert html.count('<symbol id="icon-email"') == 1
+        assert html.count('<use href="#icon-email"/>') == 1000
+        assert html.count('<path') == 3
+
+    def test_only_first_cards_staggered(self, listing_app):
+        """Test later cards are not held back by ever longer animation delays."""
+        html = listing_app.test_client().get('/students').get_data(as_text=True)
+        assert html.count('animation-delay') == 12
+
+
+class TestLayout:
+    """Test every page shares the base layout."""
+
+    @pytest.mark.parametrize('url', ['/', '/students', '/stats'])
+    def test_pages_extend_base(self, url, make_app):
+        """Test the head, header and footer come from base.html."""
+        app = make_app()
+        with app.app_context():
+            db.create_all()
+            html = app.test_client().get(url).get_data(as_text=True)
+        assert html.startswith('<!DOCTYPE html>')
+        assert html.count('class="background-shapes"') == 1
+        assert 'EduRegister. Empowering Education.' in html
+        assert html.rstrip().endswith('</html>')
+
+
+class TestCriticalCss:
+    """Test inlining the above-the-fold rules."""
+
+    def test_selects_rules(self):
+        """Test matching rules, @media blocks and used keyframes are kept."""
+        css = """
+        .header { display: flex; animation: slide 1s; }
+        .nav-link:hover, .nav { color: red; }
+        .nav, .card { color: blue; }
+        .card { content: "\\"}"; }
+        @media (max-width: 10px) { .header { display: block; } .card { margin: 0; } }
+        @media print { .card { display: none; } }
+        @font-face { font-family: X; }
+        @keyframes slide { from { opacity: 0; } }
+        @keyframes unused { to { opacity: 1; } }
+        """
+        assert critical_css(css, ['.header', '.nav', '.nav-link']) == (
+            '.header{display:flex;animation:slide 1s}'
+            '.nav-link:hover,.nav{color:red}'
+            '@media (max-width:10px){.header{display:block}}'
+            '@keyframes slide{from{opacity:0}}'
+        )
+
+    def test_app_stylesheet(self):
+        """Test the app's critical rules are a small part of its stylesheet."""
+        with open(os.path.join(ROOT, 'static', 'css', 'style.css')) as f:
+            css = f.read()
+        critical = critical_css(css)
+        assert '.header{' in critical and '@keyframes float' in critical
+        assert '.student-mini-card' not in critical
+        assert len(critical) < len(css) / 3
+
+    def test_off_by_default(self, client):
+        """Test pages link the stylesheet normally unless asked."""
+        html = client.get('/').get_data(as_text=True)
+        assert '<style>' not in html
+        assert '<link rel="stylesheet" href="/static/css/style.css">' in html
+
+    def test_inlined(self, make_app):
+        """Test CRITICAL_CSS inlines the rules and loads the stylesheet late."""
+        html = make_app(CRITICAL_CSS=True).test_client().get('/').get_data(as_text=True)
+        assert '<style>:root{' in html
+        assert '.header{' in html
+        assert 'rel="preload" href="/static/css/style.css" as="style"' in html
+        assert '<noscript><link rel="stylesheet" href="/static/css/style.css"></noscript>' in html
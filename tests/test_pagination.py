@@ -0,0 +1,138 @@
+"""
+Unit tests for keyset pagination of the students listing.
+"""
+import pytest
+from datetime import datetime, date, timedelta
+from app import db, Student, encode_cursor, decode_cursor, paginate_students
+
+
+def make_students(count):
+    """Insert `count` students with strictly increasing registration dates."""
+    base = datetime(2024, 1, 1)
+    for i in range(count):
+        db.session.add(Student(
+            first_name=f'First{i:03d}',
+            last_name=f'Last{i:03d}',
+            email=f'student{i:03d}@example.com',
+            phone='1234567890',
+            date_of_birth=date(2000, 1, 1),
+            gender='Male',
+            address='123 Test St',
+            city='Test City',
+            course='Computer Science',
+            registration_date=base + timedelta(minutes=i)
+        ))
+    db.session.commit()
+
+
+class TestCursorEncoding:
+    """Test cursor encoding and decoding."""
+
+    def test_cursor_round_trip(self, test_app):
+        """Test that a cursor decodes back to the student's sort key."""
+        with test_app.app_context():
+            make_students(1)
+            student = Student.query.first()
+            cursor = encode_cursor(student)
+            assert decode_cursor(cursor) == (student.registration_date, student.id)
+
+    def test_malformed_cursor_returns_400(self, client):
+        """Test that a malformed cursor is rejected."""
+        response = client.get('/students?after=not-a-cursor')
+        assert response.status_code == 400
+
+
+class TestPaginateStudents:
+    """Test the paginate_students helper."""
+
+    def test_first_page_newest_first(self, test_app):
+        """Test the first page holds the newest students."""
+        with test_app.app_context():
+            make_students(5)
+            page = paginate_students(per_page=2)
+            assert [s.first_name for s in page['students']] == ['First004', 'First003']
+            assert page['prev_cursor'] is None
+            assert page['next_cursor'] is not None
+
+    def test_walk_forward_covers_all_rows_once(self, test_app):
+        """Test following next cursors visits every student exactly once."""
+        with test_app.app_context():
+            make_students(7)
+            seen = []
+            page = paginate_students(per_page=3)
+            seen.extend(s.id for s in page['students'])
+            while page['next_cursor']:
+                page = paginate_students(after=page['next_cursor'], per_page=3)
+                seen.extend(s.id for s in page['students'])
+            assert len(seen) == 7
+            assert len(set(seen)) == 7
+
+    def test_prev_cursor_returns_previous_page(self, test_app):
+        """Test following a prev cursor returns the preceding page."""
+        with test_app.app_context():
+            make_students(5)
+            first = paginate_students(per_page=2)
+            second = paginate_students(after=first['next_cursor'], per_page=2)
+            back = paginate_students(before=second['prev_cursor'], per_page=2)
+            assert [s.id for s in back['students']] == [s.id for s in first['students']]
+            assert back['prev_cursor'] is None
+            assert back['next_cursor'] is not None
+
+    def test_last_page_has_no_next_cursor(self, test_app):
+        """Test the last page does not offer a next cursor."""
+        with test_app.app_context():
+            make_students(4)
+            first = paginate_students(per_page=2)
+            last = paginate_students(after=first['next_cursor'], per_page=2)
+            assert last['next_cursor'] is None
+            assert last['prev_cursor'] is not None
+
+    def test_ties_broken_by_id(self, test_app):
+        """Test students sharing a registration date are not skipped."""
+        with test_app.app_context():
+            make_students(4)
+            Student.query.update({Student.registration_date: datetime(2024, 1, 1)})
+            db.session.commit()
+            first = paginate_students(per_page=2)
+            second = paginate_students(after=first['next_cursor'], per_page=2)
+            ids = [s.id for s in first['students'] + second['students']]
+            assert ids == [4, 3, 2, 1]
+
+
+class TestStudentsPagination:
+    """Test pagination on the students route."""
+
+    def test_page_size_from_query_string(self, client, test_app):
+        """Test per_page limits the number of rendered cards."""
+        with test_app.app_context():
+            make_students(5)
+        response = client.get('/students?per_page=2')
+        assert response.data.count(b'student-mini-card') == 2
+        assert b'5 students enrolled' in response.data
+        assert b'rel="next"' in response.data
+        assert b'rel="prev"' not in response.data
+
+    def test_page_size_is_clamped(self, client, test_app, monkeypatch):
+        """Test per_page cannot exceed the configured maximum."""
+        monkeypatch.setitem(test_app.config, 'STUDENTS_MAX_PER_PAGE', 3)
+        with test_app.app_context():
+            make_students(5)
+        response = client.get('/students?per_page=1000')
+        assert response.data.count(b'student-mini-card') == 3
+
+    def test_no_pagination_links_for_single_page(self, client, test_app):
+        """Test pagination controls are hidden when everything fits on one page."""
+        with test_app.app_context():
+            make_students(2)
+        response = client.get('/students')
+        assert b'class="pagination"' not in response.data
+
+    def test_next_link_renders_older_students(self, client, test_app):
+        """Test following the next link renders the older page."""
+        with test_app.app_context():
+            make_students(3)
+            cursor = paginate_students(per_page=2)['next_cursor']
+        response = client.get(f'/students?after={cursor}&per_page=2')
+        assert b'First000' in response.data
+        assert b'First002' not in response.data
+        assert b'rel="prev"' in response.data
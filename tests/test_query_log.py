@@ -0,0 +1,179 @@
+"""
+Unit tests for the slow-query log and the repeated-query detector.
+"""
+import logging
+import pytest
+from flask import Response, abort, stream_with_context
+from sqlalchemy import select, text
+from app import db, Student
+from query_log import explain, normalize_statement
+
+
+@pytest.fixture
+def logged_app(make_app):
+    app = make_app(SLOW_QUERY_MS=0.000001, DETECT_REPEATED_QUERIES=True,
+                   REPEATED_QUERY_THRESHOLD=3)
+
+    def one_by_one():
+        for student_id in range(1, 5):
+            db.session.scalar(select(Student.email).where(Student.id == student_id))
+        return 'ok'
+    app.add_url_rule('/one-by-one', view_func=one_by_one)
+
+    def one_by_one_streamed():
+        def rows():
+            for student_id in range(1, 5):
+                yield str(db.session.scalar(select(Student.email).where(Student.id == student_id)))
+        return Response(stream_with_context(rows()))
+    app.add_url_rule('/one-by-one-streamed', view_func=one_by_one_streamed)
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+class TestNormalizeStatement:
+    """Test statements are reduced to their shape."""
+
+    def test_literals_and_in_lists(self):
+        """Test literals and IN-lists of any length compare equal."""
+        first = normalize_statement("SELECT * FROM student WHERE id IN (?, ?) AND city = 'Oslo'")
+        second = normalize_statement(
+            "SELECT *\n  FROM student WHERE id IN (?, ?, ?, ?) AND city = 'Bergen'"
+        )
+        assert first == second == 'SELECT * FROM student WHERE id IN (...) AND city = ?'
+
+    def test_identifiers_keep_digits(self):
+        """Test digits inside names are not mistaken for literals."""
+        assert normalize_statement('SELECT t1.a FROM t1 LIMIT 10') == 'SELECT t1.a FROM t1 LIMIT ?'
+
+
+class TestExplain:
+    """Test fetching query plans."""
+
+    def test_sqlite_plan(self, logged_app):
+        """Test a SELECT is explained on the same connection."""
+        with db.engine.connect() as connection:
+            plan = explain(connection, 'SELECT * FROM student WHERE email = ?', ('a@b.c',))
+        assert 'USING INDEX' in plan
+
+    def test_skips_other_statements(self, logged_app):
+        """Test statements EXPLAIN cannot describe have no plan."""
+        with db.engine.connect() as connection:
+            assert explain(connection, 'PRAGMA foreign_keys', ()) is None
+            assert explain(connection, '', ()) is None
+            assert explain(connection, 'SELECT * FROM missing', ()).startswith('unavailable')
+
+    def test_other_databases(self):
+        """Test other dialects use plain EXPLAIN and get each row as text."""
+        class Cursor:
+            def execute(self, statement, parameters):
+                self.statement = statement
+
+            def fetchall(self):
+                return [('Seq Scan on student', 1)]
+
+            def close(self):
+                pass
+
+        class Connection:
+            dialect = type('Dialect', (), {'name': 'postgresql'})()
+            connection = type('Raw', (), {'cursor': lambda self: Cursor()})()
+
+        assert explain(Connection(), 'SELECT 1', ()) == 'Seq Scan on student 1'
+
+
+class TestSlowQueryLog:
+    """Test statements over the threshold are logged."""
+
+    def test_logs_statement_endpoint_and_plan(self, logged_app, caplog):
+        """Test an entry records what ran, where and how."""
+        with caplog.at_level(logging.WARNING, logger='query_log'):
+            logged_app.test_client().get('/students')
+        entries = logged_app.extensions['slow_queries'].entries
+        listing = [entry for entry in entries
+                   if entry['endpoint'] == 'students' and 'FROM student' in entry['statement']]
+        assert listing
+        assert listing[0]['duration'] > 0
+        assert listing[0]['plan']
+        assert 'slow query' in caplog.text
+
+    def test_outside_requests(self, logged_app):
+        """Test statements run outside a request have no endpoint."""
+        db.session.execute(text('SELECT 1'))
+        assert logged_app.extensions['slow_queries'].entries[-1]['endpoint'] is None
+
+    def test_executemany_is_not_explained(self, logged_app):
+        """Test batched statements are logged without a plan."""
+        engine = db.engine
+        with engine.begin() as connection:
+            connection.execute(text('CREATE TABLE t (x INTEGER)'))
+            connection.execute(text('INSERT INTO t VALUES (:x)'), [{'x': 1}, {'x': 2}])
+        entry = logged_app.extensions['slow_queries'].entries[-1]
+        assert entry['statement'].startswith('INSERT INTO t')
+        assert entry['plan'] is None
+
+    def test_fast_queries_are_not_logged(self, make_app):
+        """Test the default threshold leaves ordinary queries alone."""
+        app = make_app()
+        with app.app_context():
+            db.create_all()
+            app.test_client().get('/students')
+            assert list(app.extensions['slow_queries'].entries) == []
+
+    def test_disabled(self, make_app):
+        """Test SLOW_QUERY_MS=0 installs nothing."""
+        app = make_app(SLOW_QUERY_MS=0)
+        assert 'slow_queries' not in app.extensions
+        assert 'repeated_queries' not in app.extensions
+
+
+class TestRepeatedQueryDetector:
+    """Test N+1 query detection."""
+
+    def test_flags_loop_of_queries(self, logged_app, caplog):
+        """Test a request issuing one query per row is reported."""
+        with caplog.at_level(logging.WARNING, logger='query_log'):
+            logged_app.test_client().get('/one-by-one')
+        report = logged_app.extensions['repeated_queries'].reports[-1]
+        assert report['endpoint'] == 'one_by_one'
+        statement, times = report['statements'][0]
+        assert times == 4
+        assert 'WHERE student.id = ?' in statement
+        assert 'one_by_one ran 4 near-identical statements' in caplog.text
+
+    def test_streamed_body_checked_on_close(self, logged_app):
+        """Test queries run while a streamed body is sent are reported once it closes."""
+        reports = logged_app.extensions['repeated_queries'].reports
+        response = logged_app.test_client().get('/one-by-one-streamed')
+        assert list(reports) == []
+        response.get_data()
+        response.close()
+        assert reports[-1]['endpoint'] == 'one_by_one_streamed'
+        assert reports[-1]['statements'][0][1] == 4
+
+    def test_error_pages_reported_once(self, logged_app):
+        """Test an error page, sent as a stream, is reported once however often it is closed."""
+        def missing():
+            for student_id in range(1, 5):
+                db.session.scalar(select(Student.email).where(Student.id == student_id))
+            abort(404)
+        logged_app.add_url_rule('/missing', view_func=missing)
+        logged_app.test_client().get('/missing').close()
+        reports = logged_app.extensions['repeated_queries'].reports
+        assert [report['endpoint'] for report in reports] == ['missing']
+
+    def test_single_queries_pass(self, logged_app, sample_student_data):
+        """Test ordinary pages are not reported."""
+        client = logged_app.test_client()
+        client.post('/register', data=sample_student_data)
+        client.get('/students')
+        client.get('/')
+        assert list(logged_app.extensions['repeated_queries'].reports) == []
+
+    def test_on_in_debug_mode(self, monkeypatch, make_app):
+        """Test debug apps detect repeated queries without being asked."""
+        monkeypatch.setenv('FLASK_DEBUG', '1')
+        assert 'repeated_queries' in make_app().extensions
@@ -0,0 +1,240 @@
+"""
+Unit tests for the registration rate limits and concurrency cap.
+"""
+import threading
+import pytest
+from sqlalchemy import event
+from app import db
+from rate_limit import (ConcurrencyLimit, MemoryStore, SQLiteStore, make_store,
+                        parse_limit)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def limited_app(make_app):
+    app = make_app(REGISTER_RATE_LIMIT_IP='3/minute', REGISTER_RATE_LIMIT_EMAIL='2/minute')
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    clock = Clock()
+    if request.param == 'memory':
+        store = MemoryStore(clock=clock)
+    else:
+        store = SQLiteStore(str(tmp_path / 'limits.db'), clock=clock)
+    store.clock = clock
+    return store
+
+
+def registration(data, i):
+    return dict(data, email=f'student{i}@example.com')
+
+
+class TestParseLimit:
+    """Test reading limits from configuration."""
+
+    def test_periods(self):
+        """Test the count is the burst and refills over the period."""
+        limit = parse_limit('ip', '5/minute')
+        assert (limit.name, limit.capacity, limit.rate) == ('ip', 5, 5 / 60)
+        assert parse_limit('ip', '100 / 12 hours').rate == 100 / 43200
+        assert parse_limit('ip', '1/second').rate == 1
+
+    def test_empty_and_invalid(self):
+        """Test an empty limit is none and nonsense is an error."""
+        assert parse_limit('ip', '') is None
+        for spec in ('5', '5/fortnight', '0/minute', 'many/minute'):
+            with pytest.raises(ValueError):
+                parse_limit('ip', spec)
+
+
+class TestStores:
+    """Test the token buckets, in both stores."""
+
+    def test_burst_then_refill(self, store):
+        """Test the capacity is allowed at once and tokens come back over time."""
+        limit = parse_limit('ip', '3/minute')
+        assert [store.take('ip:a', limit) for _ in range(3)] == [None, None, None]
+        assert store.take('ip:a', limit) == pytest.approx(20)
+        store.clock.now += 15
+        assert store.take('ip:a', limit) == pytest.approx(5)
+        store.clock.now += 5
+        assert store.take('ip:a', limit) is None
+        store.clock.now += 3600
+        assert [store.take('ip:a', limit) for _ in range(4)][-1] is not None
+
+    def test_keys_are_independent(self, store):
+        """Test one key running out leaves the others alone."""
+        limit = parse_limit('email', '1/hour')
+        assert store.take('email:a', limit) is None
+        assert store.take('email:a', limit) is not None
+        assert store.take('email:b', limit) is None
+        assert len(store) == 2
+
+    def test_concurrent_takes(self, store):
+        """Test threads racing for one bucket get exactly its capacity."""
+        limit = parse_limit('ip', '20/hour')
+        allowed = []
+        start = threading.Barrier(8)
+
+        def worker():
+            start.wait()
+            allowed.extend(store.take('ip:a', limit) is None for _ in range(10))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sum(allowed) == 20
+
+    def test_memory_evicts_least_recent(self):
+        """Test the memory store stays within max_keys."""
+        store = MemoryStore(stripes=1, max_keys=2)
+        limit = parse_limit('ip', '1/hour')
+        store.take('a', limit)
+        store.take('b', limit)
+        store.take('a', limit)
+        store.take('c', limit)
+        assert len(store) == 2
+        assert store.take('b', limit) is None
+        assert store.take('a', limit) is None
+
+    def test_sqlite_shared_and_pruned(self, tmp_path):
+        """Test workers share buckets and idle ones are deleted."""
+        clock = Clock()
+        path = str(tmp_path / 'nested' / 'limits.db')
+        first, second = SQLiteStore(path, clock=clock), SQLiteStore(path, clock=clock)
+        limit = parse_limit('ip', '1/minute')
+        assert first.take('ip:a', limit) is None
+        assert second.take('ip:a', limit) == pytest.approx(60)
+        second.prune_every = 1
+        clock.now += SQLiteStore.expire_after + 1
+        second.take('ip:b', limit)
+        assert len(first) == 1
+
+    def test_make_store(self, tmp_path):
+        """Test stores are built from configuration values."""
+        assert isinstance(make_store('memory'), MemoryStore)
+        assert isinstance(make_store('sqlite', str(tmp_path / 'limits.db')), SQLiteStore)
+        with pytest.raises(ValueError):
+            make_store('redis')
+
+
+class TestConcurrencyLimit:
+    """Test the cap on requests in progress."""
+
+    def test_never_waits(self):
+        """Test acquiring past the limit fails at once until a slot is released."""
+        cap = ConcurrencyLimit(1)
+        assert cap.acquire()
+        assert not cap.acquire()
+        cap.release()
+        assert cap.acquire()
+
+
+class TestRegistrationAdmission:
+    """Test registrations are turned away before reaching the database."""
+
+    def test_email_limit(self, limited_app, sample_student_data):
+        """Test resubmitting one email is limited, with a Retry-After."""
+        client = limited_app.test_client()
+        statuses = [client.post('/register', data=sample_student_data).status_code
+                    for _ in range(3)]
+        assert statuses == [302, 302, 429]
+        # From another address, so only the email limit applies.
+        response = client.post('/register', data=dict(
+            sample_student_data, email=' John.Doe@Example.com'),
+            environ_base={'REMOTE_ADDR': '10.0.0.2'})
+        assert response.status_code == 429
+        assert response.headers['Retry-After'] == '30'
+        assert b'Too many registration attempts' in response.data
+
+    def test_ip_limit(self, limited_app, sample_student_data):
+        """Test one address is limited whatever emails it uses."""
+        client = limited_app.test_client()
+        statuses = [client.post('/register', data=registration(sample_student_data, i)).status_code
+                    for i in range(4)]
+        assert statuses == [302, 302, 302, 429]
+        other = client.post('/register', data=registration(sample_student_data, 9),
+                            environ_base={'REMOTE_ADDR': '10.0.0.2'})
+        assert other.status_code == 302
+        assert client.get('/').status_code == 200
+
+    def test_api(self, limited_app, sample_student_data):
+        """Test the API gets a JSON 429."""
+        client = limited_app.test_client()
+        for _ in range(2):
+            client.post('/api/students', json=sample_student_data)
+        response = client.post('/api/students', json=sample_student_data)
+        assert response.status_code == 429
+        assert response.headers['Retry-After'] == '30'
+        assert 'error' in response.get_json()
+        # Bodies without an email are only limited by address.
+        assert client.post('/api/students', json=['x'],
+                           environ_base={'REMOTE_ADDR': '10.0.0.2'}).status_code == 400
+
+    def test_no_queries_when_rejected(self, limited_app, sample_student_data):
+        """Test a rejected registration costs no database work."""
+        client = limited_app.test_client()
+        for _ in range(2):
+            client.post('/register', data=sample_student_data)
+        statements = []
+        listener = lambda *args: statements.append(args[2])  # noqa: E731
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            assert client.post('/register', data=sample_student_data).status_code == 429
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        assert statements == []
+
+    def test_concurrency_cap(self, limited_app, sample_student_data):
+        """Test registrations beyond the cap are shed and slots are given back."""
+        limited_app.extensions['register_concurrency'] = cap = ConcurrencyLimit(1)
+        client = limited_app.test_client()
+        assert cap.acquire()
+        response = client.post('/register', data=sample_student_data)
+        assert response.status_code == 429
+        assert response.headers['Retry-After'] == '1'
+        cap.release()
+        assert client.post('/register', data=sample_student_data).status_code == 302
+        assert cap.acquire()
+
+    def test_behind_proxy(self, sample_student_data, make_app):
+        """Test clients behind a trusted proxy are limited by their own address."""
+        app = make_app(REGISTER_RATE_LIMIT_IP='1/minute', TRUSTED_PROXY_HOPS=1)
+        with app.app_context():
+            db.create_all()
+            client = app.test_client()
+
+            def register(i, address):
+                return client.post('/register', data=registration(sample_student_data, i),
+                                   headers={'X-Forwarded-For': address}).status_code
+
+            assert [register(0, '203.0.113.1'), register(1, '203.0.113.2')] == [302, 302]
+            assert register(2, '203.0.113.1') == 429
+            db.drop_all()
+
+    def test_configuration(self, tmp_path, make_app):
+        """Test limits can be lifted and shared through SQLite."""
+        app = make_app(REGISTER_RATE_LIMIT_IP='', REGISTER_RATE_LIMIT_EMAIL='',
+                       REGISTER_MAX_CONCURRENT=0, RATE_LIMIT_STORE='sqlite',
+                       RATE_LIMIT_PATH=str(tmp_path / 'limits.db'))
+        assert app.extensions['register_rate_limits'] == []
+        assert app.extensions['register_concurrency'] is None
+        assert isinstance(app.extensions['rate_limit_store'], SQLiteStore)
+        # The address limit is off until a proxy is trusted to report it.
+        limits = make_app().extensions['register_rate_limits']
+        assert [limit.name for limit, _ in limits] == ['email']
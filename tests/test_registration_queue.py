@@ -0,0 +1,306 @@
+"""
+Unit tests for queued registrations and group commit.
+"""
+import threading
+import pytest
+from datetime import date
+from app import db, Student, student_changes, write_registrations
+from registration_queue import (DONE, FAILED, PENDING, GroupCommitWriter, MemorySpool,
+                                SQLiteSpool, make_spool)
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def spool(request, tmp_path):
+    if request.param == 'memory':
+        spool = MemorySpool()
+    else:
+        spool = SQLiteSpool(str(tmp_path / 'spool.db'))
+    yield spool
+    spool.close()
+
+
+@pytest.fixture
+def writer(queue_app):
+    return queue_app.extensions['registration_queue']
+
+
+def ticket_of(response):
+    return response.headers['Location'].rsplit('/', 1)[1]
+
+
+class TestSpools:
+    """Behaviour shared by the memory and SQLite spools."""
+
+    def test_put_take_complete(self, spool):
+        """Test entries are taken in order and their results recorded."""
+        first = spool.put({'n': 1})
+        second = spool.put({'n': 2})
+        assert spool.status(first) == (PENDING, None)
+        assert spool.pending() == 2
+        batch = spool.take(10, 0)
+        assert batch == [(first, {'n': 1}), (second, {'n': 2})]
+        spool.complete({first: (DONE, 7), second: (FAILED, 'nope')})
+        assert spool.status(first) == (DONE, 7)
+        assert spool.status(second) == (FAILED, 'nope')
+        assert spool.pending() == 0
+
+    def test_take_respects_limit(self, spool):
+        """Test a batch never exceeds the limit."""
+        for n in range(3):
+            spool.put({'n': n})
+        assert len(spool.take(2, 0)) == 2
+        assert len(spool.take(2, 0)) == 1
+
+    def test_take_times_out_when_empty(self, spool):
+        """Test taking from an empty spool returns nothing."""
+        assert spool.take(10, 0.01) == []
+        assert spool.status('unknown') is None
+
+    def test_take_wakes_on_put(self, spool):
+        """Test a waiting take returns once an entry arrives."""
+        timer = threading.Timer(0.05, spool.put, args=({'n': 1},))
+        timer.start()
+        try:
+            assert [values for _, values in spool.take(1, 5)] == [{'n': 1}]
+        finally:
+            timer.join()
+
+
+class TestMemorySpool:
+    """Test the in-process spool."""
+
+    def test_old_results_are_forgotten(self):
+        """Test only the most recent results are kept."""
+        spool = MemorySpool(max_results=2)
+        tickets = [spool.put({'n': n}) for n in range(3)]
+        assert spool.status(tickets[0]) is None
+        assert spool.status(tickets[2]) == (PENDING, None)
+
+    def test_take_gathers_until_deadline(self):
+        """Test entries arriving within the flush interval join the batch."""
+        spool = MemorySpool()
+        spool.put({'n': 1})
+        timer = threading.Timer(0.02, spool.put, args=({'n': 2},))
+        timer.start()
+        batch = spool.take(2, 1)
+        timer.join()
+        assert [values for _, values in batch] == [{'n': 1}, {'n': 2}]
+
+
+class TestSQLiteSpool:
+    """Test the journaled spool."""
+
+    def test_shared_between_instances(self, tmp_path):
+        """Test two spools on one file share entries and statuses."""
+        path = str(tmp_path / 'spool.db')
+        first, second = SQLiteSpool(path), SQLiteSpool(path)
+        ticket = first.put({'n': 1})
+        assert second.take(10, 0) == [(ticket, {'n': 1})]
+        assert first.take(10, 0) == []
+        assert first.status(ticket) == (PENDING, None)
+        second.complete({ticket: (DONE, 3)})
+        assert first.status(ticket) == (DONE, 3)
+
+    def test_pending_entries_survive_restart(self, tmp_path):
+        """Test entries written before a crash are picked up by the next spool."""
+        path = str(tmp_path / 'spool.db')
+        crashed = SQLiteSpool(path)
+        ticket = crashed.put({'n': 1})
+        crashed.close()
+        assert SQLiteSpool(path).take(10, 0) == [(ticket, {'n': 1})]
+
+    def test_stale_claims_are_retried(self, tmp_path):
+        """Test entries claimed by a writer that died are claimed again."""
+        spool = SQLiteSpool(str(tmp_path / 'spool.db'))
+        ticket = spool.put({'n': 1})
+        spool.take(10, 0)
+        spool.claim_timeout = -1
+        assert spool.take(10, 0) == [(ticket, {'n': 1})]
+
+    def test_finished_entries_are_purged(self, tmp_path):
+        """Test results older than the retention period are deleted."""
+        spool = SQLiteSpool(str(tmp_path / 'spool.db'))
+        ticket = spool.put({'n': 1})
+        spool.take(10, 0)
+        spool.retention = -1
+        spool.complete({ticket: (DONE, 1)})
+        assert spool.status(ticket) is None
+
+    def test_unknown_spool(self):
+        """Test an unknown spool name is rejected."""
+        assert isinstance(make_spool('memory'), MemorySpool)
+        with pytest.raises(ValueError):
+            make_spool('redis')
+
+
+class TestGroupCommitWriter:
+    """Test draining the spool in batches."""
+
+    def test_batches_are_written_together(self):
+        """Test one write covers up to max_batch entries."""
+        batches = []
+
+        def write_batch(batch):
+            batches.append(batch)
+            return [(DONE, values['n']) for values in batch]
+
+        writer = GroupCommitWriter(MemorySpool(), write_batch, max_batch=2)
+        tickets = [writer.spool.put({'n': n}) for n in range(3)]
+        assert writer.flush_once() == 2
+        assert writer.flush_once() == 1
+        assert writer.flush_once() == 0
+        assert [len(batch) for batch in batches] == [2, 1]
+        assert writer.status(tickets[2]) == (DONE, 2)
+
+    def test_failed_write_fails_the_batch(self):
+        """Test an exception marks every entry in the batch as failed."""
+        def write_batch(batch):
+            raise RuntimeError('database is locked')
+
+        writer = GroupCommitWriter(MemorySpool(), write_batch)
+        ticket = writer.spool.put({'n': 1})
+        writer.flush_once()
+        assert writer.status(ticket) == (FAILED, 'Registration failed: database is locked')
+
+    def test_background_thread_and_close(self):
+        """Test submissions start the writer and close drains it."""
+        written = []
+
+        def write_batch(batch):
+            written.extend(batch)
+            return [(DONE, None)] * len(batch)
+
+        writer = GroupCommitWriter(MemorySpool(), write_batch, flush_interval=0.01)
+        tickets = [writer.submit({'n': n}) for n in range(5)]
+        writer.start()
+        writer.close()
+        assert len(written) == 5
+        assert all(writer.status(ticket) == (DONE, None) for ticket in tickets)
+
+    def test_close_flushes_without_thread(self):
+        """Test close writes entries that were never picked up."""
+        writer = GroupCommitWriter(MemorySpool(), lambda batch: [(DONE, 1)] * len(batch),
+                                   max_batch=1)
+        tickets = [writer.spool.put({'n': n}) for n in range(2)]
+        writer.close()
+        assert [writer.status(ticket) for ticket in tickets] == [(DONE, 1), (DONE, 1)]
+
+
+class TestQueuedRegistration:
+    """Test the register view in queue mode."""
+
+    def test_sync_mode_by_default(self, test_app, client):
+        """Test the queue is off unless configured."""
+        assert 'registration_queue' not in test_app.extensions
+        assert client.get('/registrations/abc').status_code == 404
+
+    def test_unknown_mode(self, make_app):
+        """Test an unknown registration mode is rejected."""
+        with pytest.raises(ValueError):
+            make_app(REGISTRATION_MODE='later')
+
+    def test_sqlite_spool_configuration(self, tmp_path, make_app):
+        """Test the app journals to the configured spool file."""
+        queue_app = make_app(
+            REGISTRATION_MODE='queue',
+            REGISTRATION_SPOOL='sqlite',
+            REGISTRATION_SPOOL_PATH=str(tmp_path / 'spool.db'),
+        )
+        assert isinstance(queue_app.extensions['registration_queue'].spool, SQLiteSpool)
+
+    def test_pending_then_success(self, queue_app, writer, sample_student_data, monkeypatch):
+        """Test the client polls a pending page until the registration is written."""
+        monkeypatch.setattr(writer, 'start', lambda: None)
+        client = queue_app.test_client()
+        response = client.post('/register', data=sample_student_data)
+        assert response.status_code == 302
+        status_url = response.headers['Location']
+        assert '/registrations/' in status_url
+
+        pending = client.get(status_url)
+        assert pending.status_code == 202
+        assert pending.headers['Retry-After'] == '1'
+        assert b'http-equiv="refresh"' in pending.data
+
+        writer.flush_once()
+        done = client.get(status_url, follow_redirects=True)
+        assert done.status_code == 200
+        assert b'Registration Successful' in done.data
+        assert b'John' in done.data
+
+    def test_writes_bump_counter_and_listing(self, queue_app, writer, sample_student_data,
+                                             another_student_data):
+        """Test one group commit bumps the change counter and refreshes the listing."""
+        client = queue_app.test_client()
+        client.get('/students')
+        client.post('/register', data=sample_student_data)
+        client.post('/register', data=another_student_data)
+        writer.close()
+        with queue_app.app_context():
+            assert Student.query.count() == 2
+            assert student_changes()[0] >= 1
+        assert b'2 students enrolled' in client.get('/students').data
+
+    def test_duplicates_fail_on_status_page(self, queue_app, writer, sample_student_data,
+                                            monkeypatch):
+        """Test duplicates in the database or the same batch are reported when polled."""
+        monkeypatch.setattr(writer, 'start', lambda: None)
+        client = queue_app.test_client()
+        client.post('/register', data=sample_student_data)
+        writer.flush_once()
+        again = ticket_of(client.post('/register', data=sample_student_data))
+        writer.flush_once()
+        response = client.get(f'/registrations/{again}', follow_redirects=True)
+        assert b'A student with this email already exists!' in response.data
+
+        data = dict(sample_student_data, email='twice@example.com')
+        tickets = [ticket_of(client.post('/register', data=data)) for _ in range(2)]
+        writer.flush_once()
+        assert [writer.status(ticket)[0] for ticket in tickets] == [DONE, FAILED]
+
+    def test_invalid_form_is_not_queued(self, queue_app, writer, sample_student_data):
+        """Test validation errors are reported before anything is queued."""
+        client = queue_app.test_client()
+        data = dict(sample_student_data, date_of_birth='01/01/2000')
+        response = client.post('/register', data=data, follow_redirects=True)
+        assert b'date_of_birth must be YYYY-MM-DD' in response.data
+        assert writer.spool.pending() == 0
+
+    def test_unknown_ticket(self, queue_app):
+        """Test polling a ticket that was never issued."""
+        assert queue_app.test_client().get('/registrations/nope').status_code == 404
+
+
+class TestWriteRegistrations:
+    """Test the batch writer used by the queue."""
+
+    def test_conflict_falls_back_to_single_rows(self, queue_app, sample_student_data,
+                                                another_student_data, monkeypatch):
+        """Test a row inserted behind the duplicate check only fails that row."""
+        with queue_app.app_context():
+            db.session.add(Student(**dict(sample_student_data, date_of_birth=date(2000, 1, 1))))
+            db.session.commit()
+            monkeypatch.setattr(db.session, 'scalars', _skip_first_query(db.session.scalars))
+            results = write_registrations([sample_student_data, another_student_data])
+            assert results[0] == (FAILED, 'A student with this email already exists!')
+            assert results[1][0] == DONE
+            assert Student.query.count() == 2
+
+    def test_invalid_rows_fail(self, queue_app):
+        """Test rows that no longer validate are failed, not written."""
+        with queue_app.app_context():
+            assert write_registrations([{'first_name': 'A'}]) == [
+                (FAILED, 'Registration failed: missing last_name')
+            ]
+
+
+def _skip_first_query(scalars):
+    """Make the first scalars() call, the duplicate check, find nothing."""
+    calls = []
+
+    def wrapper(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 1:
+            return []
+        return scalars(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,177 @@
+"""
+Unit tests for full-text student search.
+"""
+import pytest
+from datetime import datetime
+import app as app_module
+from app import (db, Student, search_students, search_terms, upgrade_database,
+                 create_search_index, drop_search_index)
+from tests.conftest import add_student
+
+
+@pytest.fixture
+def search_data(test_app):
+    with test_app.app_context():
+        add_student('alice@example.com', first_name='Alice', last_name='Johnson',
+                    city='Chicago', course='Medicine')
+        add_student('bob.j@school.edu', first_name='Bob', last_name='Johnston',
+                    city='Boston', course='Law')
+        add_student('carol@example.com', first_name='Carol', last_name='Smith',
+                    city='Denver', course='Computer Science')
+
+
+class TestSearchTerms:
+    """Test query tokenisation."""
+
+    def test_splits_on_punctuation(self):
+        """Test queries are lower-cased and split like the index tokenizer."""
+        assert search_terms('John.Doe@Example') == ['john', 'doe', 'example']
+
+    def test_fts_syntax_is_neutralised(self):
+        """Test FTS operators in user input are treated as plain words."""
+        assert search_terms('"a" OR b*') == ['a', 'or', 'b']
+
+    def test_empty(self):
+        """Test empty input yields no terms."""
+        assert search_terms(None) == []
+
+
+class TestSearchStudents:
+    """Test the search_students helper."""
+
+    def test_prefix_match(self, test_app, search_data):
+        """Test a prefix matches whole words in any searched column."""
+        with test_app.app_context():
+            results, has_more = search_students('johns')
+            assert {s.first_name for s in results} == {'Alice', 'Bob'}
+            assert has_more is False
+
+    def test_all_terms_must_match(self, test_app, search_data):
+        """Test multiple terms are combined with AND."""
+        with test_app.app_context():
+            results, _ = search_students('johns bost')
+            assert [s.first_name for s in results] == ['Bob']
+
+    def test_matches_email_parts_and_course(self, test_app, search_data):
+        """Test email domains and course names are searchable."""
+        with test_app.app_context():
+            assert [s.first_name for s in search_students('school')[0]] == ['Bob']
+            assert [s.first_name for s in search_students('comp sci')[0]] == ['Carol']
+
+    def test_ranked_by_relevance(self, test_app, search_data):
+        """Test rows matching in more columns rank first."""
+        with test_app.app_context():
+            add_student('denver@example.com', first_name='Denver', last_name='Denver', city='Denver')
+            results, _ = search_students('denver')
+            assert [s.first_name for s in results] == ['Denver', 'Carol']
+
+    def test_pagination(self, test_app, search_data):
+        """Test results are split into pages."""
+        with test_app.app_context():
+            first, more = search_students('example', page=1, per_page=1)
+            second, more_after = search_students('example', page=2, per_page=1)
+            assert more is True and more_after is False
+            assert {first[0].id, second[0].id} == {
+                s.id for s in Student.query.filter(Student.email.like('%example.com'))
+            }
+
+    def test_soft_deleted_skipped_before_paging(self, test_app, search_data):
+        """Test soft-deleted matches do not leave pages short."""
+        with test_app.app_context():
+            add_student('dan@example.com', first_name='Dan', last_name='Brown')
+            top = search_students('example', per_page=1)[0][0]
+            top.deleted_at = datetime.utcnow()
+            db.session.commit()
+            first, more = search_students('example', page=1, per_page=1)
+            second, more_after = search_students('example', page=2, per_page=1)
+            assert len(first) == len(second) == 1
+            assert more is True and more_after is False
+
+    def test_index_follows_updates_and_deletes(self, test_app, search_data):
+        """Test the index stays in sync with writes."""
+        with test_app.app_context():
+            carol = Student.query.filter_by(first_name='Carol').one()
+            carol.city = 'Seattle'
+            db.session.commit()
+            assert search_students('denver')[0] == []
+            assert [s.first_name for s in search_students('seattle')[0]] == ['Carol']
+            db.session.delete(carol)
+            db.session.commit()
+            assert search_students('seattle')[0] == []
+
+    def test_blank_query(self, test_app, search_data):
+        """Test a query without words returns nothing."""
+        with test_app.app_context():
+            assert search_students('  ?! ') == ([], False)
+
+    def test_like_fallback(self, test_app, search_data, monkeypatch):
+        """Test databases without FTS5 fall back to prefix LIKE matching."""
+        monkeypatch.setattr(app_module, '_use_fts', lambda: False)
+        with test_app.app_context():
+            results, has_more = search_students('johns', per_page=1)
+            assert [s.first_name for s in results] == ['Bob']
+            assert has_more is True
+
+    def test_migration_indexes_existing_rows(self, test_app):
+        """Test upgrading a database built before the index fills it."""
+        with test_app.app_context():
+            db.session.execute(db.text('DROP TABLE student_fts'))
+            db.session.execute(db.text('DROP TRIGGER student_fts_insert'))
+            db.session.commit()
+            add_student('legacy@example.com', first_name='Legacy', last_name='Row')
+            upgrade_database()
+            assert [s.first_name for s in search_students('legacy')[0]] == ['Legacy']
+
+    def test_index_ddl_skipped_on_other_databases(self):
+        """Test the FTS5 DDL only runs on SQLite."""
+        class Dialect:
+            name = 'postgresql'
+
+        class Connection:
+            dialect = Dialect()
+
+            def exec_driver_sql(self, statement):
+                raise AssertionError('should not be called')
+
+        create_search_index(Student.__table__, Connection())
+        drop_search_index(Student.__table__, Connection())
+
+
+class TestSearchRoutes:
+    """Test the search page and API."""
+
+    def test_search_page(self, client, search_data):
+        """Test the HTML search page lists matches."""
+        response = client.get('/students/search?q=johns')
+        assert response.status_code == 200
+        assert b'Search results for' in response.data
+        assert b'Alice' in response.data
+        assert b'Carol' not in response.data
+
+    def test_search_page_no_matches(self, client, search_data):
+        """Test the search page shows an empty state."""
+        response = client.get('/students/search?q=zzz')
+        assert b'No Matches' in response.data
+
+    def test_search_page_pagination_links(self, client, search_data):
+        """Test numbered page links on the search page."""
+        response = client.get('/students/search?q=example&per_page=1')
+        assert b'rel="next"' in response.data
+        assert b'rel="prev"' not in response.data
+        response = client.get('/students/search?q=example&per_page=1&page=2')
+        assert b'rel="prev"' in response.data
+        assert b'rel="next"' not in response.data
+
+    def test_students_page_has_search_form(self, client):
+        """Test the listing page links to search."""
+        response = client.get('/students')
+        assert b'action="/students/search"' in response.data
+
+    def test_search_api(self, client, search_data):
+        """Test the JSON search endpoint with projection."""
+        response = client.get('/api/students/search?q=johns&fields=first_name&per_page=1')
+        body = response.get_json()
+        assert len(body['students']) == 1
+        assert set(body['students'][0]) == {'first_name'}
+        assert body['page'] == 1
+        assert body['has_more'] is True
@@ -0,0 +1,196 @@
+"""
+Unit tests for the trigger-maintained registration statistics.
+"""
+import re
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import event
+import app as app_module
+from app import (db, Student, StudentStat, student_stats, student_count, stat_counts_query,
+                 create_stat_triggers, upgrade_database)
+from tests.conftest import add_student
+
+
+def counts_from_scan():
+    stats = {}
+    for dimension, value, count in db.session.execute(stat_counts_query()):
+        stats.setdefault(dimension, {})[str(value)] = count
+    return stats
+
+
+@pytest.fixture
+def stats_data(test_app):
+    with test_app.app_context():
+        add_student('a@example.com', course='Law', city='Boston')
+        add_student('b@example.com', course='Law', city='Denver', gender='Male')
+        add_student('c@example.com', course='Medicine', city='Boston')
+
+
+class TestCounters:
+    """Test the counters follow every write."""
+
+    def test_insert_counts(self, test_app, stats_data):
+        """Test inserts are counted per group, largest first."""
+        with test_app.app_context():
+            stats = student_stats()
+            assert stats['course'] == {'Law': 2, 'Medicine': 1}
+            assert list(stats['city']) == ['Boston', 'Denver']
+            assert stats['gender'] == {'Female': 2, 'Male': 1}
+            assert stats['day'] == {datetime.utcnow().date().isoformat(): 3}
+            assert student_count() == 3
+
+    def test_delete_and_update(self, test_app, stats_data):
+        """Test deletes decrement, updates move counts and empty groups vanish."""
+        with test_app.app_context():
+            student = Student.query.filter_by(email='c@example.com').one()
+            student.course = 'Law'
+            db.session.commit()
+            assert student_stats()['course'] == {'Law': 3}
+            Student.query.filter_by(city='Denver').delete()
+            db.session.commit()
+            assert student_stats()['city'] == {'Boston': 2}
+            assert StudentStat.query.filter_by(value='Denver').count() == 0
+
+    def test_matches_group_by(self, client, test_app, sample_student_data, another_student_data):
+        """Test counters agree with a full scan after writes through every path."""
+        client.post('/register', data=sample_student_data)
+        client.post('/api/students', json=another_student_data)
+        row = ('{"first_name": "A", "last_name": "B", "email": "ab@example.com", "phone": "1", '
+               '"date_of_birth": "2000-01-01", "gender": "Male", "address": "x", "city": "y", '
+               '"course": "Law"}\n')
+        client.post('/students/import', data=row, content_type='application/x-ndjson')
+        with test_app.app_context():
+            student_id = Student.query.filter_by(email='jane.smith@example.com').one().id
+        client.post(f'/students/{student_id}/delete')
+        with test_app.app_context():
+            assert student_stats() == counts_from_scan()
+
+    def test_missing_registration_date(self, test_app):
+        """Test rows without a registration date are counted but not per day."""
+        with test_app.app_context():
+            db.session.execute(db.text(
+                "INSERT INTO student (first_name, last_name, email, phone, date_of_birth, gender, "
+                "address, city, course) VALUES ('R', 'R', 'r@example.com', '1', '2000-01-01', "
+                "'Male', 'a', 'b', 'c')"
+            ))
+            db.session.commit()
+            assert student_stats()['day'] == {}
+            assert student_count() == 1
+
+    def test_day_window(self, test_app, stats_data):
+        """Test only recent days are returned unless all are asked for."""
+        with test_app.app_context():
+            add_student('old@example.com', registration_date=datetime.utcnow() - timedelta(days=40))
+            assert len(student_stats(30)['day']) == 1
+            assert len(student_stats(0)['day']) == 2
+            assert student_stats(30)['course']['Law'] == 3
+
+    def test_group_by_fallback(self, test_app, stats_data, monkeypatch):
+        """Test databases without the triggers compute the same numbers by scanning."""
+        with test_app.app_context():
+            add_student('old@example.com', registration_date=datetime.utcnow() - timedelta(days=40))
+            expected = student_stats(30)
+            monkeypatch.setattr(app_module, '_use_stat_triggers', lambda: False)
+            assert student_stats(30) == expected
+            assert student_count() == 4
+
+    def test_triggers_skipped_on_other_databases(self):
+        """Test the trigger DDL only runs on SQLite."""
+        class Dialect:
+            name = 'postgresql'
+
+        class Connection:
+            dialect = Dialect()
+
+            def exec_driver_sql(self, statement):
+                raise AssertionError('should not be called')
+
+        create_stat_triggers(Student.__table__, Connection())
+
+
+class TestRebuild:
+    """Test recovering the counters."""
+
+    def test_rebuild_command(self, test_app, stats_data):
+        """Test the CLI recomputes drifted counts."""
+        with test_app.app_context():
+            db.session.execute(db.text('UPDATE student_stat SET count = 99'))
+            db.session.commit()
+        result = test_app.test_cli_runner().invoke(args=['rebuild-stats'])
+        assert result.exit_code == 0
+        assert 'Rebuilt statistics for 3 students.' in result.output
+        with test_app.app_context():
+            assert student_stats() == counts_from_scan()
+
+    def test_migration_fills_existing_database(self, test_app):
+        """Test upgrading a database from before the counters installs and fills them."""
+        with test_app.app_context():
+            for name in ('insert', 'delete', 'update'):
+                db.session.execute(db.text(f'DROP TRIGGER student_stat_{name}'))
+            db.session.commit()
+            add_student('legacy@example.com')
+            assert student_count() == 0
+            upgrade_database()
+            assert student_count() == 1
+            add_student('new@example.com')
+            assert student_count() == 2
+
+
+class TestStatsRoutes:
+    """Test the dashboard page and API."""
+
+    def test_stats_page(self, client, stats_data):
+        """Test the page lists each dimension."""
+        response = client.get('/stats')
+        assert response.status_code == 200
+        assert b'3 students enrolled' in response.data
+        assert b'By Course' in response.data
+        assert b'Medicine' in response.data
+        assert b'Last 30 days' in response.data
+
+    def test_stats_page_empty(self, client):
+        """Test the empty state before anyone registers."""
+        assert b'No Students Yet' in client.get('/stats').data
+
+    def test_stats_page_all_days(self, client, stats_data):
+        """Test days=0 shows every registration day."""
+        assert b'All days' in client.get('/stats?days=0').data
+
+    def test_stats_page_conditional_get(self, client, stats_data, sample_student_data):
+        """Test the page answers 304 until a student is written."""
+        etag = client.get('/stats').headers['ETag']
+        assert client.get('/stats', headers={'If-None-Match': etag}).status_code == 304
+        client.post('/register', data=sample_student_data)
+        assert client.get('/stats', headers={'If-None-Match': etag}).status_code == 200
+
+    def test_stats_api(self, client, stats_data):
+        """Test the JSON endpoint."""
+        body = client.get('/api/stats?days=7').get_json()
+        assert body['total'] == 3
+        assert body['days'] == 7
+        assert body['course'] == {'Law': 2, 'Medicine': 1}
+        assert set(body) == {'total', 'days', 'course', 'city', 'gender', 'day'}
+
+    def test_dashboard_does_not_scan_students(self, client, test_app, stats_data):
+        """Test the dashboard reads only the summary tables."""
+        statements = []
+
+        def before_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with test_app.app_context():
+            engine = db.engine
+        # A worker's first request loads the email filter.
+        client.get('/')
+        event.listen(engine, 'before_cursor_execute', before_execute)
+        try:
+            client.get('/stats')
+            client.get('/api/stats')
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_execute)
+        assert statements
+        assert not any(re.search(r'\bFROM student\b', statement) for statement in statements)
+
+    def test_students_page_links_to_stats(self, client):
+        """Test the listing navigation links to the dashboard."""
+        assert b'href="/stats"' in client.get('/students').data
@@ -0,0 +1,111 @@
+"""
+Unit tests for the streamed students listing.
+"""
+import re
+import pytest
+from cache import NullCache
+from tests.test_pagination import make_students
+
+
+@pytest.fixture
+def many_students(test_app):
+    with test_app.app_context():
+        make_students(5)
+
+
+def buffered(client, url):
+    """Fetch `url` with streaming turned off, for comparison."""
+    app = client.application
+    app.config['STUDENTS_STREAM'] = False
+    try:
+        return client.get(url)
+    finally:
+        app.config['STUDENTS_STREAM'] = True
+
+
+def is_streamed(response):
+    # Buffered responses know their length up front; streamed ones do not.
+    return 'Content-Length' not in response.headers
+
+
+def link(response, rel):
+    match = re.search(rf'<a href="([^"]+)" class="btn btn-secondary" rel="{rel}"',
+                      response.get_data(as_text=True))
+    return match and match.group(1).replace('&amp;', '&')
+
+
+class TestStreamedListing:
+    """Test /students is sent while it is rendered."""
+
+    def test_response_is_streamed(self, client, test_app, many_students):
+        """Test the listing is a streamed response with validators."""
+        response = client.get('/students')
+        assert is_streamed(response)
+        assert response.headers['ETag'] == 'W/"students-0"'
+        test_app.extensions['page_cache'].clear()
+        assert response.data == buffered(client, '/students').data
+
+    def test_pages_match_buffered_rendering(self, client, test_app, many_students):
+        """Test streamed pages and links match the buffered listing page by page."""
+        url = '/students?per_page=2'
+        pages = 0
+        while url:
+            streamed = client.get(url)
+            test_app.extensions['page_cache'].clear()
+            assert streamed.data == buffered(client, url).data
+            test_app.extensions['page_cache'].clear()
+            url = link(streamed, 'next')
+            pages += 1
+        assert pages == 3
+
+    def test_backward_pages_are_buffered(self, client, many_students):
+        """Test pages read in reverse fall back to buffered rendering."""
+        second = link(client.get('/students?per_page=2'), 'next')
+        previous = link(client.get(second), 'prev')
+        response = client.get(previous)
+        assert not is_streamed(response)
+        assert response.get_data(as_text=True).count('student-mini-card') == 2
+
+    def test_empty_listing(self, client):
+        """Test the empty state is streamed too."""
+        response = client.get('/students')
+        assert is_streamed(response)
+        assert b'No Students Yet' in response.data
+
+    def test_first_chunk_before_rows_are_read(self, client, test_app, many_students,
+                                              monkeypatch):
+        """Test the page head goes out before the later rows are fetched."""
+        monkeypatch.setitem(test_app.config, 'STUDENTS_STREAM_CHUNK', 1)
+        monkeypatch.setitem(test_app.config, 'STREAM_BUFFER_EVENTS', 5)
+        response = client.get('/students')
+        chunks = iter(response.response)
+        first = next(chunks).decode()
+        assert first.startswith('<!DOCTYPE html>')
+        assert 'First000' not in first
+        rest = b''.join(chunks).decode()
+        assert 'First000' in rest and 'First004' in rest
+
+
+class TestStreamedCaching:
+    """Test streamed pages and the page cache."""
+
+    def test_cached_after_full_send(self, client, test_app, many_students):
+        """Test a fully sent page is cached and served unstreamed next time."""
+        client.get('/students').data
+        response = client.get('/students')
+        assert not is_streamed(response)
+        assert b'First004' in response.data
+
+    def test_not_cached_when_abandoned(self, client, test_app, many_students):
+        """Test a page the client stopped reading is not cached."""
+        response = client.get('/students')
+        next(iter(response.response))
+        response.close()
+        assert is_streamed(client.get('/students'))
+
+    def test_disabled_cache_skips_collecting(self, client, test_app, many_students):
+        """Test no copy of the page is kept when the cache is off."""
+        test_app.extensions['page_cache'] = NullCache()
+        response = client.get('/students')
+        assert b'First004' in response.data
+        assert is_streamed(client.get('/students'))